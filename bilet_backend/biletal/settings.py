@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -48,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -98,11 +101,110 @@ DATABASES = {
     }
 }
 
+# Veritabanı bağlantı yönetimi:
+#   'pool'        - Django native havuzu (psycopg 3 ve psycopg_pool, requirements.txt).
+#                   HTTP ASGI (biletal/asgi.py) üzerinden sunulduğu için varsayılan:
+#                   ASGI'de her istek ayrı thread'de çalışır, bağlantılar havuzdan
+#                   alınıp geri verilir, sayısı DB_POOL_MAX_SIZE ile sınırlı kalır.
+#   'per_request' - her istek kendi bağlantısını açıp kapatır (CONN_MAX_AGE=0)
+#   'persistent'  - bağlantılar istekler arasında DB_CONN_MAX_AGE sn açık tutulur,
+#                   sadece WSGI (sabit thread sayılı) sunucular için
+#   'pgbouncer'   - pgbouncer (transaction pooling) arkasında istek başına bağlantı,
+#                   havuzu pgbouncer tutar; server-side cursor'lar kapalı
+DB_CONNECTION_MODE = os.environ.get('DB_CONNECTION_MODE', 'pool')
+DB_CONN_MAX_AGE = 600
+DB_POOL_MIN_SIZE = 2
+DB_POOL_MAX_SIZE = 20
+DB_POOL_TIMEOUT = 10
+
+if DB_CONNECTION_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    }
+elif DB_CONNECTION_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    if DB_CONNECTION_MODE == 'pgbouncer':
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 # Redis Configuration
 REDIS_HOST = '127.0.0.1'
 REDIS_PORT = 6379
 REDIS_DB = 1
 
+# Servisler ve cache tek, boyutu sınırlı Redis havuzunu paylaşır (core.connections)
+REDIS_MAX_CONNECTIONS = 50
+REDIS_POOL_TIMEOUT = 5
+REDIS_HEALTH_CHECK_INTERVAL = 30
+
+# Aynı sefer için bu pencere (ms) içindeki koltuk değişiklikleri tek yayında
+# birleştirilir. 0 verilirse her değişiklik istek içinde hemen yayınlanır.
+SEAT_BROADCAST_WINDOW_MS = 75
+# Yeni bağlantılara gönderilen hazır kodlanmış sefer snapshot'ının ömrü (sn).
+# Versiyon değişince zaten kullanılmaz; kilit bitişlerinden sonra da tutulmaz.
+SEAT_SNAPSHOT_TIMEOUT = 60
+
+# Prometheus metrikleri (/api/metrics/). Çok süreçli sunucularda
+# PROMETHEUS_MULTIPROC_DIR ortam değişkeni ayarlanmalıdır.
+METRICS_ENABLED = True
+# Açılırsa WebSocket metrikleri sefer başına etiketlenir. Seriler hiç silinmediği
+# için etiket sayısı sınırsız büyür; sadece kısa süreli inceleme için açın.
+METRICS_PER_TRIP = os.environ.get('METRICS_PER_TRIP') == '1'
+# Scrape isteği "Authorization: Bearer <token>" göndermelidir; ayarlanmazsa
+# endpoint'e sadece yönetici (is_staff) JWT'si ile erişilir
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# İstek profilleyici (core.profiling). Açıkken isteklerin ve WebSocket
+# mesajlarının PROFILING_SAMPLE_RATE kadarı, ayrıca PROFILING_HEADER başlığı veya
+# PROFILING_QUERY_PARAM parametresi PROFILING_TOKEN'a eşit olanların tamamı
+# profillenir. Aynı thread/event loop'ta aynı anda tek profil çalışır.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+PROFILING_HEADER = 'X-Profile'
+PROFILING_QUERY_PARAM = '__profile'
+# 'sample': yığın örnekleme, collapsed stack çıktısı (kanca kurmaz, en düşük
+# maliyet; birkaç ms'den kısa istekleri yakalayamaz); 'cprofile': deterministik,
+# .prof çıktısı (kısa istekleri de yakalar, profillenen thread ~2x yavaşlar)
+PROFILING_MODE = os.environ.get('PROFILING_MODE', 'sample')
+# 'sample' modunda örnekleme aralığı (sn) ve en fazla tutulacak profil dosyası
+PROFILING_INTERVAL = 0.005
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_FILES = 200
+
+# Sefer arama sonuç cache'i (sn). Sefer değişikliklerinde sinyallerle geçersiz kılınır.
+TRIP_SEARCH_CACHE_TIMEOUT = 300
+TRIP_SEARCH_LOCK_TIMEOUT = 5
+
+# Koltuk durumu yeniden yüklenirken diğer istekler eski bitmap'i beklemeden alır
+SEAT_STATE_STALE_WHILE_REVALIDATE = True
+
+# Süresi dolan rezervasyonlar bu boyutta parçalar halinde temizlenir
+RESERVATION_SWEEP_CHUNK_SIZE = 1000
+# Süre dolum kuyruğu işçisinin (run_reservation_expiry) tarama aralığı (sn)
+RESERVATION_EXPIRY_POLL_INTERVAL = 0.5
+
+# Rezervasyon kilitleme modu: 'seat' (sefer satırı kilitlenmez, koltuk bazında
+# özellik) veya 'trip' (sefer satırı select_for_update ile kilitlenir)
+RESERVATION_LOCK_MODE = 'seat'
+
+# PNR sıra numaraları veritabanı sequence'ından (Postgres dışında Redis'ten) bu
+# boyutta bloklar halinde alınır
+PNR_BLOCK_SIZE = 1000
+
+# PNR permütasyon anahtarı SECRET_KEY'den ayrıdır ve sabit kalmalıdır: değişirse
+# aynı sıra numaraları farklı kodlara karışır ve verilmiş PNR'larla çakışabilir
+PNR_SECRET = os.environ.get('PNR_SECRET', 'biletal-pnr-v1')
+
+# WebSocket consumer'larının kullandığı async Redis havuzu (event loop başına)
+REDIS_ASYNC_MAX_CONNECTIONS = 50
+
 # Cache Configuration
 CACHES = {
     'default': {
@@ -110,6 +212,7 @@ CACHES = {
         'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CONNECTION_FACTORY': 'core.connections.SharedPoolConnectionFactory',
         }
     }
 }
@@ -119,7 +222,11 @@ CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
-            'hosts': [(REDIS_HOST, REDIS_PORT)],
+            'hosts': [{
+                'address': f'redis://{REDIS_HOST}:{REDIS_PORT}',
+                'max_connections': REDIS_MAX_CONNECTIONS,
+                'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+            }],
         },
     },
 }
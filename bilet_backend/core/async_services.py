@@ -0,0 +1,312 @@
+import asyncio
+import time
+import weakref
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from .models import Trip
+from .services import (
+    ACQUIRE_SEAT_LOCK_SCRIPT, EXTEND_SEAT_LOCK_SCRIPT, RELEASE_SEAT_LOCK_SCRIPT,
+    REBUILD_RESERVED_BITS_SCRIPT, STORE_SEAT_SNAPSHOT_SCRIPT,
+    SEAT_STATE_COLD, seat_service
+)
+from .encoding import encode_message
+from . import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _LoopClients:
+    """Bir event loop'a ait havuzlu async Redis istemcileri ve script'leri"""
+
+    def __init__(self):
+        self.redis_client = aioredis.Redis(connection_pool=self._pool(decode_responses=True))
+        # Bitmap'ler ham byte olarak okunur
+        self.raw_redis_client = aioredis.Redis(connection_pool=self._pool())
+        self.acquire_lock_script = self.redis_client.register_script(ACQUIRE_SEAT_LOCK_SCRIPT)
+        self.extend_lock_script = self.redis_client.register_script(EXTEND_SEAT_LOCK_SCRIPT)
+        self.release_lock_script = self.redis_client.register_script(RELEASE_SEAT_LOCK_SCRIPT)
+        self.store_snapshot_script = self.redis_client.register_script(STORE_SEAT_SNAPSHOT_SCRIPT)
+        self.rebuild_reserved_bits_script = self.raw_redis_client.register_script(
+            REBUILD_RESERVED_BITS_SCRIPT
+        )
+        # Yayın penceresinde birleştirilen değişiklikler (loop tek thread, kilit gerekmez)
+        self.pending_broadcasts = {}
+        self.broadcast_tasks = set()
+
+    @staticmethod
+    def _pool(**kwargs):
+        return aioredis.ConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            max_connections=settings.REDIS_ASYNC_MAX_CONNECTIONS,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            socket_keepalive=True,
+            connection_class=metrics.redis_connection_class(asynchronous=True),
+            **kwargs
+        )
+
+
+class AsyncSeatReservationService:
+    """WebSocket consumer'ları için event loop'tan çıkmayan koltuk servisi
+
+    Lua script'leri, anahtar/argüman üretimi, sorgular, düzen ve indeks
+    önbellekleri senkron servisle paylaşılır; sadece I/O (Redis, ORM, channel
+    layer) await edilir.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        # Async bağlantılar oluşturuldukları loop'a bağlıdır
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def clients(self):
+        loop = asyncio.get_running_loop()
+        clients = self._clients.get(loop)
+        if clients is None:
+            clients = self._clients[loop] = _LoopClients()
+        return clients
+
+    async def get_trip_vehicle_id(self, trip_id):
+        """Seferin aracını getir (senkron servisle aynı süreç içi önbellek)"""
+        vehicle_id = self.service._trip_vehicles.get(int(trip_id))
+        if vehicle_id is None:
+            vehicle_id = await self.refresh_trip_vehicle_id(trip_id)
+        return vehicle_id
+
+    async def refresh_trip_vehicle_id(self, trip_id):
+        """Seferin aracını veritabanından yeniden oku"""
+        trip_id = int(trip_id)
+        vehicle_id = await Trip.objects.values_list('vehicle_id', flat=True).aget(id=trip_id)
+        self.service._trip_vehicles[trip_id] = vehicle_id
+        return vehicle_id
+
+    async def get_seat_layout(self, vehicle_id):
+        """Aracın sabit koltuk düzeni (sıra = bitmap indeksi)"""
+        layout = self.service._seat_layouts.get(vehicle_id)
+        if layout is not None:
+            return layout
+
+        layout_key = self.service.seat_layout_key(vehicle_id)
+        layout = self.service.decode_seat_layout(await self.clients.redis_client.get(layout_key))
+        if layout is None:
+            layout = [seat async for seat in self.service.seat_layout_query(vehicle_id)]
+            # Koltukları henüz oluşturulmamış aracın boş düzeni cache'lenmez
+            if layout:
+                await self.clients.redis_client.set(layout_key, encode_message(layout))
+        return self.service.remember_seat_layout(vehicle_id, layout)
+
+    async def get_seat_index(self, trip_id, seat_id):
+        """Koltuğun sefer bitmap'indeki indeksi, araçta yoksa None (araç bir kez yeniden okunur)"""
+        vehicle_id = await self.get_trip_vehicle_id(trip_id)
+        seat_index = await self._vehicle_seat_index(vehicle_id, seat_id)
+        if seat_index is None:
+            current_vehicle_id = await self.refresh_trip_vehicle_id(trip_id)
+            if current_vehicle_id != vehicle_id:
+                seat_index = await self._vehicle_seat_index(current_vehicle_id, seat_id)
+        return seat_index
+
+    async def _vehicle_seat_index(self, vehicle_id, seat_id):
+        if vehicle_id not in self.service._seat_indexes:
+            await self.get_seat_layout(vehicle_id)
+        return self.service._seat_indexes.get(vehicle_id, {}).get(int(seat_id))
+
+    async def get_trip_seats(self, trip_id):
+        """Sefer koltuk durumlarını bitmap'lerden oluştur"""
+        try:
+            vehicle_id = await self.get_trip_vehicle_id(trip_id)
+
+            pipe = self.clients.raw_redis_client.pipeline(transaction=False)
+            self.service._queue_reserved_bits(pipe, trip_id)
+            self.service._queue_locked_seat_ids(pipe, trip_id)
+            hydrated, reserved_bits, locked_seat_ids = await pipe.execute()
+
+            if not self.service._track_hydrated_vehicle(trip_id, vehicle_id, hydrated):
+                reserved_bits = await self._hydrate_single_flight(trip_id, reserved_bits)
+        except Trip.DoesNotExist:
+            return []
+
+        layout = await self.get_seat_layout(self.service._trip_vehicles.get(int(trip_id), vehicle_id))
+        return self.service.build_seat_list(
+            layout, reserved_bits or b'', {int(seat_id) for seat_id in locked_seat_ids}
+        )
+
+    async def _hydrate_single_flight(self, trip_id, stale_bits):
+        """Aynı sefer için eşzamanlı yeniden yüklemelerde sadece biri veritabanına gider"""
+        lock = self.service.seat_state_lock(self.clients.redis_client, trip_id)
+        if await lock.acquire(blocking=False):
+            try:
+                return await self._hydrate_reserved_bits(
+                    trip_id, await self.refresh_trip_vehicle_id(trip_id)
+                )
+            finally:
+                try:
+                    await lock.release()
+                except redis.exceptions.LockError:
+                    pass
+
+        if self.service.serve_stale_bits(stale_bits):
+            return stale_bits
+
+        deadline = time.monotonic() + self.service.seat_state_lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            pipe = self.clients.raw_redis_client.pipeline(transaction=False)
+            self.service._queue_reserved_bits(pipe, trip_id)
+            hydrated, reserved_bits = await pipe.execute()
+            if hydrated:
+                self.service._trip_vehicles[int(trip_id)] = int(hydrated)
+                return reserved_bits
+
+        return await self._hydrate_reserved_bits(trip_id, await self.refresh_trip_vehicle_id(trip_id))
+
+    async def ensure_seat_state(self, trip_id):
+        """Rezerve bitmap'i seferin güncel aracıyla yüklü değilse yükle"""
+        vehicle_id = await self.refresh_trip_vehicle_id(trip_id)
+        hydrated = await self.clients.redis_client.get(f"trip_seat_state_{trip_id}")
+        if self.service.needs_hydration(hydrated, vehicle_id):
+            await self._hydrate_single_flight(trip_id, None)
+
+    async def _hydrate_reserved_bits(self, trip_id, vehicle_id):
+        """Rezerve bitmap'ini veritabanından yeniden oluştur"""
+        trip_vehicles = {int(trip_id): vehicle_id}
+        await self.get_seat_layout(vehicle_id)
+
+        # Günlük sırası veritabanı okunmadan önce alınmalı
+        pipe = self.clients.redis_client.pipeline(transaction=False)
+        self.service._queue_reserved_write_seq(pipe, trip_id)
+        write_seqs = self.service._reserved_write_seqs(trip_vehicles, await pipe.execute())
+
+        reserved = self.service.build_reserved_bits(
+            trip_vehicles, [row async for row in self.service.reserved_seats_query(trip_vehicles)]
+        )
+
+        keys, args = self.service.rebuild_reserved_bits_args(
+            int(trip_id), vehicle_id, reserved[int(trip_id)], write_seqs[int(trip_id)]
+        )
+        bits = await self.clients.rebuild_reserved_bits_script(keys=keys, args=args)
+        return bits or b''
+
+    async def create_temporary_lock(self, trip_id, seat_id, user_session):
+        """Koltuk için geçici kilit oluştur"""
+        try:
+            seat_index = await self.get_seat_index(trip_id, seat_id)
+        except Trip.DoesNotExist:
+            seat_index = None
+        if seat_index is None:
+            return False, "Geçersiz koltuk", None
+
+        token, version = await self.acquire_seat_lock(trip_id, seat_id, user_session, seat_index)
+        if token is None:
+            return False, "Koltuk başka bir yolcu tarafından seçilmiş", None
+
+        await self.broadcast_seat_update(trip_id, {seat_id: 'temp_locked'}, version)
+
+        return True, "Koltuk geçici olarak rezerve edildi", token
+
+    async def acquire_seat_lock(self, trip_id, seat_id, user_session, seat_index):
+        """Kilidi tek round trip'te al, (fencing token, versiyon) döner; alınamazsa token None"""
+        keys, args = self.service.acquire_lock_args(
+            trip_id, seat_id, user_session, seat_index, await self.get_trip_vehicle_id(trip_id)
+        )
+        token, version = await self.clients.acquire_lock_script(keys=keys, args=args)
+        if token == SEAT_STATE_COLD:
+            # Bitmap yüklenip (araç değiştiyse indeks yeniden hesaplanıp) bir kez daha
+            # denenir, yine yüklü değilse kilit verilmez
+            await self.ensure_seat_state(trip_id)
+            seat_index = await self.get_seat_index(trip_id, seat_id)
+            if seat_index is None:
+                return None, 0
+            keys, args = self.service.acquire_lock_args(
+                trip_id, seat_id, user_session, seat_index, await self.get_trip_vehicle_id(trip_id)
+            )
+            token, version = await self.clients.acquire_lock_script(keys=keys, args=args)
+        return (token if token > 0 else None), version
+
+    async def extend_temporary_lock(self, trip_id, seat_id, user_session):
+        """Geçici kilidin süresini uzat, kilit başkasınınsa None döner"""
+        keys, args = self.service.extend_lock_args(trip_id, seat_id, user_session)
+        return await self.clients.extend_lock_script(keys=keys, args=args) or None
+
+    async def release_temporary_lock(self, trip_id, seat_id, user_session):
+        """Geçici kilidi serbest bırak"""
+        try:
+            seat_index = await self.get_seat_index(trip_id, seat_id)
+        except Trip.DoesNotExist:
+            seat_index = None
+
+        keys, args = self.service.release_lock_args(
+            trip_id, seat_id, user_session, -1 if seat_index is None else seat_index
+        )
+        released, version = await self.clients.release_lock_script(keys=keys, args=args)
+        # Bu arada rezerve edilen koltuk boşalmış yayınlanmaz (versiyon 0)
+        if version:
+            await self.broadcast_seat_update(trip_id, {seat_id: 'available'}, version)
+        return bool(released)
+
+    async def get_seat_sync(self, trip_id, since_version=None):
+        """İstemcinin versiyonuna göre kaçırılan delta'yı veya tam snapshot'ı gönderime hazır metin olarak döndür"""
+        pipe = self.clients.redis_client.pipeline(transaction=False)
+        pipe.get(f"trip_seat_version_{trip_id}")
+        pipe.lrange(f"trip_seat_deltas_{trip_id}", 0, -1)
+        pipe.hmget(f"trip_seat_snapshot_{trip_id}", 'version', 'payload')
+        current_version, entries, (snapshot_version, payload) = await pipe.execute()
+        current_version = int(current_version or 0)
+
+        message = self.service.merge_seat_deltas(trip_id, since_version, current_version, entries)
+        if message is not None:
+            return encode_message(message)
+
+        fresh = payload is not None and int(snapshot_version) == current_version
+        metrics.record_cache('seat_snapshot', fresh)
+        if fresh:
+            return payload
+
+        seats = await self.get_trip_seats(trip_id)
+        if not seats:
+            return None
+        payload = encode_message(self.service.seat_snapshot_message(trip_id, current_version, seats))
+        keys, args = self.service.store_snapshot_args(trip_id, current_version, payload)
+        await self.clients.store_snapshot_script(keys=keys, args=args)
+        return payload
+
+    async def broadcast_seat_update(self, trip_id, changes, version):
+        """Koltuk değişikliklerini script'in verdiği versiyonla yayınla"""
+        # Pencere açıksa değişiklikler bu loop'ta birleştirilir; senkron servisin
+        # arka plan birleştiricisi (thread kilidi) kullanılmaz
+        pending = self.clients.pending_broadcasts
+        key = str(trip_id)
+        first = key not in pending
+        _, seats, versions = pending.setdefault(key, (trip_id, {}, set()))
+        # Aynı koltuk için büyük versiyonlu durum geçerli
+        self.service.merge_seat_changes(seats, changes, version)
+        versions.add(version)
+
+        if settings.SEAT_BROADCAST_WINDOW_MS <= 0:
+            await self._publish_seat_delta(*pending.pop(key))
+        elif first:
+            asyncio.get_running_loop().call_later(
+                settings.SEAT_BROADCAST_WINDOW_MS / 1000, self._start_flush, key
+            )
+
+    def _start_flush(self, key):
+        clients = self.clients
+        pending = clients.pending_broadcasts.pop(key)
+        # Görev referansı tutulmazsa tamamlanmadan toplanabilir
+        task = asyncio.get_running_loop().create_task(self._publish_seat_delta(*pending))
+        clients.broadcast_tasks.add(task)
+        task.add_done_callback(clients.broadcast_tasks.discard)
+
+    async def _publish_seat_delta(self, trip_id, seats, versions):
+        try:
+            await self.service.group_send(
+                trip_id, self.service.seat_delta_message(trip_id, seats, versions)
+            )
+        except Exception as e:
+            logger.error(f"WebSocket broadcast hatası: {str(e)}")
+
+# Singleton instance
+async_seat_service = AsyncSeatReservationService(seat_service)
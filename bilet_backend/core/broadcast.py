@@ -0,0 +1,91 @@
+import asyncio
+import atexit
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SeatBroadcastCoalescer:
+    """Sefer başına koltuk değişikliklerini kısa bir pencerede birleştirip tek yayın yapar
+
+    Değişiklikler istek thread'inden sadece bir sözlüğe yazılır; yayın işi
+    arka plandaki kendi event loop'unda çalışır, böylece channel layer
+    gecikmesi select_seat gibi isteklerin süresine eklenmez. Versiyonlar
+    değişikliği yapan script'te verilir, burada sadece gönderim birleştirilir.
+    """
+
+    def __init__(self, service, window):
+        self.service = service
+        self.window = window
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+        atexit.register(self.flush)
+
+    def schedule(self, trip_id, changes, version):
+        """Değişiklikleri sefer kuyruğuna ekle, pencere sonunda tek seferde yayınlanır"""
+        key = str(trip_id)
+        with self._lock:
+            pending = self._pending.get(key)
+            _, seats, versions = self._pending.setdefault(key, (trip_id, {}, set()))
+            # Aynı koltuk için büyük versiyonlu durum geçerli
+            self.service.merge_seat_changes(seats, changes, version)
+            versions.add(version)
+
+        if pending is None:
+            loop = self._get_loop()
+            loop.call_soon_threadsafe(loop.call_later, self.window, self._start_flush, key)
+
+    def flush(self, timeout=5):
+        """Bekleyen tüm değişiklikleri yayınla ve bitmesini bekle (kapanışta kullanılır)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self._loop is None or self._pid != os.getpid():
+            return
+
+        # Kapanışta async_to_sync'in thread havuzu kapanmış olur, bu yüzden
+        # mesajlar hâlâ çalışan arka plan loop'una gönderilir
+        futures = [
+            asyncio.run_coroutine_threadsafe(
+                self._publish(trip_id, self.service.seat_delta_message(trip_id, seats, versions)),
+                self._loop
+            )
+            for trip_id, seats, versions in pending.values()
+        ]
+        for future in futures:
+            future.result(timeout)
+
+    def _get_loop(self):
+        # Fork sonrası (gunicorn/celery worker) thread'i yeniden başlat
+        if self._loop is None or self._pid != os.getpid():
+            with self._lock:
+                if self._loop is None or self._pid != os.getpid():
+                    self._loop = asyncio.new_event_loop()
+                    self._pid = os.getpid()
+                    threading.Thread(
+                        target=self._loop.run_forever,
+                        name='seat-broadcast',
+                        daemon=True
+                    ).start()
+        return self._loop
+
+    def _start_flush(self, key):
+        self._loop.create_task(self._flush(key))
+
+    async def _flush(self, key):
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+
+        trip_id, seats, versions = pending
+        await self._publish(trip_id, self.service.seat_delta_message(trip_id, seats, versions))
+
+    async def _publish(self, trip_id, message):
+        try:
+            await self.service.group_send(trip_id, message)
+        except Exception as e:
+            logger.error(f"WebSocket broadcast hatası: {str(e)}")
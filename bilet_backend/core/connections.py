@@ -0,0 +1,111 @@
+import threading
+import redis
+from django.conf import settings
+from django.db import connections
+from django_redis.pool import ConnectionFactory
+from .metrics import redis_connection_class
+
+_redis_pools = {}
+_redis_pools_lock = threading.Lock()
+
+
+class TrackedConnectionPool(redis.BlockingConnectionPool):
+    """Açtığı ve kullanımda olan bağlantıları kendisi sayan havuz
+
+    İstatistikler redis-py'nin iç yapılarına (_connections, pool.queue)
+    bakmadan get_pool_stats'e verilir.
+    """
+
+    def reset(self):
+        # Fork sonrası da çağrılır; pid ataması üst sınıfta en son yapılmalı
+        self._stats_lock = threading.Lock()
+        self._in_use = set()
+        self.created_connections = 0
+        super().reset()
+
+    def make_connection(self):
+        connection = super().make_connection()
+        with self._stats_lock:
+            self.created_connections += 1
+        return connection
+
+    def get_connection(self, *args, **kwargs):
+        connection = super().get_connection(*args, **kwargs)
+        with self._stats_lock:
+            self._in_use.add(connection)
+        return connection
+
+    def release(self, connection):
+        # Bağlanamayan bağlantıyı üst sınıf da buradan geri bırakır
+        with self._stats_lock:
+            self._in_use.discard(connection)
+        super().release(connection)
+
+    def usage(self):
+        with self._stats_lock:
+            created, in_use = self.created_connections, len(self._in_use)
+        return {
+            'max_connections': self.max_connections,
+            'created_connections': created,
+            'in_use_connections': in_use,
+            'idle_connections': max(created - in_use, 0),
+        }
+
+
+def get_redis_pool(decode_responses=False):
+    """Süreç genelinde paylaşılan, boyutu sınırlı Redis havuzu
+
+    decode_responses bağlantı düzeyinde bir ayar olduğu için ham (bytes) ve
+    çözülmüş (str) istemciler için iki havuz tutulur; cache ham havuzu kullanır.
+    Havuz doluysa yeni bağlantı açmak yerine REDIS_POOL_TIMEOUT kadar beklenir.
+    """
+    pool = _redis_pools.get(decode_responses)
+    if pool is None:
+        with _redis_pools_lock:
+            pool = _redis_pools.get(decode_responses)
+            if pool is None:
+                pool = _redis_pools[decode_responses] = TrackedConnectionPool(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    db=settings.REDIS_DB,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT,
+                    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+                    socket_keepalive=True,
+                    decode_responses=decode_responses,
+                    connection_class=redis_connection_class()
+                )
+    return pool
+
+
+def get_redis_client(decode_responses=False):
+    return redis.StrictRedis(connection_pool=get_redis_pool(decode_responses))
+
+
+class SharedPoolConnectionFactory(ConnectionFactory):
+    """django_redis cache'inin servislerle aynı ham Redis havuzunu kullanmasını sağlar"""
+
+    def get_or_create_connection_pool(self, params):
+        return get_redis_pool()
+
+
+def get_pool_stats():
+    """Redis ve veritabanı havuzlarının kullanım durumu"""
+    stats = {'redis': {}, 'database': {}}
+
+    for decode_responses, pool in list(_redis_pools.items()):
+        stats['redis']['decoded' if decode_responses else 'raw'] = pool.usage()
+
+    for alias in connections:
+        connection = connections[alias]
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            # Django 5.1+ native havuz (psycopg_pool)
+            stats['database'][alias] = {'mode': 'pool', **pool.get_stats()}
+        else:
+            stats['database'][alias] = {
+                'mode': settings.DB_CONNECTION_MODE,
+                'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+                'connected': connection.connection is not None,
+            }
+    return stats
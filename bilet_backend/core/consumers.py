@@ -1,15 +1,24 @@
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
 from django.core.cache import cache
+from . import metrics
+from .profiling import ProfiledConsumerMixin
 import logging
 
 logger = logging.getLogger(__name__)
 
-class TripSeatConsumer(AsyncWebsocketConsumer):
+class TripSeatConsumer(ProfiledConsumerMixin, AsyncWebsocketConsumer):
+    # Bağlantı sayacı sadece kabul edilen bağlantılarda artırılır/azaltılır
+    connection_counted = False
+
     async def connect(self):
         self.trip_id = self.scope['url_route']['kwargs']['trip_id']
         self.trip_group_name = f'trip_{self.trip_id}'
+        trip_label = metrics.trip_label(self.trip_id)
+        self.connections_metric = metrics.WEBSOCKET_CONNECTIONS.labels(trip_label)
+        self.messages_in_metric = metrics.WEBSOCKET_MESSAGES.labels(trip_label, 'in')
+        self.messages_out_metric = metrics.WEBSOCKET_MESSAGES.labels(trip_label, 'out')
         
         # Gruba katıl
         await self.channel_layer.group_add(
@@ -18,15 +27,13 @@ class TripSeatConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        self.connections_metric.inc()
+        self.connection_counted = True
         
-        # İlk bağlantıda mevcut koltuk durumlarını gönder
-        seat_data = await self.get_trip_seats()
-        if seat_data:
-            await self.send(text_data=json.dumps({
-                'type': 'initial_seats',
-                'trip_id': self.trip_id,
-                'seats': seat_data
-            }))
+        # İlk bağlantıda mevcut koltuk durumlarını gönder. Yeniden bağlanan
+        # istemci son versiyonunu gönderirse sadece kaçırdığı değişiklikler gider.
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        await self.send_seat_sync(self.parse_version(query.get('version', [None])[0]))
 
     async def disconnect(self, close_code):
         # Gruptan ayrıl
@@ -34,9 +41,17 @@ class TripSeatConsumer(AsyncWebsocketConsumer):
             self.trip_group_name,
             self.channel_name
         )
+        if self.connection_counted:
+            self.connections_metric.dec()
+            self.connection_counted = False
+
+    async def send(self, *args, **kwargs):
+        self.messages_out_metric.inc()
+        await super().send(*args, **kwargs)
 
     # WebSocket'ten mesaj al
     async def receive(self, text_data):
+        self.messages_in_metric.inc()
         try:
             text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type')
@@ -45,6 +60,10 @@ class TripSeatConsumer(AsyncWebsocketConsumer):
                 await self.handle_seat_select(text_data_json)
             elif message_type == 'seat_release':
                 await self.handle_seat_release(text_data_json)
+            elif message_type == 'seat_extend':
+                await self.handle_seat_extend(text_data_json)
+            elif message_type == 'sync':
+                await self.send_seat_sync(self.parse_version(text_data_json.get('version')))
             elif message_type == 'ping':
                 await self.send(text_data=json.dumps({
                     'type': 'pong',
@@ -76,13 +95,14 @@ class TripSeatConsumer(AsyncWebsocketConsumer):
             return
 
         # Servise delegate et
-        success, message = await self.create_temp_lock(seat_id, user_session)
+        success, message, fencing_token = await self.create_temp_lock(seat_id, user_session)
         
         await self.send(text_data=json.dumps({
             'type': 'seat_select_response',
             'success': success,
             'message': message,
-            'seat_id': seat_id
+            'seat_id': seat_id,
+            'fencing_token': fencing_token
         }))
 
     async def handle_seat_release(self, data):
@@ -96,33 +116,66 @@ class TripSeatConsumer(AsyncWebsocketConsumer):
         # Servise delegate et
         await self.release_temp_lock(seat_id, user_session)
 
+    async def handle_seat_extend(self, data):
+        """Geçici kilit süresini uzat"""
+        seat_id = data.get('seat_id')
+        user_session = data.get('user_session')
+        
+        if not seat_id or not user_session:
+            return
+
+        fencing_token = await self.extend_temp_lock(seat_id, user_session)
+        
+        await self.send(text_data=json.dumps({
+            'type': 'seat_extend_response',
+            'success': fencing_token is not None,
+            'seat_id': seat_id,
+            'fencing_token': fencing_token
+        }))
+
+    async def send_seat_sync(self, since_version):
+        """Kaçırılan delta'yı veya tam snapshot'ı gönder"""
+        payload = await self.get_seat_sync(since_version)
+        if payload is not None:
+            await self.send(text_data=payload)
+
+    @staticmethod
+    def parse_version(version):
+        try:
+            return int(version)
+        except (TypeError, ValueError):
+            return None
+
     # Grup mesajlarını işle
     async def seat_update(self, event):
         """Koltuk güncellemesi yayınla"""
-        message = event['message']
-        
-        await self.send(text_data=json.dumps(message))
+        # Mesaj yayın sırasında bir kez kodlandı, her bağlantı için tekrar kodlanmaz
+        await self.send(text_data=event['text'])
 
-    # Database operasyonları
-    @database_sync_to_async
-    def get_trip_seats(self):
+    # Servis operasyonları (async Redis/ORM, thread havuzuna çıkmaz)
+    async def get_seat_sync(self, since_version):
         """Koltuk verilerini getir"""
-        from .services import seat_service
-        return seat_service.get_trip_seats(self.trip_id)
+        from .async_services import async_seat_service
+        return await async_seat_service.get_seat_sync(self.trip_id, since_version)
 
-    @database_sync_to_async
-    def create_temp_lock(self, seat_id, user_session):
+    async def create_temp_lock(self, seat_id, user_session):
         """Geçici kilit oluştur"""
-        from .services import seat_service
-        return seat_service.create_temporary_lock(
+        from .async_services import async_seat_service
+        return await async_seat_service.create_temporary_lock(
+            self.trip_id, seat_id, user_session
+        )
+
+    async def extend_temp_lock(self, seat_id, user_session):
+        """Geçici kilidi uzat"""
+        from .async_services import async_seat_service
+        return await async_seat_service.extend_temporary_lock(
             self.trip_id, seat_id, user_session
         )
 
-    @database_sync_to_async
-    def release_temp_lock(self, seat_id, user_session):
+    async def release_temp_lock(self, seat_id, user_session):
         """Geçici kilidi bırak"""
-        from .services import seat_service
-        return seat_service.release_temporary_lock(
+        from .async_services import async_seat_service
+        return await async_seat_service.release_temporary_lock(
             self.trip_id, seat_id, user_session
         )
 
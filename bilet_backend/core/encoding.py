@@ -0,0 +1,13 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def encode_message(message):
+    """WebSocket mesajını tek seferde JSON metnine çevir (orjson varsa onunla)"""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(',', ':'), ensure_ascii=False)
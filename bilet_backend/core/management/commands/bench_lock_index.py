@@ -0,0 +1,105 @@
+import statistics
+import time
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services import ACQUIRE_SEAT_LOCK_SCRIPT, SeatReservationService
+
+
+class Command(BaseCommand):
+    help = (
+        "Sefer kilit listesinin gecikmesini ilgisiz anahtar sayısına göre ölçer "
+        "(eski SCAN yöntemi ile sefer kilit indeksi karşılaştırması). "
+        "Sadece atılabilir bir Redis veritabanında çalıştırın."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--db', type=int, default=15,
+                            help='Kullanılacak (atılabilir) Redis veritabanı')
+        parser.add_argument('--sizes', default='0,10000,100000,1000000',
+                            help='Virgülle ayrılmış ilgisiz anahtar sayıları')
+        parser.add_argument('--locks', type=int, default=20,
+                            help='Ölçülen seferdeki geçici kilit sayısı')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--skip-scan', action='store_true',
+                            help='Eski SCAN ölçümünü atla (büyük boyutlarda yavaştır)')
+
+    def handle(self, *args, **options):
+        client = redis.StrictRedis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=options['db'],
+            decode_responses=True
+        )
+        service = SeatReservationService()
+        service.redis_client = client
+        service.acquire_lock_script = client.register_script(ACQUIRE_SEAT_LOCK_SCRIPT)
+
+        trip_id = 'bench'
+        for seat_id in range(1, options['locks'] + 1):
+            service.acquire_seat_lock(trip_id, seat_id, 'bench')
+
+        self.stdout.write(f"{'keys':>10} {'scan p50 ms':>12} {'index p50 ms':>13} {'index p99 ms':>13}")
+        populated = 0
+        try:
+            for size in sorted(int(size) for size in options['sizes'].split(',')):
+                populated = self._populate_noise(client, populated, size)
+
+                scan_p50 = None
+                if not options['skip_scan']:
+                    scan = self._measure(
+                        lambda: list(client.scan_iter(match=f"seat_lock_{trip_id}_*")),
+                        options['iterations']
+                    )
+                    scan_p50 = statistics.median(scan)
+
+                index = self._measure(
+                    lambda: service.get_locked_seat_ids(trip_id),
+                    options['iterations']
+                )
+                index_p99 = sorted(index)[int(len(index) * 0.99) - 1]
+
+                self.stdout.write(
+                    f"{size:>10} "
+                    f"{'-' if scan_p50 is None else f'{scan_p50:.3f}':>12} "
+                    f"{statistics.median(index):>13.3f} {index_p99:>13.3f}"
+                )
+        finally:
+            self._cleanup(client, service, trip_id, options['locks'])
+
+    def _populate_noise(self, client, start, size, batch=10000):
+        """İlgisiz anahtarları toplu MSET ile yükle"""
+        for offset in range(start, size, batch):
+            client.mset({
+                f"bench_noise_{i}": 1 for i in range(offset, min(offset + batch, size))
+            })
+        return max(start, size)
+
+    def _measure(self, func, iterations):
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def _cleanup(self, client, service, trip_id, locks):
+        client.delete(
+            f"trip_seat_locks_{trip_id}", f"trip_seat_fence_{trip_id}",
+            *service.seat_delta_keys(trip_id)
+        )
+        client.delete(*[f"seat_lock_{trip_id}_{seat_id}" for seat_id in range(1, locks + 1)])
+        client.zrem(
+            service.lock_expiry_queue_key,
+            *[f"{trip_id}:{seat_id}" for seat_id in range(1, locks + 1)]
+        )
+        batch = []
+        for key in client.scan_iter(match="bench_noise_*", count=10000):
+            batch.append(key)
+            if len(batch) >= 10000:
+                client.delete(*batch)
+                batch = []
+        if batch:
+            client.delete(*batch)
@@ -0,0 +1,62 @@
+import time
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.pnr import PnrAllocator
+
+
+class Command(BaseCommand):
+    help = (
+        "PNR üretici hızını ölçer ve üretilen kodların benzersizliğini doğrular. "
+        "Postgres'te geçici bir sequence, diğer veritabanlarında atılabilir "
+        "Redis veritabanını kullanır; gerçek PNR sequence'ına dokunmaz."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--db', type=int, default=15,
+                            help='Kullanılacak (atılabilir) Redis veritabanı')
+        parser.add_argument('--count', type=int, default=200000,
+                            help='Üretilecek PNR sayısı')
+        parser.add_argument('--block-sizes', default='1,100,1000',
+                            help='Virgülle ayrılmış Redis blok boyutları')
+
+    def handle(self, *args, **options):
+        client = redis.StrictRedis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=options['db']
+        )
+        count = options['count']
+
+        self.stdout.write(f"{'block':>8} {'codes/s':>12} {'fetches':>12} {'unique':>8}")
+        for block_size in (int(size) for size in options['block_sizes'].split(',')):
+            allocator = PnrAllocator(block_size=block_size)
+            allocator._redis_client = client
+            allocator.sequence_key = "bench_pnr_sequence"
+            allocator.sequence_name = "bench_pnr_seq"
+            self._reset_sequence(client, allocator)
+
+            started = time.perf_counter()
+            codes = [allocator.allocate() for _ in range(count)]
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{block_size:>8} {count / elapsed:>12.0f} "
+                f"{-(-count // block_size):>12} {str(len(set(codes)) == count):>8}"
+            )
+            self._drop_sequence(client, allocator)
+
+    def _reset_sequence(self, client, allocator):
+        self._drop_sequence(client, allocator)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE SEQUENCE {allocator.sequence_name}")
+
+    def _drop_sequence(self, client, allocator):
+        client.delete(allocator.sequence_key)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP SEQUENCE IF EXISTS {allocator.sequence_name}")
@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.management.fixtures import (
+    create_bench_fixtures, delete_bench_fixtures, delete_bench_seat_state
+)
+from core.models import Reservation
+from core.services import seat_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Tek sefer üzerinde eşzamanlı rezervasyon hızını kilit modlarına göre karşılaştırır "
+        "(sefer satırı kilidi ile koltuk bazında özellik). Geçici kayıtlar oluşturup siler; "
+        "üretim veritabanında çalıştırmayın."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='trip,seat',
+                            help="Virgülle ayrılmış kilit modları ('trip', 'seat')")
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--rounds', type=int, default=10,
+                            help='Her turda seferin tüm koltukları rezerve edilir')
+
+    def handle(self, *args, **options):
+        trip, user = create_bench_fixtures(
+            'bench_contention@biletal.com', 'Bench', 'Bench', 'bus', 40, price=1
+        )
+        seat_ids = list(trip.vehicle.seats.values_list('id', flat=True))
+        original_mode = seat_service.reservation_lock_mode
+
+        self.stdout.write(f"{'mode':>6} {'reservations':>13} {'res/s':>10} {'failed':>7}")
+        try:
+            for mode in options['modes'].split(','):
+                seat_service.reservation_lock_mode = mode
+                done = failed = 0
+                elapsed = 0.0
+                for _ in range(options['rounds']):
+                    tokens = {
+                        seat_id: seat_service.acquire_seat_lock(
+                            trip.id, seat_id, f"bench_{seat_id}",
+                            seat_service.get_seat_index(trip.id, seat_id)
+                        )[0]
+                        for seat_id in seat_ids
+                    }
+
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(options['workers']) as executor:
+                        results = list(executor.map(
+                            lambda seat_id: self._reserve(trip, user, seat_id, tokens[seat_id]),
+                            seat_ids
+                        ))
+                    elapsed += time.perf_counter() - started
+
+                    done += sum(results)
+                    failed += len(results) - sum(results)
+                    self._reset(trip)
+
+                self.stdout.write(f"{mode:>6} {done:>13} {done / elapsed:>10.1f} {failed:>7}")
+        finally:
+            seat_service.reservation_lock_mode = original_mode
+            self._reset(trip)
+            delete_bench_fixtures(trip, user)
+
+    def _reserve(self, trip, user, seat_id, token):
+        try:
+            reservation, _ = seat_service.create_reservation(
+                trip.id, seat_id, {'phone': user.id}, f"bench_{seat_id}", token
+            )
+            return reservation is not None
+        finally:
+            connection.close()
+
+    def _reset(self, trip):
+        """Turun rezervasyonlarını ve Redis durumunu temizle"""
+        reservation_ids = list(Reservation.objects.filter(trip=trip).values_list('id', flat=True))
+        Reservation.objects.filter(id__in=reservation_ids).delete()
+        delete_bench_seat_state(
+            trip.id, list(trip.vehicle.seats.values_list('id', flat=True)), reservation_ids
+        )
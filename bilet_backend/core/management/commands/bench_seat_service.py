@@ -0,0 +1,340 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.management.fixtures import create_bench_company_route, create_bench_trip
+from core.models import User, Vehicle, Trip, Reservation
+from core.pnr import pnr_allocator
+from core.services import seat_service
+
+CASES = [
+    'get_trip_seats_cold',
+    'get_trip_seats_warm',
+    'create_temporary_lock',
+    'release_temporary_lock',
+    'broadcast_seat_update',
+    'cleanup_expired_reservations',
+    'generate_unique_pnr',
+]
+
+LAYOUT_TYPES = {40: 'bus', 80: 'train', 180: 'plain'}
+
+FILLER_KEY_PREFIX = 'bench_filler:'
+
+
+def parse_sizes(value):
+    return [int(size) for size in value.split(',') if size]
+
+
+class Command(BaseCommand):
+    help = (
+        "SeatReservationService sıcak yollarını (get_trip_seats soğuk/sıcak, geçici kilit "
+        "alma/bırakma, yayın, süre dolumu temizliği, PNR üretimi) koltuk düzeni, "
+        "rezervasyon hacmi ve ilgisiz Redis anahtarı sayısına göre parametrik ölçer. "
+        "Ayarlardaki veritabanı ve Redis'e doldurma verisi yazar; sadece atılabilir "
+        "PostgreSQL ve Redis ile çalıştırın. "
+        "Örnek: --seats 40,80,180 --reservations 1000,1000000 --redis-keys 10000,10000000"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seats', default='40,80,180',
+                            help='Virgülle ayrılmış araç koltuk sayıları')
+        parser.add_argument('--reservations', default='1000,10000',
+                            help='Virgülle ayrılmış arka plan rezervasyon sayıları')
+        parser.add_argument('--redis-keys', default='10000,100000',
+                            help="Virgülle ayrılmış ilgisiz Redis anahtarı sayıları")
+        parser.add_argument('--cases', default=','.join(CASES),
+                            help='Virgülle ayrılmış ölçümler')
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--expire-batch', type=int, default=100,
+                            help='cleanup ölçümünde her turda süresi dolan rezervasyon sayısı')
+        parser.add_argument('--output', help='Sonuçların yazılacağı JSON dosyası')
+
+    def handle(self, *args, **options):
+        cases = options['cases'].split(',')
+        unknown = set(cases) - set(CASES)
+        if unknown:
+            raise CommandError(f"Bilinmeyen ölçüm: {', '.join(sorted(unknown))}")
+
+        self.iterations = options['iterations']
+        self.expire_batch = options['expire_batch']
+        self._create_fixtures(parse_sizes(options['seats']))
+
+        results = []
+        self.stdout.write(
+            f"{'case':>30} {'seats':>6} {'reservations':>12} {'redis_keys':>10} "
+            f"{'median_us':>10} {'p95_us':>10} {'ops/s':>10}"
+        )
+        try:
+            # Hacimler artan sırada doldurulur, her adımda sadece eksik kısım eklenir
+            for reservations in sorted(parse_sizes(options['reservations'])):
+                self._fill_reservations(reservations)
+                for redis_keys in sorted(parse_sizes(options['redis_keys'])):
+                    self._fill_redis_keys(redis_keys)
+                    for case in cases:
+                        # PNR üretimi koltuk düzeninden bağımsızdır
+                        seat_counts = [None] if case == 'generate_unique_pnr' else self.trips
+                        for seats in seat_counts:
+                            samples = getattr(self, f"_bench_{case}")(self.trips.get(seats))
+                            results.append(self._record(
+                                case, seats, reservations, redis_keys, samples
+                            ))
+        finally:
+            self._cleanup()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Sonuçlar {options['output']} dosyasına yazıldı"))
+
+    def _record(self, case, seats, reservations, redis_keys, samples):
+        ordered = sorted(samples)
+        median = ordered[len(ordered) // 2]
+        result = {
+            'case': case,
+            'seats': seats,
+            'reservations': reservations,
+            'redis_keys': redis_keys,
+            'iterations': len(ordered),
+            'min_us': round(ordered[0] * 1e6, 2),
+            'median_us': round(median * 1e6, 2),
+            'p95_us': round(ordered[int(len(ordered) * 0.95)] * 1e6, 2),
+            'ops_per_second': round(1 / median, 1) if median else None,
+        }
+        self.stdout.write(
+            f"{case:>30} {seats or '-':>6} {reservations:>12} {redis_keys:>10} "
+            f"{result['median_us']:>10.1f} {result['p95_us']:>10.1f} "
+            f"{result['ops_per_second'] or 0:>10.0f}"
+        )
+        return result
+
+    def _time(self, run, setup=None):
+        """Her tur setup dışında ölçülür"""
+        samples = []
+        for iteration in range(self.iterations):
+            argument = setup(iteration) if setup else iteration
+            started = time.perf_counter()
+            run(argument)
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    # Ölçümler
+
+    def _bench_get_trip_seats_cold(self, trip):
+        def reset(_):
+            # Süreç içi önbellekler, düzen cache'i ve sefer bitmap'i silinir
+            seat_service._trip_vehicles.clear()
+            seat_service._seat_layouts.clear()
+            seat_service._seat_indexes.clear()
+            seat_service.delete_seat_layouts([trip.vehicle_id])
+            seat_service.redis_client.delete(
+                f"trip_seat_state_{trip.id}", f"trip_reserved_bits_{trip.id}"
+            )
+
+        return self._time(lambda _: seat_service.get_trip_seats(trip.id), reset)
+
+    def _bench_get_trip_seats_warm(self, trip):
+        seat_service.get_trip_seats(trip.id)
+        return self._time(lambda _: seat_service.get_trip_seats(trip.id))
+
+    def _bench_create_temporary_lock(self, trip):
+        seat_ids = trip.free_seat_ids
+
+        def release_previous(iteration):
+            if iteration:
+                seat_id = seat_ids[(iteration - 1) % len(seat_ids)]
+                seat_service.release_temporary_lock(trip.id, seat_id, f"bench_{iteration - 1}")
+            return iteration
+
+        samples = self._time(
+            lambda iteration: seat_service.create_temporary_lock(
+                trip.id, seat_ids[iteration % len(seat_ids)], f"bench_{iteration}"
+            ),
+            release_previous
+        )
+        release_previous(self.iterations)
+        return samples
+
+    def _bench_release_temporary_lock(self, trip):
+        seat_ids = trip.free_seat_ids
+
+        def lock(iteration):
+            seat_id = seat_ids[iteration % len(seat_ids)]
+            seat_service.create_temporary_lock(trip.id, seat_id, f"bench_{iteration}")
+            return iteration
+
+        return self._time(
+            lambda iteration: seat_service.release_temporary_lock(
+                trip.id, seat_ids[iteration % len(seat_ids)], f"bench_{iteration}"
+            ),
+            lock
+        )
+
+    def _bench_broadcast_seat_update(self, trip):
+        # Birleştirici kapatılır: mesaj oluşturma ve group_send istek içinde ölçülür
+        broadcaster, seat_service.broadcaster = seat_service.broadcaster, None
+        seat_ids = trip.free_seat_ids
+        try:
+            return self._time(
+                lambda iteration: seat_service.broadcast_seat_update(
+                    trip.id, {seat_ids[iteration % len(seat_ids)]: 'available'}, iteration + 1
+                )
+            )
+        finally:
+            seat_service.broadcaster = broadcaster
+
+    def _bench_cleanup_expired_reservations(self, trip):
+        seat_ids = trip.free_seat_ids[:self.expire_batch]
+
+        def expire(_):
+            self._create_reservations(
+                trip, seat_ids, 'pending', timezone.now() - timedelta(minutes=1)
+            )
+
+        samples = self._time(lambda _: seat_service.cleanup_expired_reservations(), expire)
+        Reservation.objects.filter(trip=trip, status='expired').delete()
+        return samples
+
+    def _bench_generate_unique_pnr(self, trip):
+        reservation = Reservation()
+        return self._time(lambda _: reservation.generate_unique_pnr())
+
+    # Veri hazırlama
+
+    def _create_fixtures(self, seat_counts):
+        self.user = User.objects.create_user(email='bench_seat_service@biletal.com', password=None)
+        self.company, self.route = create_bench_company_route('Bench Seat Service', 'Bench')
+        self.departure = timezone.now() + timedelta(days=730)
+
+        vehicles = {
+            seats: Vehicle.objects.create(
+                vehicle_type=LAYOUT_TYPES.get(seats, 'plain'), capacity=seats
+            )
+            for seats in seat_counts
+        }
+        # Arka plan rezervasyonları ayrı bir aracın seferlerine yazılır
+        # (koltuklar araç sinyaliyle oluşturulur)
+        self.filler_vehicle = Vehicle.objects.create(vehicle_type='plain', capacity=180)
+        self.filler_seat_ids = list(self.filler_vehicle.seats.values_list('id', flat=True))
+        self.filler_reservations = 0
+        self.filler_trips = 0
+        self.filler_keys = 0
+
+        self.trips = {}
+        for seats, vehicle in vehicles.items():
+            trip = self._create_trip(vehicle, self.departure)
+            seat_ids = list(vehicle.seats.order_by('row_number', 'seat_letter')
+                            .values_list('id', flat=True))
+            # Ölçülen seferin yarısı dolu, kilit ve temizlik diğer yarıda çalışır
+            self._create_reservations(trip, seat_ids[::2], 'confirmed')
+            trip.free_seat_ids = seat_ids[1::2]
+            self.trips[seats] = trip
+
+    def _create_trip(self, vehicle, departure):
+        return create_bench_trip(self.company, self.route, vehicle, departure, price=100)
+
+    def _create_reservations(self, trip, seat_ids, status, expires_at=None):
+        return Reservation.objects.bulk_create([
+            Reservation(
+                user=self.user,
+                trip=trip,
+                seat_id=seat_id,
+                passenger_phone='bench',
+                status=status,
+                expires_at=expires_at or self.departure,
+                total_price=trip.price,
+                pnr_code=pnr_code
+            )
+            for seat_id, pnr_code in zip(seat_ids, pnr_allocator.allocate_many(len(seat_ids)))
+        ], batch_size=5000)
+
+    def _fill_reservations(self, target):
+        """Arka plan rezervasyonlarını hedef sayıya tamamla (çoğu onaylı, kalanı kapanmış)"""
+        seats_per_trip = len(self.filler_seat_ids)
+        while self.filler_reservations < target:
+            count = min(target - self.filler_reservations, seats_per_trip * 50)
+            trips = Trip.objects.bulk_create([
+                Trip(
+                    company=self.company,
+                    vehicle=self.filler_vehicle,
+                    route=self.route,
+                    departure_time=self.departure + timedelta(minutes=self.filler_trips + index),
+                    arrival_time=self.departure + timedelta(days=1),
+                    price=100,
+                    available_seats=seats_per_trip
+                )
+                for index in range(-(-count // seats_per_trip))
+            ])
+            rows = [
+                (trip, seat_id)
+                for trip in trips for seat_id in self.filler_seat_ids
+            ][:count]
+            pnr_codes = pnr_allocator.allocate_many(len(rows))
+            Reservation.objects.bulk_create([
+                Reservation(
+                    user=self.user,
+                    trip=trip,
+                    seat_id=seat_id,
+                    passenger_phone='bench',
+                    status='confirmed' if index % 5 else 'expired',
+                    expires_at=self.departure,
+                    total_price=100,
+                    pnr_code=pnr_code
+                )
+                for index, ((trip, seat_id), pnr_code) in enumerate(zip(rows, pnr_codes))
+            ], batch_size=5000)
+            self.filler_reservations += count
+            self.filler_trips += len(trips)
+
+    def _fill_redis_keys(self, target):
+        pipe = seat_service.redis_client.pipeline(transaction=False)
+        for index in range(self.filler_keys, target):
+            pipe.set(f"{FILLER_KEY_PREFIX}{index}", index)
+            if index % 10000 == 9999:
+                pipe.execute()
+        pipe.execute()
+        self.filler_keys = max(self.filler_keys, target)
+
+    def _cleanup(self):
+        """Ölçüm verilerini ve Redis anahtarlarını sil"""
+        client = seat_service.redis_client
+        trip_ids = list(Trip.objects.filter(company=self.company).values_list('id', flat=True))
+        reservation_ids = list(
+            Reservation.objects.filter(trip_id__in=[trip.id for trip in self.trips.values()])
+            .values_list('id', flat=True)
+        )
+
+        pipe = client.pipeline(transaction=False)
+        for trip_id in trip_ids:
+            pipe.delete(*[
+                f"{prefix}_{trip_id}" for prefix in (
+                    'trip_reserved_bits', 'trip_seat_state', 'trip_seat_locks',
+                    'trip_seat_fence', 'trip_seat_version', 'trip_seat_deltas',
+                    'trip_seat_snapshot', 'trip_reserved_writes',
+                )
+            ])
+        for reservation_id in reservation_ids:
+            pipe.delete(f"reservation_lock_{reservation_id}")
+        if reservation_ids:
+            pipe.zrem(seat_service.expiry_queue_key, *reservation_ids)
+        pipe.execute()
+
+        batch = []
+        for key in client.scan_iter(match=f"{FILLER_KEY_PREFIX}*", count=10000):
+            batch.append(key)
+            if len(batch) >= 10000:
+                client.unlink(*batch)
+                batch = []
+        if batch:
+            client.unlink(*batch)
+
+        Trip.objects.filter(id__in=trip_ids).delete()
+        Vehicle.objects.filter(
+            id__in=[trip.vehicle_id for trip in self.trips.values()] + [self.filler_vehicle.id]
+        ).delete()
+        self.route.delete()
+        self.company.delete()
+        self.user.delete()
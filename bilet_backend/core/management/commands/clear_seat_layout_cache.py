@@ -0,0 +1,38 @@
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from core.models import Vehicle
+from core.services import seat_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Araçların koltuk düzeni cache'ini (vehicle_seat_layout_*) siler. Koltukları "
+        "veritabanında değiştiren migration'lardan sonra deploy adımı olarak çalıştırılır; "
+        "süreç içi düzen önbellekleri yeniden başlatmayla temizlenir."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehicle-type',
+                            choices=[choice for choice, _ in Vehicle.VEHICLE_CHOICES],
+                            help='Sadece bu tipteki araçlar')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        vehicles = Vehicle.objects.all()
+        if options['vehicle_type']:
+            vehicles = vehicles.filter(vehicle_type=options['vehicle_type'])
+        vehicle_ids = vehicles.values_list('id', flat=True).iterator(
+            chunk_size=options['batch_size']
+        )
+
+        cleared = 0
+        while True:
+            chunk = list(islice(vehicle_ids, options['batch_size']))
+            if not chunk:
+                break
+            seat_service.delete_seat_layouts(chunk)
+            cleared += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"{cleared} aracın koltuk düzeni cache'i silindi"))
@@ -0,0 +1,218 @@
+import csv
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.management.timetable import find_vehicles
+from core.models import Vehicle, Route, Company, Trip
+from core.search import invalidate_trip_search
+from core.seating import create_vehicle_seats
+
+DEFAULT_CAPACITIES = {'bus': 40, 'plain': 180, 'train': 80}
+
+DEFAULT_CITIES = [
+    "Adana", "Diyarbakır", "Isparta", "Mersin", "İstanbul",
+    "Ankara", "İzmir", "Antalya", "Bursa", "Trabzon",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Araç filosunu ve sefer tarifesini toplu INSERT ile yükler. Kaynak CSV dosyaları "
+        "(--vehicles, --trips) veya --generate ile rastgele üretilen veridir.\n"
+        "vehicles.csv: ref,vehicle_type,capacity (ref araç kodu olarak saklanır, mevcut kodlar atlanır)\n"
+        "trips.csv: company,vehicle,origin,destination,distance_km,departure_time,arrival_time,price "
+        "(vehicle: araç kodu veya mevcut araç id'si)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehicles', help='Araç CSV dosyası')
+        parser.add_argument('--trips', help='Sefer CSV dosyası')
+        parser.add_argument('--generate', type=int, metavar='N',
+                            help='N araçlık rastgele filo ve tarife üret')
+        parser.add_argument('--trips-per-vehicle', type=int, default=10)
+        parser.add_argument('--cities', default=','.join(DEFAULT_CITIES))
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['generate']:
+            vehicle_rows, trip_rows = self._generate(options)
+        elif options['vehicles'] or options['trips']:
+            vehicle_rows = self._read_csv(options['vehicles']) if options['vehicles'] else []
+            trip_rows = self._read_csv(options['trips']) if options['trips'] else []
+        else:
+            raise CommandError("--vehicles/--trips veya --generate gerekli")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            vehicles, created = self._import_vehicles(vehicle_rows, options['batch_size'])
+            # Koltuklar sadece yeni araçlar için oluşturulur
+            seats = create_vehicle_seats(created, options['batch_size'])
+            trips = self._import_trips(trip_rows, vehicles, options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(created)} araç, {seats} koltuk, {trips} sefer {elapsed:.2f} sn'de yüklendi"
+        ))
+
+    def _read_csv(self, path):
+        with open(path, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def _import_vehicles(self, rows, batch_size):
+        """Kodu olmayan araçları toplu oluştur, (kod -> araç eşlemesi, yeni araçlar) döndür"""
+        for row in rows:
+            if row['vehicle_type'] not in DEFAULT_CAPACITIES:
+                raise CommandError(f"Geçersiz araç tipi: {row['vehicle_type']}")
+
+        vehicles = Vehicle.objects.in_bulk({row['ref'] for row in rows}, field_name='code')
+        new_vehicles = {}
+        for row in rows:
+            if row['ref'] not in vehicles and row['ref'] not in new_vehicles:
+                new_vehicles[row['ref']] = Vehicle(
+                    code=row['ref'],
+                    vehicle_type=row['vehicle_type'],
+                    capacity=int(row.get('capacity') or DEFAULT_CAPACITIES[row['vehicle_type']])
+                )
+        created = Vehicle.objects.bulk_create(new_vehicles.values(), batch_size=batch_size)
+        vehicles.update(new_vehicles)
+        return vehicles, created
+
+    def _import_trips(self, rows, vehicles, batch_size):
+        if not rows:
+            return 0
+
+        companies = self._get_companies({row['company'] for row in rows}, batch_size)
+        routes = self._get_routes(rows, batch_size)
+
+        # Dosyada tanımlanmamış araçlar önce araç kodu, sonra araç id'si olarak çözülür
+        missing = {row['vehicle'] for row in rows if row['vehicle'] not in vehicles}
+        found = find_vehicles(missing)
+        for ref in missing:
+            if ref not in found:
+                raise CommandError(f"Araç bulunamadı: {ref}")
+        vehicles.update(found)
+
+        # Aynı araç ve kalkış zamanına sahip seferler atlanır, tekrar çalıştırmak güvenlidir
+        departures = [self._parse_datetime(row['departure_time']) for row in rows]
+        existing = set(Trip.objects.filter(
+            vehicle_id__in={vehicle.id for vehicle in vehicles.values()},
+            departure_time__range=(min(departures), max(departures))
+        ).values_list('vehicle_id', 'departure_time'))
+
+        trips = []
+        buckets = set()
+        for row, departure_time in zip(rows, departures):
+            vehicle = vehicles[row['vehicle']]
+            if (vehicle.id, departure_time) in existing:
+                continue
+            existing.add((vehicle.id, departure_time))
+            route = routes[(row['origin'], row['destination'])]
+            trips.append(Trip(
+                company=companies[row['company']],
+                vehicle=vehicle,
+                route=route,
+                departure_time=departure_time,
+                arrival_time=self._parse_datetime(row['arrival_time']),
+                price=row['price'],
+                # Koltuklar kapasite kadar oluşturulur (Trip.save burada çağrılmaz)
+                available_seats=vehicle.capacity
+            ))
+            buckets.add((
+                route.origin, route.destination, vehicle.vehicle_type,
+                timezone.localtime(departure_time).date()
+            ))
+
+        Trip.objects.bulk_create(trips, batch_size=batch_size)
+
+        # bulk_create sinyal tetiklemez, arama cache'i burada geçersiz kılınır
+        transaction.on_commit(lambda: [invalidate_trip_search(*bucket) for bucket in buckets])
+        return len(trips)
+
+    def _get_companies(self, names, batch_size):
+        Company.objects.bulk_create(
+            [Company(name=name) for name in names], batch_size=batch_size, ignore_conflicts=True
+        )
+        return {company.name: company for company in Company.objects.filter(name__in=names)}
+
+    def _get_routes(self, rows, batch_size):
+        # Sadece dosyadaki rotalar yüklenir; aynı rota birden çok kez varsa en eskisi
+        keys = {(row['origin'], row['destination']) for row in rows}
+        routes = {}
+        for route in Route.objects.filter(
+            origin__in={origin for origin, _ in keys},
+            destination__in={destination for _, destination in keys}
+        ).order_by('id'):
+            if (route.origin, route.destination) in keys:
+                routes.setdefault((route.origin, route.destination), route)
+
+        new_routes = {}
+        for row in rows:
+            key = (row['origin'], row['destination'])
+            if key not in routes and key not in new_routes:
+                duration = (
+                    self._parse_datetime(row['arrival_time'])
+                    - self._parse_datetime(row['departure_time'])
+                )
+                new_routes[key] = Route(
+                    origin=row['origin'],
+                    destination=row['destination'],
+                    distance_km=float(row['distance_km']),
+                    estimated_duration=duration
+                )
+        Route.objects.bulk_create(new_routes.values(), batch_size=batch_size)
+        routes.update(new_routes)
+        return routes
+
+    def _parse_datetime(self, value):
+        if isinstance(value, datetime):
+            return value
+        parsed = datetime.fromisoformat(value)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def _generate(self, options):
+        """Rastgele filo ve tarife satırları üret"""
+        cities = [city.strip() for city in options['cities'].split(',') if city.strip()]
+        pairs = list(itertools.permutations(cities, 2))
+        distances = {pair: random.randint(100, 1200) for pair in pairs}
+        companies = [f"Biletal {name}" for name in ('Turizm', 'Hava', 'Raylı')]
+        base_departure = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+        vehicle_rows = []
+        trip_rows = []
+        for index in range(options['generate']):
+            vehicle_type = random.choices(['bus', 'plain', 'train'], weights=[6, 2, 2])[0]
+            ref = f"gen{index}"
+            vehicle_rows.append({
+                'ref': ref,
+                'vehicle_type': vehicle_type,
+                'capacity': DEFAULT_CAPACITIES[vehicle_type],
+            })
+
+            departure = base_departure + timedelta(hours=random.randint(0, 23))
+            for _ in range(options['trips_per_vehicle']):
+                origin, destination = random.choice(pairs)
+                # Ortalama hız 70-100 km/sa
+                duration = timedelta(
+                    hours=distances[(origin, destination)] / random.uniform(70, 100)
+                )
+                trip_rows.append({
+                    'company': random.choice(companies),
+                    'vehicle': ref,
+                    'origin': origin,
+                    'destination': destination,
+                    'distance_km': distances[(origin, destination)],
+                    'departure_time': departure,
+                    'arrival_time': departure + duration,
+                    'price': random.randint(20, 120) * 25,
+                })
+                departure += duration + timedelta(hours=random.randint(2, 12))
+
+        return vehicle_rows, trip_rows
@@ -0,0 +1,254 @@
+import csv
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.management.timetable import find_vehicles
+from core.models import Company, Route, Seat, Trip, Vehicle
+from core.search import invalidate_trip_search
+
+FEED_COLUMNS = [
+    'company', 'vehicle', 'origin', 'destination', 'distance_km',
+    'departure_time', 'arrival_time', 'price',
+]
+
+STAGING_TABLE = 'timetable_feed_staging'
+
+
+class JsonlCsvStream:
+    """JSONL satırlarını COPY'nin okuyacağı CSV akışına çevirir (dosya tamamen okunmaz)"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            row = io.StringIO()
+            csv.writer(row).writerow([record.get(column) for column in FEED_COLUMNS])
+            self.buffer += row.getvalue()
+
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Sefer tarifesi akışını (CSV veya JSONL) PostgreSQL COPY ile geçici tabloya aktarır, "
+        "ardından (araç, kalkış zamanı) üzerinden INSERT ... ON CONFLICT ile birleştirir. "
+        "Aynı akışı tekrar yüklemek değişiklik yapmaz. "
+        f"Kolonlar: {','.join(FEED_COLUMNS)} (vehicle: araç kodu veya mevcut araç id'si)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (başlıklı) veya JSONL dosyası')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Verilmezse dosya uzantısından anlaşılır')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Bu komut PostgreSQL COPY gerektirir")
+
+        path = options['path']
+        feed_format = options['format'] or ('jsonl' if path.endswith('.jsonl') else 'csv')
+
+        started = time.perf_counter()
+        with open(path, newline='', encoding='utf-8') as f, transaction.atomic():
+            with connection.cursor() as cursor:
+                self._create_staging_table(cursor)
+
+                if feed_format == 'csv':
+                    columns = next(csv.reader([f.readline()]))
+                    unknown = set(columns) - set(FEED_COLUMNS)
+                    if unknown or set(FEED_COLUMNS) - set(columns):
+                        raise CommandError(f"CSV kolonları {','.join(FEED_COLUMNS)} olmalı")
+                    stream = f
+                else:
+                    columns = FEED_COLUMNS
+                    stream = JsonlCsvStream(iter(f))
+
+                copied = self._copy(cursor, columns, stream)
+                copy_elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{copied} satır COPY ile yüklendi ({copied / max(copy_elapsed, 1e-9):.0f} satır/sn)"
+                )
+
+                skipped = self._resolve_vehicles(cursor)
+                companies, routes = self._merge_lookups(cursor)
+                inserted, updated, buckets = self._merge_trips(cursor)
+
+        # Sadece gerçekten değişen seferlerin arama sonuçları geçersiz kılınır
+        for bucket in buckets:
+            invalidate_trip_search(*bucket)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{copied} satır {elapsed:.2f} sn'de işlendi ({copied / max(elapsed, 1e-9):.0f} satır/sn): "
+            f"{inserted} yeni, {updated} güncellenen, {skipped} atlanan sefer; "
+            f"{companies} yeni firma, {routes} yeni rota"
+        ))
+
+    def _create_staging_table(self, cursor):
+        # Saat dilimi belirtilmeyen zamanlar import_timetable'daki gibi yerel saat sayılır
+        cursor.execute("SELECT set_config('TimeZone', %s, true)", [timezone.get_current_timezone_name()])
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE {STAGING_TABLE} (
+                line bigserial,
+                company text NOT NULL,
+                vehicle text NOT NULL,
+                vehicle_id bigint,
+                origin text NOT NULL,
+                destination text NOT NULL,
+                distance_km double precision NOT NULL,
+                departure_time timestamptz NOT NULL,
+                arrival_time timestamptz NOT NULL,
+                price numeric(10, 2) NOT NULL
+            ) ON COMMIT DROP
+        """)
+
+    def _copy(self, cursor, columns, stream):
+        sql = f"COPY {STAGING_TABLE} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):
+            # psycopg2
+            raw_cursor.copy_expert(sql, stream, size=65536)
+        else:
+            # psycopg 3
+            with raw_cursor.copy(sql) as copy:
+                for chunk in iter(lambda: stream.read(65536), ''):
+                    copy.write(chunk)
+        cursor.execute(f"SELECT count(*) FROM {STAGING_TABLE}")
+        return cursor.fetchone()[0]
+
+    def _resolve_vehicles(self, cursor):
+        """Araç referanslarını import_timetable gibi (kod veya id) çöz, bulunamayan satır sayısını döndür"""
+        cursor.execute(f"SELECT DISTINCT vehicle FROM {STAGING_TABLE}")
+        vehicles = find_vehicles(row[0] for row in cursor.fetchall())
+        cursor.execute(f"""
+            UPDATE {STAGING_TABLE} s SET vehicle_id = m.id
+            FROM unnest(%s::text[], %s::bigint[]) AS m(ref, id)
+            WHERE s.vehicle = m.ref
+        """, [list(vehicles), [vehicle.id for vehicle in vehicles.values()]])
+        cursor.execute(f"SELECT count(*) FROM {STAGING_TABLE} WHERE vehicle_id IS NULL")
+        return cursor.fetchone()[0]
+
+    def _merge_lookups(self, cursor):
+        """Akıştaki yeni firmaları ve rotaları tek sorguda ekle"""
+        company_table = Company._meta.db_table
+        route_table = Route._meta.db_table
+
+        cursor.execute(f"""
+            INSERT INTO {company_table} (name)
+            SELECT DISTINCT company FROM {STAGING_TABLE}
+            ON CONFLICT (name) DO NOTHING
+        """)
+        companies = cursor.rowcount
+
+        cursor.execute(f"""
+            INSERT INTO {route_table} (origin, destination, distance_km, estimated_duration)
+            SELECT DISTINCT ON (s.origin, s.destination)
+                s.origin, s.destination, s.distance_km, s.arrival_time - s.departure_time
+            FROM {STAGING_TABLE} s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {route_table} r
+                WHERE r.origin = s.origin AND r.destination = s.destination
+            )
+            ORDER BY s.origin, s.destination, s.line
+        """)
+        return companies, cursor.rowcount
+
+    def _merge_trips(self, cursor):
+        """Seferleri (araç, kalkış) üzerinden upsert et, sadece değişen satırlara dokun
+
+        Araç ve kalkış çakışma anahtarı olduğu için güncellemede sadece rota
+        değişebilir; rotası değişen seferin eski arama kovası da döndürülür.
+        """
+        trip_table = Trip._meta.db_table
+        route_table = Route._meta.db_table
+        vehicle_table = Vehicle._meta.db_table
+
+        cursor.execute(f"""
+            WITH feed AS (
+                -- Akışta aynı sefer birden çok kez varsa son satır geçerli
+                SELECT DISTINCT ON (s.vehicle_id, s.departure_time)
+                    c.id AS company_id, s.vehicle_id, r.id AS route_id,
+                    s.departure_time, s.arrival_time, s.price
+                FROM {STAGING_TABLE} s
+                JOIN {Company._meta.db_table} c ON c.name = s.company
+                JOIN LATERAL (
+                    SELECT id FROM {route_table}
+                    WHERE origin = s.origin AND destination = s.destination
+                    ORDER BY id LIMIT 1
+                ) r ON true
+                WHERE s.vehicle_id IS NOT NULL
+                ORDER BY s.vehicle_id, s.departure_time, s.line DESC
+            ),
+            previous AS (
+                -- CTE'ler güncelleme öncesi satırları görür
+                SELECT t.vehicle_id, t.departure_time, t.route_id
+                FROM {trip_table} t
+                JOIN feed f ON f.vehicle_id = t.vehicle_id AND f.departure_time = t.departure_time
+            ),
+            upserted AS (
+                INSERT INTO {trip_table} (
+                    company_id, vehicle_id, route_id, departure_time, arrival_time,
+                    price, status, available_seats, created_at
+                )
+                SELECT
+                    f.company_id, f.vehicle_id, f.route_id, f.departure_time, f.arrival_time,
+                    f.price, 'scheduled',
+                    (SELECT count(*) FROM {Seat._meta.db_table} WHERE vehicle_id = f.vehicle_id),
+                    now()
+                FROM feed f
+                ON CONFLICT (vehicle_id, departure_time) DO UPDATE SET
+                    company_id = EXCLUDED.company_id,
+                    route_id = EXCLUDED.route_id,
+                    arrival_time = EXCLUDED.arrival_time,
+                    price = EXCLUDED.price
+                WHERE ({trip_table}.company_id, {trip_table}.route_id,
+                       {trip_table}.arrival_time, {trip_table}.price)
+                    IS DISTINCT FROM
+                      (EXCLUDED.company_id, EXCLUDED.route_id,
+                       EXCLUDED.arrival_time, EXCLUDED.price)
+                RETURNING (xmax = 0) AS inserted, route_id, vehicle_id, departure_time
+            ),
+            changed AS (
+                SELECT u.inserted, true AS counted, u.route_id, u.vehicle_id, u.departure_time
+                FROM upserted u
+                UNION ALL
+                -- Rotası değişen seferin eski kovası sayılmadan eklenir
+                SELECT false, false, p.route_id, p.vehicle_id, p.departure_time
+                FROM upserted u
+                JOIN previous p
+                    ON p.vehicle_id = u.vehicle_id AND p.departure_time = u.departure_time
+                WHERE NOT u.inserted AND p.route_id <> u.route_id
+            )
+            SELECT r.origin, r.destination, v.vehicle_type,
+                   (ch.departure_time AT TIME ZONE %s)::date,
+                   count(*) FILTER (WHERE ch.counted AND ch.inserted),
+                   count(*) FILTER (WHERE ch.counted AND NOT ch.inserted)
+            FROM changed ch
+            JOIN {route_table} r ON r.id = ch.route_id
+            JOIN {vehicle_table} v ON v.id = ch.vehicle_id
+            GROUP BY 1, 2, 3, 4
+        """, [timezone.get_current_timezone_name()])
+
+        inserted = updated = 0
+        buckets = []
+        for origin, destination, vehicle_type, date, bucket_inserted, bucket_updated in cursor:
+            inserted += bucket_inserted
+            updated += bucket_updated
+            buckets.append((origin, destination, vehicle_type, date))
+        return inserted, updated, buckets
@@ -0,0 +1,412 @@
+import asyncio
+import http.client
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from core.management.commands.import_timetable import DEFAULT_CAPACITIES
+from core.management.fixtures import (
+    create_bench_fixtures, delete_bench_fixtures, delete_bench_seat_state
+)
+from core.models import Reservation
+from core.services import seat_service
+
+PAYMENT = {
+    'method': 'credit_card',
+    'card_number': '4111111111111111',
+    'card_name': 'LOAD TEST',
+    'expiry': '12/30',
+    'cvv': '123',
+}
+
+
+def summarize(samples):
+    """Gecikme örneklerinden (sn) ms cinsinden yüzdelikler"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+class LoadTestStats:
+    """İş parçacıkları arasında paylaşılan gecikme örnekleri ve sayaçlar"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.counters = Counter()
+        self.booked_seats = []
+        self._lock = threading.Lock()
+
+    def add_latency(self, stage, seconds):
+        with self._lock:
+            self.latencies[stage].append(seconds)
+
+    def add_booking(self, seat_id):
+        with self._lock:
+            self.booked_seats.append(seat_id)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+
+class InProcessClient:
+    """Uygulamayı süreç içinde Django test Client'ı ile çağırır (ağ ve sunucu katmanı yok)"""
+
+    def __init__(self, host):
+        self.client = Client(HTTP_HOST=host)
+
+    def post(self, path, payload):
+        response = self.client.post(path, payload, content_type='application/json')
+        return response.status_code, response.content
+
+
+class HttpClient:
+    """Çalışan sunucuya tek keep-alive bağlantı üzerinden JSON POST gönderir"""
+
+    def __init__(self, url, host):
+        parts = urlsplit(url)
+        self.connection_class = (
+            http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.host = host or parts.netloc
+        self.connection = None
+
+    def post(self, path, payload):
+        if self.connection is None:
+            self.connection = self.connection_class(self.netloc, timeout=30)
+        try:
+            self.connection.request('POST', self.prefix + path, json.dumps(payload), {
+                'Host': self.host, 'Content-Type': 'application/json'
+            })
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            # POST tekrar gönderilmez (sunucuda işlenmiş olabilir), hata sayılır
+            self.connection.close()
+            self.connection = None
+            return None, b''
+
+
+class SeatWatchers:
+    """Sefer koltuk WebSocket'ini dinleyen izleyiciler (ayrı thread'de kendi event loop'unda)"""
+
+    def __init__(self, trip_id, count, stats, connect_concurrency=100):
+        self.trip_id = trip_id
+        self.count = count
+        self.stats = stats
+        self.connect_concurrency = connect_concurrency
+        self.ready = threading.Event()
+        self._connected = 0
+        self._loop = None
+        self._stop = None
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True)
+
+    def start(self, timeout=60):
+        if not self.count:
+            return
+        self._thread.start()
+        self.ready.wait(timeout)
+
+    def stop(self):
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        except RuntimeError:
+            # Bağlantıların hepsi başarısız olduysa loop zaten kapanmıştır
+            pass
+        self._thread.join()
+
+    async def _run(self):
+        from biletal.asgi import application
+
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        semaphore = asyncio.Semaphore(self.connect_concurrency)
+        await asyncio.gather(*(self._watch(application, semaphore) for _ in range(self.count)))
+
+    async def _watch(self, application, semaphore):
+        async with semaphore:
+            communicator = WebsocketCommunicator(application, f"/ws/trip/{self.trip_id}/")
+            started = time.perf_counter()
+            try:
+                connected, _ = await communicator.connect(timeout=10)
+                # Bağlantı süresi ilk koltuk snapshot'ı gelene kadar ölçülür
+                connected = connected and await communicator.receive_from(timeout=10)
+            except Exception:
+                connected = False
+            self._mark_connected()
+            if not connected:
+                self.stats.incr('ws_connect_failed')
+                return
+            self.stats.add_latency('ws_connect', time.perf_counter() - started)
+
+        while not self._stop.is_set():
+            # receive_from zaman aşımında uygulamayı iptal eder, önce kuyruk kontrol edilir
+            if await communicator.receive_nothing(timeout=0.1):
+                continue
+            message = json.loads(await communicator.receive_from())
+            self.stats.incr('ws_messages')
+            if message.get('type') == 'seat_delta' and message.get('timestamp'):
+                sent_at = datetime.fromisoformat(message['timestamp'])
+                self.stats.add_latency(
+                    'ws_delivery', (timezone.now() - sent_at).total_seconds()
+                )
+        await communicator.disconnect()
+
+    def _mark_connected(self):
+        self._connected += 1
+        if self._connected >= self.count:
+            self.ready.set()
+
+
+class Command(BaseCommand):
+    help = (
+        "Tek sefer üzerinde flaş satış yük testi: eşzamanlı kullanıcılar "
+        "select-seat, create-reservation ve process-payment endpoint'lerini çağırır, "
+        "izleyiciler TripSeatConsumer WebSocket'ine bağlanır. Aşama başına p50/p95/p99 "
+        "gecikme, saniyede rezervasyon, kilit çakışmaları ve çift rezervasyon ihlalleri "
+        "JSON dosyasına yazılır. --url verilmezse istekler süreç içinde Django test "
+        "Client'ı ile çalışır: ağ, ASGI sunucusu ve worker süreçleri ölçüme girmez, tüm "
+        "kullanıcılar tek sürecin GIL'ini paylaşır; gecikmeler sunucu arkasındaki "
+        "değerlerin alt sınırıdır. --url ile istekler gerçek HTTP üzerinden çalışan "
+        "sunucuya gider; sunucu aynı PostgreSQL ve Redis'i kullanmalıdır. İzleyiciler her "
+        "iki modda süreç içinde bağlanır, yayınları Redis kanal katmanından alır. Geçici "
+        "kayıtlar oluşturup siler; üretim veritabanında çalıştırmayın."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000,
+                            help='Koltuk için yarışan kullanıcı sayısı')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Aynı anda istek yapan kullanıcı sayısı (thread)')
+        parser.add_argument('--watchers', type=int, default=200,
+                            help='Sefer WebSocket izleyici sayısı')
+        parser.add_argument('--vehicle-type', choices=['bus', 'plain', 'train'], default='plain')
+        parser.add_argument('--attempts', type=int, default=3,
+                            help='Kullanıcının vazgeçmeden önce deneyeceği koltuk sayısı')
+        parser.add_argument('--url',
+                            help='İsteklerin gönderileceği sunucu (örn. http://127.0.0.1:8000)')
+        parser.add_argument('--host',
+                            help='İsteklerin Host başlığı (ALLOWED_HOSTS içinde olmalı, '
+                                 'varsayılan --url sunucusu veya localhost)')
+        parser.add_argument('--output', default='loadtest_results.json')
+        parser.add_argument('--keep', action='store_true',
+                            help='Test seferini ve rezervasyonları silme')
+
+    def handle(self, *args, **options):
+        vehicle_type = options['vehicle_type']
+        trip, user = create_bench_fixtures(
+            'loadtest@biletal.com', 'Load Test', 'LoadTest',
+            vehicle_type, DEFAULT_CAPACITIES[vehicle_type], price=100
+        )
+        seat_ids = list(trip.vehicle.seats.values_list('id', flat=True))
+        stats = LoadTestStats()
+        self._local = threading.local()
+        self._host = options['host']
+        self._url = options['url']
+
+        try:
+            watchers = SeatWatchers(trip.id, options['watchers'], stats)
+            watchers.start()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                list(executor.map(
+                    lambda index: self._simulate_user(
+                        index, trip, user, seat_ids, options['attempts'], stats
+                    ),
+                    range(options['users'])
+                ))
+            elapsed = time.perf_counter() - started
+
+            # Son yayınların izleyicilere ulaşması için kısa bekleme
+            if seat_service.broadcaster is not None:
+                seat_service.broadcaster.flush()
+            time.sleep(0.5)
+            watchers.stop()
+
+            results = self._results(options, trip, seat_ids, stats, elapsed)
+        finally:
+            if not options['keep']:
+                self._cleanup(trip, seat_ids, user)
+
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        self._report(results)
+        self.stdout.write(self.style.SUCCESS(f"Sonuçlar {options['output']} dosyasına yazıldı"))
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            if self._url:
+                client = HttpClient(self._url, self._host)
+            else:
+                client = InProcessClient(self._host or 'localhost')
+            self._local.client = client
+        return client
+
+    def _post(self, stats, stage, payload):
+        started = time.perf_counter()
+        status_code, content = self._client().post(reverse(stage), payload)
+        stats.add_latency(stage, time.perf_counter() - started)
+        try:
+            body = json.loads(content)
+        except ValueError:
+            body = None
+        # Bağlantı hatası, 5xx veya JSON olmayan yanıt (ALLOWED_HOSTS reddi gibi) hatadır
+        if status_code is None or status_code >= 500 or not isinstance(body, dict):
+            stats.incr(f'{stage}_errors')
+            return None
+        return body
+
+    def _simulate_user(self, index, trip, user, seat_ids, attempts, stats):
+        """Koltuk seç, rezervasyon yap, öde; koltuk kapılmışsa başka koltuk dene"""
+        session = f"loadtest_{index}"
+        for seat_id in random.sample(seat_ids, min(attempts, len(seat_ids))):
+            body = self._post(stats, 'select_seat', {
+                'trip_id': trip.id, 'seat_id': seat_id, 'user_session': session
+            })
+            if body is None:
+                continue
+            if not body.get('success'):
+                stats.incr('lock_conflicts')
+                continue
+
+            body = self._post(stats, 'create_reservation', {
+                'trip_id': trip.id,
+                'seat_id': seat_id,
+                'user_session': session,
+                'fencing_token': body['fencing_token'],
+                'passenger': {'id': f"LT{index}", 'phone': user.id},
+            })
+            if not (body and body.get('success')):
+                stats.incr('reservation_failed')
+                continue
+            stats.add_booking(seat_id)
+
+            body = self._post(stats, 'process_payment', {
+                'reservation_id': body['reservation']['id'], 'payment': PAYMENT
+            })
+            stats.incr('paid' if body and body.get('success') else 'payment_failed')
+            return
+        stats.incr('gave_up')
+
+    def _results(self, options, trip, seat_ids, stats, elapsed):
+        counters = stats.counters
+        booked = Counter(stats.booked_seats)
+
+        active = Reservation.objects.filter(trip=trip, status__in=['pending', 'confirmed'])
+        db_duplicates = (
+            active.values('seat_id').annotate(n=Count('id')).filter(n__gt=1).count()
+        )
+        db_seats = set(active.values_list('seat_id', flat=True))
+        redis_seats = {
+            seat['id'] for seat in seat_service.get_trip_seats(trip.id)
+            if seat['status'] == 'reserved'
+        }
+
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'commit': self._git_commit(),
+            'config': {
+                key: options[key]
+                for key in ('users', 'concurrency', 'watchers', 'vehicle_type', 'attempts', 'url')
+            },
+            'seats': len(seat_ids),
+            'duration_s': round(elapsed, 3),
+            'stages': {
+                stage: {**summarize(samples), 'errors': counters[f'{stage}_errors']}
+                for stage, samples in stats.latencies.items()
+                if not stage.startswith('ws_')
+            },
+            'websocket': {
+                'connect': summarize(stats.latencies['ws_connect']),
+                'delivery': summarize(stats.latencies['ws_delivery']),
+                'connect_failed': counters['ws_connect_failed'],
+                'messages': counters['ws_messages'],
+            },
+            'bookings': {
+                'reserved': len(stats.booked_seats),
+                'paid': counters['paid'],
+                'payment_failed': counters['payment_failed'],
+                'reserved_per_second': round(len(stats.booked_seats) / elapsed, 2),
+                'paid_per_second': round(counters['paid'] / elapsed, 2),
+                'gave_up': counters['gave_up'],
+            },
+            'lock_conflicts': counters['lock_conflicts'],
+            'reservation_failed': counters['reservation_failed'],
+            'double_bookings': {
+                # Aynı koltuk için birden fazla kullanıcıya başarılı yanıt
+                'responses': sum(1 for n in booked.values() if n > 1),
+                'database': db_duplicates,
+                # Veritabanı ile Redis bitmap'i arasındaki fark
+                'redis_mismatch': len(db_seats ^ redis_seats),
+            },
+        }
+
+    def _report(self, results):
+        self.stdout.write(f"{'stage':>20} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+        rows = list(results['stages'].items()) + [
+            (f"ws_{name}", results['websocket'][name]) for name in ('connect', 'delivery')
+        ]
+        for stage, summary in rows:
+            if not summary['count']:
+                continue
+            self.stdout.write(
+                f"{stage:>20} {summary['count']:>7} {summary['p50_ms']:>9.2f} "
+                f"{summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f} {summary.get('errors', 0):>7}"
+            )
+
+        bookings = results['bookings']
+        violations = results['double_bookings']
+        self.stdout.write(
+            f"{bookings['reserved']}/{results['seats']} koltuk rezerve edildi "
+            f"({bookings['reserved_per_second']}/sn), {bookings['paid']} ödeme, "
+            f"{results['lock_conflicts']} kilit çakışması, "
+            f"{results['websocket']['messages']} WebSocket mesajı"
+        )
+        if any(violations.values()):
+            self.stdout.write(self.style.ERROR(f"Çift rezervasyon ihlali: {violations}"))
+
+    @staticmethod
+    def _git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _cleanup(self, trip, seat_ids, user):
+        """Test kayıtlarını ve sefere ait Redis anahtarlarını sil"""
+        reservation_ids = list(Reservation.objects.filter(trip=trip).values_list('id', flat=True))
+        delete_bench_seat_state(trip.id, seat_ids, reservation_ids)
+        delete_bench_fixtures(trip, user)
@@ -0,0 +1,49 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services import seat_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Süre dolum kuyruklarını sürekli işler; süresi dolan rezervasyonların ve geçici "
+        "kilitlerin koltukları yaklaşık bir tarama aralığı içinde boşalır ve yayınlanır. "
+        "Birden çok kopya güvenle çalışabilir."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            default=settings.RESERVATION_EXPIRY_POLL_INTERVAL,
+                            help='Kuyruk boşken iki tarama arasındaki bekleme (sn)')
+        parser.add_argument('--batch', type=int, default=settings.RESERVATION_SWEEP_CHUNK_SIZE,
+                            help='Bir turda işlenecek en fazla rezervasyon')
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while self.running:
+            try:
+                expired = seat_service.expire_due_reservations(options['batch'])
+            except Exception as e:
+                self.stderr.write(f"Süre dolum hatası: {str(e)}")
+                expired = 0
+            try:
+                # Süresi dolan geçici kilitler boşalmış olarak yayınlanır
+                unlocked = seat_service.expire_seat_locks(options['batch'])
+            except Exception as e:
+                self.stderr.write(f"Kilit süre dolum hatası: {str(e)}")
+                unlocked = 0
+
+            if expired:
+                self.stdout.write(f"{expired} rezervasyonun süresi doldu")
+            # Parça doluysa birikmiş kuyruk beklemeden eritilir
+            if max(expired, unlocked) < options['batch']:
+                time.sleep(options['interval'])
+
+    def _stop(self, signum, frame):
+        self.running = False
@@ -0,0 +1,70 @@
+"""Benchmark ve yük testi komutlarının ortak veri hazırlama yardımcıları"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.models import User, Vehicle, Route, Company, Trip
+from core.services import seat_service
+
+
+def create_bench_company_route(company_name, route_name):
+    """Ölçüm seferleri için şirket ve rota oluştur"""
+    company = Company.objects.create(name=company_name)
+    route = Route.objects.create(
+        origin=route_name, destination=route_name,
+        distance_km=1, estimated_duration=timedelta(hours=1)
+    )
+    return company, route
+
+
+def create_bench_trip(company, route, vehicle, departure, price):
+    """Bir saatlik ölçüm seferi oluştur"""
+    return Trip.objects.create(
+        company=company,
+        vehicle=vehicle,
+        route=route,
+        departure_time=departure,
+        arrival_time=departure + timedelta(hours=1),
+        price=price
+    )
+
+
+def create_bench_fixtures(email, company_name, route_name, vehicle_type, capacity, price):
+    """Kullanıcı, araç ve bir yıl sonrasına tek sefer oluştur, (sefer, kullanıcı) döndür"""
+    user = User.objects.create_user(email=email, password=None)
+    # Koltuklar araç sinyaliyle oluşturulur
+    vehicle = Vehicle.objects.create(vehicle_type=vehicle_type, capacity=capacity)
+    company, route = create_bench_company_route(company_name, route_name)
+    trip = create_bench_trip(company, route, vehicle, timezone.now() + timedelta(days=365), price)
+    return trip, user
+
+
+def delete_bench_fixtures(trip, user):
+    """create_bench_fixtures kayıtlarını sil"""
+    vehicle, company, route = trip.vehicle, trip.company, trip.route
+    trip.delete()
+    seat_service.delete_seat_layouts([vehicle.id])
+    vehicle.delete()
+    route.delete()
+    company.delete()
+    user.delete()
+
+
+def delete_bench_seat_state(trip_id, seat_ids, reservation_ids):
+    """Seferin koltuk servisi Redis anahtarlarını ve ortak kuyruklardaki kayıtlarını sil"""
+    pipe = seat_service.redis_client.pipeline(transaction=False)
+    pipe.delete(
+        f"trip_seat_state_{trip_id}", f"trip_seat_state_lock_{trip_id}",
+        f"trip_reserved_bits_{trip_id}", f"trip_reserved_writes_{trip_id}",
+        f"trip_seat_locks_{trip_id}", f"trip_seat_fence_{trip_id}",
+        f"trip_seat_snapshot_{trip_id}", *seat_service.seat_delta_keys(trip_id),
+        *[f"seat_lock_{trip_id}_{seat_id}" for seat_id in seat_ids],
+        *[f"reservation_lock_{reservation_id}" for reservation_id in reservation_ids]
+    )
+    if seat_ids:
+        pipe.zrem(
+            seat_service.lock_expiry_queue_key, *[f"{trip_id}:{seat_id}" for seat_id in seat_ids]
+        )
+    if reservation_ids:
+        pipe.zrem(seat_service.expiry_queue_key, *reservation_ids)
+    pipe.execute()
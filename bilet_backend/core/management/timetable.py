@@ -0,0 +1,19 @@
+"""Tarife yükleme komutlarının ortak yardımcıları"""
+from core.models import Vehicle
+
+
+def find_vehicles(refs):
+    """Araç referanslarını önce araç kodu, sonra araç id'si olarak çöz
+
+    {referans: araç} döndürür, bulunamayan referanslar sonuçta yer almaz.
+    """
+    refs = {str(ref) for ref in refs}
+    by_code = Vehicle.objects.in_bulk(refs, field_name='code')
+    by_id = Vehicle.objects.in_bulk([int(ref) for ref in refs if ref.isdigit()])
+
+    vehicles = {}
+    for ref in refs:
+        vehicle = by_code.get(ref) or (by_id.get(int(ref)) if ref.isdigit() else None)
+        if vehicle is not None:
+            vehicles[ref] = vehicle
+    return vehicles
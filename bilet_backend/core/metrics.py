@@ -0,0 +1,171 @@
+import os
+import time
+from contextlib import contextmanager
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# Metrikler süreç içinde toplanır, /api/metrics/ üzerinden Prometheus formatında okunur.
+# Çok süreçli sunucularda PROMETHEUS_MULTIPROC_DIR ayarlanırsa süreçler birleştirilir.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+REDIS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    'biletal_http_request_seconds', 'View süresi',
+    ['view', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'biletal_db_queries_per_request', 'İstek başına SQL sorgusu sayısı',
+    ['view'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 250)
+)
+DB_QUERY_SECONDS = Counter(
+    'biletal_db_query_seconds_total', 'İstek içinde SQL sorgularında geçen toplam süre',
+    ['view']
+)
+REDIS_COMMANDS = Counter(
+    'biletal_redis_commands_total', 'Gönderilen Redis komutları', ['command']
+)
+REDIS_RESPONSE_SECONDS = Histogram(
+    'biletal_redis_response_seconds', 'Redis yanıtı bekleme süresi (pipeline başına ilk yanıt RTT içerir)',
+    buckets=REDIS_BUCKETS
+)
+GROUP_SEND_SECONDS = Histogram(
+    'biletal_channel_group_send_seconds', 'Channel layer group_send süresi',
+    buckets=LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    'biletal_cache_requests_total',
+    'Önbellekler: seat_layout (düzen cache), seat_state (sefer bitmap), seat_snapshot, '
+    'trip_search (arama sonuçları)',
+    ['cache', 'result']
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    'biletal_websocket_connections', 'Açık sefer WebSocket bağlantıları',
+    ['trip'], multiprocess_mode='livesum'
+)
+WEBSOCKET_MESSAGES = Counter(
+    'biletal_websocket_messages_total', 'Sefer WebSocket mesajları',
+    ['trip', 'direction']
+)
+
+
+def trip_label(trip_id):
+    """Sefer etiketi; METRICS_PER_TRIP kapalıysa tüm seferler tek seride toplanır"""
+    return str(trip_id) if settings.METRICS_PER_TRIP else 'all'
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+@contextmanager
+def observe(histogram):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started)
+
+
+def _command_name(args):
+    name = args[0] if args else ''
+    if isinstance(name, bytes):
+        name = name.decode()
+    return name.split(' ', 1)[0].upper()
+
+
+class InstrumentedConnection(redis.Connection):
+    """Komut sayısını ve yanıt bekleme süresini kaydeden Redis bağlantısı"""
+
+    def send_command(self, *args, **kwargs):
+        REDIS_COMMANDS.labels(_command_name(args)).inc()
+        return super().send_command(*args, **kwargs)
+
+    def pack_commands(self, commands):
+        # Pipeline komutları tek pakette gönderilir
+        for args in commands:
+            REDIS_COMMANDS.labels(_command_name(args)).inc()
+        return super().pack_commands(commands)
+
+    def read_response(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().read_response(*args, **kwargs)
+        finally:
+            REDIS_RESPONSE_SECONDS.observe(time.perf_counter() - started)
+
+
+class AsyncInstrumentedConnection(aioredis.Connection):
+    """InstrumentedConnection'ın async karşılığı (WebSocket consumer'ları)"""
+
+    async def send_command(self, *args, **kwargs):
+        REDIS_COMMANDS.labels(_command_name(args)).inc()
+        return await super().send_command(*args, **kwargs)
+
+    def pack_commands(self, commands):
+        for args in commands:
+            REDIS_COMMANDS.labels(_command_name(args)).inc()
+        return super().pack_commands(commands)
+
+    async def read_response(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().read_response(*args, **kwargs)
+        finally:
+            REDIS_RESPONSE_SECONDS.observe(time.perf_counter() - started)
+
+
+def redis_connection_class(asynchronous=False):
+    if not settings.METRICS_ENABLED:
+        return aioredis.Connection if asynchronous else redis.Connection
+    return AsyncInstrumentedConnection if asynchronous else InstrumentedConnection
+
+
+class PoolStatsCollector:
+    """Scrape anında get_pool_stats değerlerini gauge olarak sunar"""
+
+    def describe(self):
+        # Kayıt sırasında collect çağrılmasın (havuzlar henüz oluşmamış olabilir)
+        return []
+
+    def collect(self):
+        from .connections import get_pool_stats
+
+        stats = get_pool_stats()
+        redis_pool = GaugeMetricFamily(
+            'biletal_redis_pool_connections', 'Redis havuzu bağlantıları', labels=['pool', 'state']
+        )
+        for name, pool in stats['redis'].items():
+            for state in ('max', 'created', 'in_use', 'idle'):
+                redis_pool.add_metric([name, state], pool[f'{state}_connections'])
+        yield redis_pool
+
+        database_pool = GaugeMetricFamily(
+            'biletal_db_pool', 'Veritabanı bağlantı havuzu durumu', labels=['alias', 'stat']
+        )
+        for alias, pool in stats['database'].items():
+            for stat, value in pool.items():
+                if isinstance(value, (bool, int, float)):
+                    database_pool.add_metric([alias, stat], float(value))
+        yield database_pool
+
+
+REGISTRY.register(PoolStatsCollector())
+
+
+def render_metrics():
+    """Prometheus metin formatında metrikler ve content type"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(PoolStatsCollector())
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,125 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import metrics
+from .profiling import profile, profile_sync_thread, should_profile
+
+
+class QueryRecorder:
+    """connection.execute_wrapper ile istek içindeki SQL sorgularını sayar ve süresini toplar"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def install(self):
+        connection.execute_wrappers.append(self)
+
+    def uninstall(self):
+        connection.execute_wrappers.remove(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class SyncAndAsyncMiddleware:
+    """Zincirin moduna uyan middleware tabanı (Django zinciri sync moda uyarlamaz)
+
+    get_response async ise __acall__, değilse handle çağrılır.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """View başına gecikme, SQL sorgu sayısı ve süresini Prometheus metriklerine yazar"""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def handle(self, request):
+        queries = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        # Veritabanı bağlantıları thread'e özeldir; kanca, isteğin sync
+        # view'larının çalıştığı thread'deki (thread_sensitive) bağlantıya kurulur
+        queries = QueryRecorder()
+        started = time.perf_counter()
+        await sync_to_async(queries.install)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.uninstall)()
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    @staticmethod
+    def record(request, response, elapsed, queries):
+        # URL adı etiket olarak kullanılır, eşleşmeyen yollar tek seride toplanır
+        match = request.resolver_match
+        view = (match.view_name or match._func_path) if match else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            view, request.method, f"{response.status_code // 100}xx"
+        ).observe(elapsed)
+        metrics.DB_QUERIES_PER_REQUEST.labels(view).observe(queries.count)
+        metrics.DB_QUERY_SECONDS.labels(view).inc(queries.seconds)
+
+
+class ProfilingMiddleware(SyncAndAsyncMiddleware):
+    """İsteklerin bir kısmını (veya PROFILING_TOKEN ile işaretlenenleri) profiller
+
+    Async zincirde view'ların çalıştığı sync thread profillenir (bkz. profile_sync_thread).
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    @staticmethod
+    def is_profiled(request):
+        return should_profile(
+            request.headers.get(settings.PROFILING_HEADER)
+            or request.GET.get(settings.PROFILING_QUERY_PARAM)
+        )
+
+    def handle(self, request):
+        if not self.is_profiled(request):
+            return self.get_response(request)
+
+        with profile('http', f"{request.method}_{request.path}"):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not self.is_profiled(request):
+            return await self.get_response(request)
+
+        async with profile_sync_thread('http', f"{request.method}_{request.path}"):
+            return await self.get_response(request)
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:00
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='route',
+            index=models.Index(django.db.models.functions.text.Lower('origin'), django.db.models.functions.text.Lower('destination'), name='route_origin_dest_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['route', 'status', 'departure_time'], name='trip_route_status_dep_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_available_seats(apps, schema_editor):
+    Trip = apps.get_model('core', 'Trip')
+    Seat = apps.get_model('core', 'Seat')
+    Reservation = apps.get_model('core', 'Reservation')
+
+    seat_count = Seat.objects.filter(
+        vehicle_id=OuterRef('vehicle_id')
+    ).order_by().values('vehicle_id').annotate(count=Count('id')).values('count')
+    reserved_count = Reservation.objects.filter(
+        trip_id=OuterRef('pk'),
+        status__in=['pending', 'confirmed']
+    ).order_by().values('trip_id').annotate(count=Count('id')).values('count')
+
+    Trip.objects.update(
+        available_seats=Coalesce(Subquery(seat_count), 0) - Coalesce(Subquery(reserved_count), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='available_seats',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_available_seats, migrations.RunPython.noop),
+    ]
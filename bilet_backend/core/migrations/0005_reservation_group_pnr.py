@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_trip_available_seats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='group_pnr',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=10, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_reservation_group_pnr'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['expires_at'], name='reservation_pending_exp_idx'),
+        ),
+    ]
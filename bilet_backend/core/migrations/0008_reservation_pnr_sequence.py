@@ -0,0 +1,25 @@
+from django.db import migrations
+
+# Migration anındaki sequence adı (core.pnr.PNR_SEQUENCE ile aynı olmalı)
+PNR_SEQUENCE = 'core_reservation_pnr_seq'
+
+
+def create_pnr_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {PNR_SEQUENCE}")
+
+
+def drop_pnr_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {PNR_SEQUENCE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_reservation_active_seat_constraint'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pnr_sequence, drop_pnr_sequence),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_reservation_pnr_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='code',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:05
+
+from django.db import migrations
+
+# Migration anındaki uçak düzeni (core.seating değişse de bu migration aynı kalır)
+PLAIN_LAYOUT = {'letters': ['A', 'B', 'C', 'D', 'E', 'F'], 'window_letters': ['A', 'F']}
+
+
+def backfill_plain_vehicle_seats(apps, schema_editor):
+    """Koltuk sinyali 'plane' aradığı için koltuksuz oluşturulmuş uçaklara koltuk ekle
+
+    Boş düzenleri cache'lenmiş olabilir; deploy sonrası
+    `manage.py clear_seat_layout_cache --vehicle-type plain` çalıştırılır.
+    """
+    Vehicle = apps.get_model('core', 'Vehicle')
+    Seat = apps.get_model('core', 'Seat')
+    Trip = apps.get_model('core', 'Trip')
+
+    letters = PLAIN_LAYOUT['letters']
+    vehicles = list(
+        Vehicle.objects.filter(vehicle_type='plain', seats__isnull=True)
+        .values_list('id', 'capacity')
+    )
+    for vehicle_id, capacity in vehicles:
+        seats = []
+        for index in range(capacity):
+            row, column = divmod(index, len(letters))
+            letter = letters[column]
+            seats.append(Seat(
+                vehicle_id=vehicle_id,
+                seat_number=f"{row + 1}{letter}",
+                row_number=row + 1,
+                seat_letter=letter,
+                is_window=letter in PLAIN_LAYOUT['window_letters']
+            ))
+        Seat.objects.bulk_create(seats, batch_size=5000)
+        # Koltuk olmadığı için seferlerinde rezervasyon da yoktur
+        Trip.objects.filter(vehicle_id=vehicle_id).update(available_seats=len(seats))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_vehicle_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_plain_vehicle_seats, migrations.RunPython.noop),
+    ]
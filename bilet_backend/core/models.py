@@ -1,11 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Lower
 from django.db.models.signals import post_save
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
 
-from django.core.exceptions import ValidationError
-import random
-import string
+from .pnr import pnr_allocator
 import uuid
 
 
@@ -84,6 +83,8 @@ class Vehicle(models.Model):
     ]
     vehicle_type = models.CharField(max_length=20, choices=VEHICLE_CHOICES, default='bus')
     capacity = models.IntegerField()
+    # Dış sistemdeki araç referansı (plaka/kuyruk no), toplu içe aktarımda doğal anahtar
+    code = models.CharField(max_length=50, unique=True, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -95,6 +96,12 @@ class Route(models.Model):
     distance_km = models.FloatField()
     estimated_duration = models.DurationField()
 
+    class Meta:
+        indexes = [
+            # Sefer aramasında büyük/küçük harf duyarsız eşleşme için
+            models.Index(Lower('origin'), Lower('destination'), name='route_origin_dest_lower_idx'),
+        ]
+
     def __str__(self):
         return f"{self.origin} → {self.destination}"
 
@@ -121,11 +128,22 @@ class Trip(models.Model):
     arrival_time = models.DateTimeField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
+    # Sıralama için denormalize sayaç, reconcile_seat_counters ile periyodik güncellenir.
+    # Anlık değer Redis'teki koltuk bitmap'lerinden okunur.
+    available_seats = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ['vehicle', 'departure_time']
+        indexes = [
+            models.Index(fields=['route', 'status', 'departure_time'], name='trip_route_status_dep_idx'),
+        ]
+
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.available_seats:
+            self.available_seats = Seat.objects.filter(vehicle_id=self.vehicle_id).count()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.route} - {self.departure_time.strftime('%Y-%m-%d %H:%M')}"
@@ -143,6 +161,29 @@ class Seat(models.Model):
     def __str__(self):
         return f"{self.vehicle.vehicle_type} - Koltuk {self.seat_number}"
 
+# Aynı koltuk için ikinci aktif rezervasyonu engelleyen kısıt
+ACTIVE_SEAT_CONSTRAINT = 'reservation_active_seat_uniq'
+# PNR çakışmasında yeni kodlarla deneme sayısı
+PNR_RETRIES = 3
+
+
+def is_seat_conflict(error):
+    """IntegrityError aktif koltuk kısıtından mı geliyor (PNR vb. çakışmalar değil)"""
+    diag = getattr(error.__cause__, 'diag', None)
+    if diag is not None and diag.constraint_name:
+        return diag.constraint_name == ACTIVE_SEAT_CONSTRAINT
+    # SQLite kısıt adını vermez, ihlal edilen kolonları yazar
+    return 'seat_id' in str(error)
+
+
+def is_pnr_conflict(error):
+    """IntegrityError PNR kodunun benzersizlik kısıtından mı geliyor"""
+    diag = getattr(error.__cause__, 'diag', None)
+    if diag is not None and diag.constraint_name:
+        return 'pnr_code' in diag.constraint_name
+    return 'pnr_code' in str(error)
+
+
 class Reservation(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Beklemede'),
@@ -161,34 +202,67 @@ class Reservation(models.Model):
     payment_id = models.CharField(max_length=100, null=True, blank=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     pnr_code = models.CharField(max_length=10, unique=True, editable=False)
+    # Aynı işlemde alınan koltuklar ortak grup PNR'ı paylaşır
+    group_pnr = models.CharField(max_length=10, null=True, blank=True, editable=False, db_index=True)
 
     class Meta:
-        unique_together = ['trip', 'seat']
-
-    def clean(self):
-        # Aynı sefer ve koltuk için sadece bir aktif rezervasyon
-        existing = Reservation.objects.filter(
-            trip=self.trip,
-            seat=self.seat,
-            status__in=['pending', 'confirmed']
-        ).exclude(id=self.id)
-        
-        if existing.exists():
-            raise ValidationError("Bu koltuk zaten rezerve edilmiş!")
-        
+        constraints = [
+            # Aynı sefer ve koltuk için sadece bir aktif rezervasyon; süresi dolmuş
+            # veya iptal edilmiş rezervasyonun koltuğu tekrar satılabilir
+            models.UniqueConstraint(
+                fields=['trip', 'seat'], name=ACTIVE_SEAT_CONSTRAINT,
+                condition=models.Q(status__in=['pending', 'confirmed']),
+                violation_error_message="Bu koltuk zaten rezerve edilmiş!"
+            ),
+        ]
+        indexes = [
+            # Süre dolumu süpürücüsü sadece bekleyen rezervasyonları tarar
+            models.Index(
+                fields=['expires_at'], name='reservation_pending_exp_idx',
+                condition=models.Q(status='pending')
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        self.clean()
-        if not self.pnr_code:
+        if self.pnr_code:
+            return super().save(*args, **kwargs)
+        # Benzersizliği unique kısıt sağlar: kayıttan önce okuma yapılmaz, nadir
+        # çakışmada (eski rastgele kodlar) savepoint geri alınıp yeni kodla denenir
+        for attempt in range(PNR_RETRIES):
             self.pnr_code = self.generate_unique_pnr()
-        super().save(*args, **kwargs)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError as e:
+                self.pnr_code = ''
+                if attempt + 1 == PNR_RETRIES or not is_pnr_conflict(e):
+                    raise
 
     def generate_unique_pnr(self):
-        
-        while True:
-            code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            if not Reservation.objects.filter(pnr_code=code).exists():
-                return code
+        return self.generate_unique_pnrs(1)[0]
+
+    @classmethod
+    def generate_unique_pnrs(cls, count):
+        """Sequence'tan birbiriyle çakışmayan count adet PNR (veritabanı okuması yok)"""
+        return pnr_allocator.allocate_many(count)
+
+    @classmethod
+    def bulk_create_with_pnrs(cls, reservations):
+        """Rezervasyonları ortak grup PNR'ı ile toplu oluştur
+
+        PNR çakışmasında savepoint geri alınır ve tüm grup yeni kodlarla denenir.
+        """
+        for attempt in range(PNR_RETRIES):
+            codes = cls.generate_unique_pnrs(len(reservations))
+            for reservation, code in zip(reservations, codes):
+                reservation.pnr_code = code
+                reservation.group_pnr = codes[0]
+            try:
+                with transaction.atomic():
+                    return cls.objects.bulk_create(reservations)
+            except IntegrityError as e:
+                if attempt + 1 == PNR_RETRIES or not is_pnr_conflict(e):
+                    raise
 
     def __str__(self):
         return f"{self.user.first_name} - {self.trip} - Koltuk {self.seat.seat_number}"
@@ -0,0 +1,96 @@
+import hashlib
+import string
+import threading
+from django.conf import settings
+from django.db import connection
+from .connections import get_redis_client
+
+PNR_ALPHABET = string.ascii_uppercase + string.digits
+PNR_LENGTH = 6
+PNR_SPACE = len(PNR_ALPHABET) ** PNR_LENGTH
+PNR_SEQUENCE = 'core_reservation_pnr_seq'
+
+
+class PnrAllocator:
+    """Okuma yapmadan benzersiz PNR üretir
+
+    Veritabanı sequence'ından (Postgres dışında Redis sayacından) blok halinde
+    alınan sıra numaraları, gizli anahtarlı bir Feistel permütasyonu ile
+    [0, 36^6) aralığında karıştırılıp base36'ya çevrilir. Permütasyon birebir
+    olduğu için farklı sıra numaraları farklı kod verir; eski rastgele kodlarla
+    nadir çakışmayı unique kısıt yakalar, Reservation kaydı yeni kodla tekrarlar.
+    """
+
+    rounds = 4
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size or settings.PNR_BLOCK_SIZE
+        self.sequence_name = PNR_SEQUENCE
+        self.sequence_key = "pnr_sequence"
+        self._redis_client = None
+        self._lock = threading.Lock()
+        self._block = []
+        self._position = 0
+        digest = hashlib.sha256(f"pnr:{settings.PNR_SECRET}".encode()).digest()
+        self._round_keys = [
+            int.from_bytes(digest[i * 4:i * 4 + 4], 'big') | 1 for i in range(self.rounds)
+        ]
+
+    @property
+    def redis_client(self):
+        if self._redis_client is None:
+            self._redis_client = get_redis_client()
+        return self._redis_client
+
+    def allocate(self):
+        """Tek PNR (blok bitene kadar veritabanına/Redis'e gidilmez)"""
+        return self.allocate_many(1)[0]
+
+    def allocate_many(self, count):
+        """Benzersiz sıra numaralarından count adet PNR"""
+        sequences = []
+        with self._lock:
+            while len(sequences) < count:
+                if self._position >= len(self._block):
+                    self._block = self._fetch_block(max(count - len(sequences), self.block_size))
+                    self._position = 0
+                taken = self._block[self._position:self._position + count - len(sequences)]
+                self._position += len(taken)
+                sequences.extend(taken)
+        return [self.encode(sequence) for sequence in sequences]
+
+    def _fetch_block(self, size):
+        # Postgres sequence'ları transaction dışıdır: rezervasyon transaction'ı
+        # içinde çağrılsa da kilit tutmaz, geri alınmaz ve cache temizliğinden etkilenmez
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(%s) FROM generate_series(1, %s)", [self.sequence_name, size]
+                )
+                return [row[0] for row in cursor.fetchall()]
+
+        end = self.redis_client.incrby(self.sequence_key, size)
+        return range(end - size, end)
+
+    def encode(self, sequence):
+        """Sıra numarasını karıştırılmış 6 karakterlik koda çevir"""
+        value = self.permute(sequence % PNR_SPACE)
+        chars = []
+        for _ in range(PNR_LENGTH):
+            value, digit = divmod(value, len(PNR_ALPHABET))
+            chars.append(PNR_ALPHABET[digit])
+        return ''.join(reversed(chars))
+
+    def permute(self, value):
+        # 32 bitlik Feistel ağı; aralık dışına düşen değerler tekrar
+        # karıştırılır (cycle walking), böylece [0, PNR_SPACE) üzerinde birebirdir
+        while True:
+            left, right = value >> 16, value & 0xFFFF
+            for key in self._round_keys:
+                left, right = right, left ^ (((right * key) ^ (right >> 5) ^ key) & 0xFFFF)
+            value = (left << 16) | right
+            if value < PNR_SPACE:
+                return value
+
+
+pnr_allocator = PnrAllocator()
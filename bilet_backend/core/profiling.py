@@ -0,0 +1,228 @@
+import cProfile
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def is_profile_flag(flag):
+    """Başlık/parametre değeri PROFILING_TOKEN ile eşleşiyor mu (token yoksa işaret kapalı)"""
+    return bool(
+        flag and settings.PROFILING_TOKEN
+        and hmac.compare_digest(flag.encode(), settings.PROFILING_TOKEN.encode())
+    )
+
+
+def should_profile(flag=None):
+    """İstek profillensin mi: PROFILING_TOKEN ile işaretlenmiş veya örnekleme oranına düşmüş"""
+    if not settings.PROFILING_ENABLED:
+        return False
+    if is_profile_flag(flag):
+        return True
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def frame_name(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Hedef thread'in çağrı yığınını aralıklarla örnekler (kanca kurmaz, en düşük maliyet)
+
+    Örnekleyici thread GIL'i ancak hedef thread bıraktığında (I/O veya switch
+    interval, varsayılan 5 ms) alabildiği için birkaç ms'lik istekler örneklenemez;
+    değerler örnek sayısıdır.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            names.append(frame_name(frame.f_code))
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+
+class CProfileRecorder:
+    """cProfile ile deterministik profil (kısa istekleri de yakalar, C'de çalışır)"""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        return self.profiler
+
+
+# Aynı thread'de aynı anda tek profil çalışır; eşzamanlı işaretli istekler
+# (async'te aynı event loop'taki mesajlar) birbirinin kancasını ezmesin diye
+# profillenmeden geçer
+_active_threads = set()
+_active_lock = threading.Lock()
+
+
+def _claim_thread(thread_id):
+    with _active_lock:
+        if thread_id in _active_threads:
+            return False
+        _active_threads.add(thread_id)
+        return True
+
+
+def _release_thread(thread_id):
+    with _active_lock:
+        _active_threads.discard(thread_id)
+
+
+def _make_recorder(thread_id):
+    if settings.PROFILING_MODE == 'cprofile':
+        return CProfileRecorder()
+    return StackSampler(thread_id, settings.PROFILING_INTERVAL)
+
+
+def _save_profile(kind, name, started, result):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    try:
+        write_profile(kind, name, elapsed_ms, result)
+    except OSError as e:
+        logger.error(f"Profil yazma hatası: {str(e)}")
+
+
+@contextmanager
+def profile(kind, name):
+    """Blok süresince mevcut thread'i profille (PROFILING_MODE) ve PROFILING_DIR'e yaz"""
+    thread_id = threading.get_ident()
+    if not _claim_thread(thread_id):
+        yield
+        return
+
+    recorder = _make_recorder(thread_id)
+    started = time.perf_counter()
+    recorder.start()
+    try:
+        yield
+    finally:
+        result = recorder.stop()
+        _release_thread(thread_id)
+        _save_profile(kind, name, started, result)
+
+
+@asynccontextmanager
+async def profile_sync_thread(kind, name):
+    """Async HTTP zincirinde isteğin sync view'larının çalıştığı thread'i profille
+
+    ASGI'de sync view'lar isteğe ait thread'de (sync_to_async, thread_sensitive)
+    çalışır; event loop thread'i sadece await çerçevelerini gösterirdi. cProfile
+    kancası thread'e özel olduğu için o thread'de kurulup kaldırılır.
+    """
+    thread_id = await sync_to_async(threading.get_ident)()
+    if not _claim_thread(thread_id):
+        yield
+        return
+
+    recorder = _make_recorder(thread_id)
+    started = time.perf_counter()
+    await sync_to_async(recorder.start)()
+    try:
+        yield
+    finally:
+        result = await sync_to_async(recorder.stop)()
+        _release_thread(thread_id)
+        _save_profile(kind, name, started, result)
+
+
+def write_profile(kind, name, elapsed_ms, result):
+    """Profili yaz (örneklerden collapsed stack, cProfile'dan .prof), PROFILING_MAX_FILES'tan eskileri sil"""
+    is_cprofile = isinstance(result, cProfile.Profile)
+    if not is_cprofile and not result:
+        return None
+
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_')[:80]
+    path = directory / (
+        f"{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{uuid.uuid4().hex[:8]}_"
+        f"{kind}_{safe_name}_{elapsed_ms:.0f}ms"
+        f"{'.prof' if is_cprofile else '.collapsed'}"
+    )
+    if is_cprofile:
+        result.dump_stats(path)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in result.most_common():
+                f.write(f"{stack} {count}\n")
+
+    profiles = sorted(
+        (p for p in directory.iterdir() if p.suffix in ('.collapsed', '.prof')),
+        key=lambda p: p.stat().st_mtime
+    )
+    for old in profiles[:-settings.PROFILING_MAX_FILES]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+class ProfiledConsumerMixin:
+    """WebSocket mesajlarını örnekleme oranıyla veya bağlantı işaretliyse hepsini profiller
+
+    Bağlantı, PROFILING_HEADER başlığı ya da PROFILING_QUERY_PARAM parametresi
+    PROFILING_TOKEN ile açılırsa tüm mesajları profillenir. Event loop thread'i
+    profillendiği için await sırasında çalışan diğer coroutine'ler de görünebilir;
+    cprofile modunda bu coroutine'ler de kancanın maliyetini öder.
+    """
+
+    async def websocket_connect(self, message):
+        headers = dict(self.scope.get('headers', []))
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        flag = (
+            headers.get(settings.PROFILING_HEADER.lower().encode(), b'').decode()
+            or query.get(settings.PROFILING_QUERY_PARAM, [None])[0]
+        )
+        self.profile_connection = settings.PROFILING_ENABLED and is_profile_flag(flag)
+        await super().websocket_connect(message)
+
+    async def websocket_receive(self, message):
+        if not (self.profile_connection or should_profile()):
+            return await super().websocket_receive(message)
+
+        with profile('ws', f"{type(self).__name__}_{self.scope['path']}"):
+            await super().websocket_receive(message)
@@ -0,0 +1,201 @@
+import base64
+import hashlib
+import json
+import time as clock
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from . import metrics
+from .models import Trip
+from .serializer import TripSearchResultSerializer
+
+
+# Sıralama alanları; son alan her zaman benzersiz id (keyset için)
+SORT_FIELDS = {
+    'departure': ['departure_time', 'id'],
+    'availability': ['-available_seats', 'departure_time', 'id'],
+}
+
+# Doluluk sıralı aramalar Trip.available_seats sütununa da bağlıdır; sütunu
+# yenileyen reconcile_seat_counters bu nesli artırır
+SEAT_COUNTER_GENERATION_KEY = "trip_search_gen_seat_counters"
+
+
+def encode_cursor(trip, sort):
+    """Keyset sayfalama imleci: son seferin sıralama alanı değerleri"""
+    values = []
+    for field in SORT_FIELDS[sort]:
+        value = getattr(trip, field.lstrip('-'))
+        values.append(value.isoformat() if field == 'departure_time' else str(value))
+    return base64.urlsafe_b64encode('|'.join(values).encode()).decode()
+
+
+def decode_cursor(cursor, sort):
+    try:
+        raw_values = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        fields = SORT_FIELDS[sort]
+        if len(raw_values) != len(fields):
+            raise ValueError(cursor)
+
+        values = []
+        for field, raw in zip(fields, raw_values):
+            if field == 'departure_time':
+                value = parse_datetime(raw)
+                if value is None:
+                    raise ValueError(raw)
+            else:
+                value = int(raw)
+            values.append(value)
+        return values
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Geçersiz sayfa imleci.'})
+
+
+def keyset_filter(fields, values):
+    """(a, b, c) > (x, y, z) karşılaştırmasını alan yönlerine göre Q olarak kur"""
+    condition = Q()
+    for position, field in enumerate(fields):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f"{name}__{lookup}": values[position]})
+        for previous, value in zip(fields[:position], values[:position]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def search_trips(params):
+    """Seferleri indeksli filtrelerle ara, (sonuçlar, sonraki imleç) döndür"""
+    # LOWER(...) = ... karşılaştırması route_origin_dest_lower_idx indeksini kullanır,
+    # iexact ise UPPER(...) ürettiği için indekslenemez.
+    trips = Trip.objects.alias(
+        origin_lower=Lower('route__origin'),
+        destination_lower=Lower('route__destination'),
+    ).filter(
+        origin_lower=params['origin'].strip().lower(),
+        destination_lower=params['destination'].strip().lower(),
+        vehicle__vehicle_type=params['vehicle_type'],
+        status='scheduled'
+    )
+
+    if params.get('date'):
+        day_start = timezone.make_aware(datetime.combine(params['date'], time.min))
+        trips = trips.filter(
+            departure_time__gte=day_start,
+            departure_time__lt=day_start + timedelta(days=1)
+        )
+    if params.get('departure_after'):
+        trips = trips.filter(departure_time__time__gte=params['departure_after'])
+    if params.get('departure_before'):
+        trips = trips.filter(departure_time__time__lt=params['departure_before'])
+    if params.get('company'):
+        trips = trips.filter(company_id=params['company'])
+    if params.get('min_price') is not None:
+        trips = trips.filter(price__gte=params['min_price'])
+    if params.get('max_price') is not None:
+        trips = trips.filter(price__lte=params['max_price'])
+
+    sort = params.get('sort', 'departure')
+    if params.get('cursor'):
+        trips = trips.filter(
+            keyset_filter(SORT_FIELDS[sort], decode_cursor(params['cursor'], sort))
+        )
+
+    limit = params['limit']
+    page = list(
+        trips.select_related('route', 'vehicle', 'company')
+        .order_by(*SORT_FIELDS[sort])[:limit + 1]
+    )
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1], sort)
+
+    return page, next_cursor
+
+
+def search_bucket_keys(origin, destination, vehicle_type, date=None):
+    """Arama sonuçlarının bağlı olduğu nesil anahtarları (rota ve rota+gün)"""
+    route = [origin.strip().lower(), destination.strip().lower(), vehicle_type]
+    keys = [f"trip_search_gen_{_digest(route)}"]
+    if date is not None:
+        keys.append(f"trip_search_gen_{_digest(route + [date.isoformat()])}")
+    return keys
+
+
+def invalidate_trip_search(origin, destination, vehicle_type, date):
+    """Bu rota ve günü kapsayan cache'lenmiş aramaları geçersiz kıl"""
+    for key in search_bucket_keys(origin, destination, vehicle_type, date):
+        _incr(key)
+
+
+def invalidate_seat_counter_searches():
+    """Doluluk sıralı tüm cache'lenmiş aramaları geçersiz kıl"""
+    _incr(SEAT_COUNTER_GENERATION_KEY)
+
+
+def cached_search_trips(params):
+    """search_trips için read-through cache, eşzamanlı miss'lerde tek hesaplama"""
+    generation_keys = search_bucket_keys(
+        params['origin'], params['destination'], params['vehicle_type'], params.get('date')
+    )
+    if params.get('sort') == 'availability':
+        generation_keys.append(SEAT_COUNTER_GENERATION_KEY)
+    generations = cache.get_many(generation_keys)
+    normalized = dict(
+        params,
+        origin=params['origin'].strip().lower(),
+        destination=params['destination'].strip().lower()
+    )
+    cache_key = "trip_search_" + _digest(
+        [generations.get(key, 0) for key in generation_keys] + [normalized]
+    )
+
+    cached = cache.get(cache_key)
+    metrics.record_cache('trip_search', cached is not None)
+    if cached is not None:
+        return cached
+
+    # Single-flight: sadece kilidi alan istek veritabanına gider
+    lock_key = f"{cache_key}_lock"
+    locked = cache.add(lock_key, 1, settings.TRIP_SEARCH_LOCK_TIMEOUT)
+    if not locked:
+        deadline = clock.monotonic() + settings.TRIP_SEARCH_LOCK_TIMEOUT
+        while clock.monotonic() < deadline:
+            clock.sleep(0.05)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+    try:
+        trips, next_cursor = search_trips(params)
+        result = (TripSearchResultSerializer(trips, many=True).data, next_cursor)
+        cache.set(cache_key, result, settings.TRIP_SEARCH_CACHE_TIMEOUT)
+        return result
+    finally:
+        # Beklerken süresi dolan istek de hesaplar, ama kilidi sadece alan siler
+        if locked:
+            cache.delete(lock_key)
+
+
+def _digest(value):
+    raw = json.dumps(value, cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Anahtar yoksa oluştur, eşzamanlı oluşturmada add kaybedeni incr'e döner
+        if not cache.add(key, 1, None):
+            cache.incr(key)
@@ -0,0 +1,45 @@
+from itertools import islice
+from .models import Seat
+
+# Araç tipi başına koltuk düzeni şablonu. Sıra sayısı araç kapasitesinden
+# hesaplanır; son sıra kapasiteye göre eksik kalabilir.
+SEAT_LAYOUTS = {
+    'bus': {'letters': ['A', 'B', 'C', 'D'], 'window_letters': ['A', 'D']},
+    'plain': {'letters': ['A', 'B', 'C', 'D', 'E', 'F'], 'window_letters': ['A', 'F']},
+    'train': {'letters': ['A', 'B', 'C', 'D'], 'window_letters': ['A', 'D']},
+}
+
+
+def build_vehicle_seats(vehicle):
+    """Aracın koltuklarını kaydetmeden oluştur (kapasite kadar, düzen şablonuna göre)"""
+    layout = SEAT_LAYOUTS.get(vehicle.vehicle_type)
+    if layout is None:
+        return []
+
+    letters = layout['letters']
+    seats = []
+    for index in range(vehicle.capacity):
+        row, column = divmod(index, len(letters))
+        letter = letters[column]
+        seats.append(Seat(
+            vehicle_id=vehicle.id,
+            seat_number=f"{row + 1}{letter}",
+            row_number=row + 1,
+            seat_letter=letter,
+            is_window=letter in layout['window_letters']
+        ))
+    return seats
+
+
+def create_vehicle_seats(vehicles, batch_size=5000):
+    """Araçların koltuklarını toplu INSERT ile oluştur, oluşturulan koltuk sayısını döndür"""
+    vehicles = iter(vehicles)
+    created = 0
+    while True:
+        # Bellek kullanımı araç sayısından bağımsız kalsın diye parça parça
+        chunk = list(islice(vehicles, max(batch_size // 40, 1)))
+        if not chunk:
+            return created
+        seats = [seat for vehicle in chunk for seat in build_vehicle_seats(vehicle)]
+        Seat.objects.bulk_create(seats, batch_size=batch_size)
+        created += len(seats)
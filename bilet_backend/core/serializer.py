@@ -6,6 +6,7 @@ from rest_framework.validators import UniqueValidator
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from .models import Trip, Route, Vehicle, Seat, Reservation, Payment, Company
+from django.db import models
 from django.utils.timezone import now
 
 
@@ -106,6 +107,54 @@ class RouteSerializer(serializers.ModelSerializer):
 
 
 
+def get_reserved_seat_ids(trip_ids):
+    """Seferlerin aktif rezervasyonlu koltuklarını tek sorguda getir"""
+    reserved = {trip_id: set() for trip_id in trip_ids}
+    rows = Reservation.objects.filter(
+        trip_id__in=trip_ids,
+        status__in=['pending', 'confirmed']
+    ).values_list('trip_id', 'seat_id')
+    for trip_id, seat_id in rows:
+        reserved[trip_id].add(seat_id)
+    return reserved
+
+
+class BatchPrefetchListSerializer(serializers.ListSerializer):
+    """Liste serileştirirken tüm seferlerin rezerve koltuklarını tek sorguda hazırla
+
+    Çocuk serileştirici BatchPrefetchMixin'den türemelidir.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        # Çocuk serileştiricinin ihtiyaç duyduğu ilişkiler öğe başına değil toplu yüklenir
+        select = self.child.batch_select_related
+        prefetch = self.child.batch_prefetch_related
+        if isinstance(data, models.QuerySet):
+            items = list(data.select_related(*select).prefetch_related(*prefetch))
+        else:
+            items = list(data)
+            models.prefetch_related_objects(items, *select, *prefetch)
+        trip_ids = {self.child.get_trip_id(item) for item in items}
+        self.context.setdefault('reserved_seat_ids_by_trip', {}).update(
+            get_reserved_seat_ids(trip_ids)
+        )
+        return super().to_representation(items)
+
+
+class BatchPrefetchMixin:
+    """BatchPrefetchListSerializer ile listelenen serileştiricilerin kancaları"""
+
+    # Liste serileştirilmeden önce toplu yüklenecek ilişkiler
+    batch_select_related = []
+    batch_prefetch_related = []
+
+    def get_trip_id(self, instance):
+        """Öğenin rezerve koltukları yüklenecek seferinin id'si (varsayılan trip FK'sı)"""
+        return instance.trip_id
+
+
 class SeatSerializer(serializers.ModelSerializer):   
     is_reserved = serializers.SerializerMethodField()
 
@@ -114,6 +163,10 @@ class SeatSerializer(serializers.ModelSerializer):
         fields = ['id', 'seat_number', 'row_number', 'seat_letter', 'is_window', 'is_reserved']
 
     def get_is_reserved(self, seat):
+        reserved_seat_ids = self.context.get('reserved_seat_ids')
+        if reserved_seat_ids is not None:
+            return seat.id in reserved_seat_ids
+
         trip = self.context.get('trip')
         if not trip:
             return False
@@ -124,7 +177,7 @@ class SeatSerializer(serializers.ModelSerializer):
             status__in=['pending', 'confirmed']
         ).exists()
         
-class TripSerializer(serializers.ModelSerializer):
+class TripSerializer(BatchPrefetchMixin, serializers.ModelSerializer):
     route = RouteSerializer(read_only=True)
     vehicle = VehicleSerializer(read_only=True)
     seats = serializers.SerializerMethodField()
@@ -136,12 +189,24 @@ class TripSerializer(serializers.ModelSerializer):
             'id', 'route', 'company', 'vehicle', 'departure_time', 'arrival_time',
             'price', 'status', 'created_at', 'seats'
         ]
+        list_serializer_class = BatchPrefetchListSerializer
+
+    def get_trip_id(self, trip):
+        return trip.id
 
     def get_seats(self, trip):
+        reserved_by_trip = self.context.get('reserved_seat_ids_by_trip', {})
+        if trip.id not in reserved_by_trip:
+            reserved_by_trip = get_reserved_seat_ids([trip.id])
+
+        # vehicle__seats prefetch edilmişse ek sorgu yapılmaz
         seats = trip.vehicle.seats.all()
-        return SeatSerializer(seats, many=True, context={'trip': trip}).data
+        return SeatSerializer(seats, many=True, context={
+            'trip': trip,
+            'reserved_seat_ids': reserved_by_trip[trip.id]
+        }).data
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(BatchPrefetchMixin, serializers.ModelSerializer):
     trip = TripSerializer(read_only=True)
     seat = SeatSerializer(read_only=True)
     
@@ -151,8 +216,9 @@ class ReservationSerializer(serializers.ModelSerializer):
             'id', 'trip', 'seat', 'passenger_phone', 'status', 'reservation_time', 'expires_at', 
             'total_price', 'payment_id'
         ]
+        list_serializer_class = BatchPrefetchListSerializer
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(BatchPrefetchMixin, serializers.ModelSerializer):
     reservation = ReservationSerializer(read_only=True)
     
     class Meta:
@@ -160,4 +226,45 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'reservation', 'amount', 'payment_method', 'status',
             'transaction_id', 'payment_date', 'created_at'
-        ]
\ No newline at end of file
+        ]
+        list_serializer_class = BatchPrefetchListSerializer
+
+    # get_trip_id ve iç içe rezervasyon ödeme başına sorgu yapmasın
+    batch_select_related = [
+        'reservation__trip__route', 'reservation__trip__vehicle',
+        'reservation__trip__company', 'reservation__seat'
+    ]
+    batch_prefetch_related = ['reservation__trip__vehicle__seats']
+
+    def get_trip_id(self, payment):
+        return payment.reservation.trip_id
+
+class TripSearchParamsSerializer(serializers.Serializer):
+    """Sefer arama parametreleri"""
+    origin = serializers.CharField(max_length=100)
+    destination = serializers.CharField(max_length=100)
+    vehicle_type = serializers.ChoiceField(choices=Vehicle.VEHICLE_CHOICES)
+    date = serializers.DateField(required=False)
+    departure_after = serializers.TimeField(required=False)
+    departure_before = serializers.TimeField(required=False)
+    company = serializers.IntegerField(required=False)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    sort = serializers.ChoiceField(choices=['departure', 'availability'], default='departure')
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class TripSearchResultSerializer(serializers.ModelSerializer):
+    """Arama sonuçları için koltuk haritası içermeyen hafif sefer görünümü"""
+    origin = serializers.CharField(source='route.origin')
+    destination = serializers.CharField(source='route.destination')
+    company = serializers.CharField(source='company.name')
+    vehicle_type = serializers.CharField(source='vehicle.vehicle_type')
+
+    class Meta:
+        model = Trip
+        fields = [
+            'id', 'origin', 'destination', 'company', 'vehicle_type',
+            'departure_time', 'arrival_time', 'price', 'status', 'available_seats'
+        ]
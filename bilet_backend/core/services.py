@@ -1,134 +1,1017 @@
 import redis
 import json
+import time
 from datetime import datetime, timedelta
 from django.conf import settings
-from django.db import transaction
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from django.core.cache import cache
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from .models import Trip, Seat, Reservation, Payment, User
+from .models import Trip, Seat, Reservation, Payment, User, is_seat_conflict
+from .broadcast import SeatBroadcastCoalescer
+from .encoding import encode_message
+from .search import invalidate_seat_counter_searches
+from . import metrics
+from .connections import get_redis_client
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+# Koltuk kilidi Lua script'leri: her biri tek round trip'te ve atomik çalışır.
+# Kilit anahtarı bir hash'tir: owner (session) ve token (fencing token).
+
+# Kilit indeksleri son kilitten 3 ttl sonra silinir: süresi dolan kilitler okunurken
+# skorla elenir, indeksten expire_seat_locks ile "available" yayınlanarak düşürülür.
+# Kilit bitişleri ayrıca global kuyrukta ("sefer:koltuk") tutulur.
+
+# Koltuk durumunu değiştiren her script sefer versiyonunu değişiklikle aynı anda artırır
+# ve değişikliği sınırlı delta günlüğüne ekler. Versiyonlar böylece değişikliklerin
+# gerçek sırasını izler; yayınlar süreç başına birleştirilip gönderilir.
+# seats: {{koltuk id, durum}, ...}; değişiklik yoksa versiyon artmaz, 0 döner
+RECORD_SEAT_DELTA = """
+local function record_delta(version_key, log_key, seats, log_size, ttl)
+    if #seats == 0 then
+        return 0
+    end
+    local version = redis.call('INCR', version_key)
+    local items = {}
+    for i, seat in ipairs(seats) do
+        items[i] = '{"id":' .. seat[1] .. ',"status":"' .. seat[2] .. '"}'
+    end
+    redis.call('RPUSH', log_key, '{"version":' .. version .. ',"seats":[' .. table.concat(items, ',') .. ']}')
+    redis.call('LTRIM', log_key, -tonumber(log_size), -1)
+    redis.call('EXPIRE', log_key, ttl)
+    return version
+end
+"""
+
+# Rezerve biti set edilmiş koltuk kilitlenemez (koltuk indeksi -1 ise kontrol atlanır).
+# Bitmap yüklenmemişse (yükleme işareti yok: Redis yeniden başladı, silindi veya süresi
+# doldu) rezerve koltuklar görünmez; işaretteki araç koltuk indeksinin hesaplandığı
+# araçtan farklıysa indeks yanlış bite bakar. İki durumda da script kapalı başarısız
+# olur ve -1 döner, çağıran bitmap'i yükleyip tekrar dener. {token, versiyon} döner,
+# token 0 ise koltuk dolu.
+# KEYS: kilit, sefer kilit indeksi, sefer fencing sayacı, rezerve bitmap, kilit bitiş kuyruğu,
+#       yükleme işareti, sefer versiyonu, sefer delta günlüğü
+# ARGV: session, ttl, koltuk id, şimdiki zaman, koltuk indeksi, sefer id,
+#       delta günlüğü uzunluğu, delta günlüğü ttl, araç id
+ACQUIRE_SEAT_LOCK_SCRIPT = RECORD_SEAT_DELTA + """
+local owner = redis.call('HGET', KEYS[1], 'owner')
+if owner and owner ~= ARGV[1] then
+    return {0, 0}
+end
+local seat_index = tonumber(ARGV[5])
+if seat_index >= 0 then
+    if redis.call('GET', KEYS[6]) ~= ARGV[9] then
+        return {-1, 0}
+    end
+    if redis.call('GETBIT', KEYS[4], seat_index) == 1 then
+        return {0, 0}
+    end
+end
+local token = redis.call('INCR', KEYS[3])
+local expires_at = tonumber(ARGV[4]) + tonumber(ARGV[2])
+redis.call('HSET', KEYS[1], 'owner', ARGV[1], 'token', token)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('ZADD', KEYS[2], expires_at, ARGV[3])
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[2]) * 3)
+redis.call('ZADD', KEYS[5], expires_at, ARGV[6] .. ':' .. ARGV[3])
+return {token, record_delta(KEYS[7], KEYS[8], {{ARGV[3], 'temp_locked'}}, ARGV[7], ARGV[8])}
+"""
+
+# KEYS: kilit, sefer kilit indeksi, kilit bitiş kuyruğu
+# ARGV: session, ttl, koltuk id, şimdiki zaman, sefer id
+EXTEND_SEAT_LOCK_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'owner') ~= ARGV[1] then
+    return 0
+end
+local expires_at = tonumber(ARGV[4]) + tonumber(ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('ZADD', KEYS[2], expires_at, ARGV[3])
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[2]) * 3)
+redis.call('ZADD', KEYS[3], expires_at, ARGV[5] .. ':' .. ARGV[3])
+return tonumber(redis.call('HGET', KEYS[1], 'token'))
+"""
+
+# {bırakıldı mı, versiyon} döner. Bu arada rezerve edilmiş koltuğun kilidi bırakılır ama
+# koltuk boşalmış sayılmaz (versiyon 0, yayın yapılmaz).
+# KEYS: kilit, sefer kilit indeksi, rezerve bitmap, sefer versiyonu, sefer delta günlüğü
+# ARGV: session, koltuk id, koltuk indeksi, delta günlüğü uzunluğu, delta günlüğü ttl
+RELEASE_SEAT_LOCK_SCRIPT = RECORD_SEAT_DELTA + """
+if redis.call('HGET', KEYS[1], 'owner') ~= ARGV[1] then
+    return {0, 0}
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[2])
+local seat_index = tonumber(ARGV[3])
+if seat_index >= 0 and redis.call('GETBIT', KEYS[3], seat_index) == 1 then
+    return {1, 0}
+end
+return {1, record_delta(KEYS[4], KEYS[5], {{ARGV[2], 'available'}}, ARGV[4], ARGV[5])}
+"""
+
+# Rezerve bitini yazan her script değişikliği sefer yazma günlüğüne de işler
+# (koltuk indeksi -> "sıra:değer:zaman", sıra sayacı _seq alanında). Bitmap yeniden
+# yüklenirken veritabanı okunduktan sonraki yazılar bu günlükten geri uygulanır.
+RECORD_RESERVED_BIT = """
+local function record_bit(log, index, value, ttl)
+    local seq = redis.call('HINCRBY', log, '_seq', 1)
+    redis.call('HSET', log, index, seq .. ':' .. value .. ':' .. redis.call('TIME')[1])
+    redis.call('EXPIRE', log, ttl)
+end
+"""
+
+# Geçici kilidi rezervasyon kilidine çevirir, token eşleşmezse hiçbir şey yapmaz.
+# Başarıda versiyon, aksi halde 0 döner.
+# KEYS: kilit, sefer kilit indeksi, rezerve bitmap, rezervasyon kilidi, süre dolum kuyruğu,
+#       yazma günlüğü, sefer versiyonu, sefer delta günlüğü
+# ARGV: session, token, koltuk id, koltuk indeksi, rezervasyon id, ttl, son ödeme zamanı,
+#       günlük ttl, delta günlüğü uzunluğu, delta günlüğü ttl
+CONSUME_SEAT_LOCK_SCRIPT = RECORD_RESERVED_BIT + RECORD_SEAT_DELTA + """
+local lock = redis.call('HMGET', KEYS[1], 'owner', 'token')
+if lock[1] ~= ARGV[1] or lock[2] ~= ARGV[2] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[3])
+redis.call('SETBIT', KEYS[3], ARGV[4], 1)
+record_bit(KEYS[6], ARGV[4], 1, ARGV[8])
+redis.call('SETEX', KEYS[4], ARGV[6], ARGV[5])
+redis.call('ZADD', KEYS[5], ARGV[7], ARGV[5])
+return record_delta(KEYS[7], KEYS[8], {{ARGV[3], 'reserved'}}, ARGV[9], ARGV[10])
+"""
+
+# Çoklu koltuk: ya hepsi kilitlenir ya hiçbiri, tüm kilitler tek fencing token paylaşır.
+# Çakışmada {0, koltuk id, 0}, bitmap bu araçla yüklenmemişse {-1, 0, 0}, başarıda
+# {1, token, versiyon} döner.
+# KEYS: sefer kilit indeksi, sefer fencing sayacı, rezerve bitmap, kilit bitiş kuyruğu,
+#       yükleme işareti, sefer versiyonu, sefer delta günlüğü, koltuk kilitleri...
+# ARGV: session, ttl, şimdiki zaman, sefer id, delta günlüğü uzunluğu, delta günlüğü ttl,
+#       araç id, (koltuk id, koltuk indeksi)...
+ACQUIRE_SEAT_LOCKS_SCRIPT = RECORD_SEAT_DELTA + """
+if redis.call('GET', KEYS[5]) ~= ARGV[7] then
+    return {-1, 0, 0}
+end
+for i = 8, #KEYS do
+    local owner = redis.call('HGET', KEYS[i], 'owner')
+    local seat_index = tonumber(ARGV[(i - 8) * 2 + 9])
+    if (owner and owner ~= ARGV[1]) or redis.call('GETBIT', KEYS[3], seat_index) == 1 then
+        return {0, ARGV[(i - 8) * 2 + 8], 0}
+    end
+end
+local token = redis.call('INCR', KEYS[2])
+local expires_at = tonumber(ARGV[3]) + tonumber(ARGV[2])
+local seats = {}
+for i = 8, #KEYS do
+    local seat_id = ARGV[(i - 8) * 2 + 8]
+    redis.call('HSET', KEYS[i], 'owner', ARGV[1], 'token', token)
+    redis.call('EXPIRE', KEYS[i], ARGV[2])
+    redis.call('ZADD', KEYS[1], expires_at, seat_id)
+    redis.call('ZADD', KEYS[4], expires_at, ARGV[4] .. ':' .. seat_id)
+    seats[#seats + 1] = {seat_id, 'temp_locked'}
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]) * 3)
+return {1, token, record_delta(KEYS[6], KEYS[7], seats, ARGV[5], ARGV[6])}
+"""
+
+# Session'a ait kilitleri bırakır; {bırakılan koltuk id'leri, bunlardan boşalanlar,
+# versiyon} döner (bu arada rezerve edilmiş koltuklar boşalmış sayılmaz)
+# KEYS: sefer kilit indeksi, rezerve bitmap, sefer versiyonu, sefer delta günlüğü,
+#       koltuk kilitleri...
+# ARGV: session, delta günlüğü uzunluğu, delta günlüğü ttl, (koltuk id, koltuk indeksi)...
+RELEASE_SEAT_LOCKS_SCRIPT = RECORD_SEAT_DELTA + """
+local released = {}
+local available = {}
+local seats = {}
+for i = 5, #KEYS do
+    local seat_id = ARGV[(i - 5) * 2 + 4]
+    local seat_index = tonumber(ARGV[(i - 5) * 2 + 5])
+    if redis.call('HGET', KEYS[i], 'owner') == ARGV[1] then
+        redis.call('DEL', KEYS[i])
+        redis.call('ZREM', KEYS[1], seat_id)
+        released[#released + 1] = seat_id
+        if seat_index < 0 or redis.call('GETBIT', KEYS[2], seat_index) == 0 then
+            available[#available + 1] = seat_id
+            seats[#seats + 1] = {seat_id, 'available'}
+        end
+    end
+end
+return {released, available, record_delta(KEYS[3], KEYS[4], seats, ARGV[2], ARGV[3])}
+"""
+
+# Çoklu koltuk kilitlerini rezervasyon kilitlerine çevirir; biri bile eşleşmezse hiçbirini.
+# Başarıda versiyon, aksi halde 0 döner.
+# KEYS: sefer kilit indeksi, rezerve bitmap, süre dolum kuyruğu, yazma günlüğü,
+#       sefer versiyonu, sefer delta günlüğü, koltuk kilitleri..., rezervasyon kilitleri...
+# ARGV: session, token, ttl, son ödeme zamanı, günlük ttl, delta günlüğü uzunluğu,
+#       delta günlüğü ttl, (koltuk id, koltuk indeksi, rezervasyon id)...
+CONSUME_SEAT_LOCKS_SCRIPT = RECORD_RESERVED_BIT + RECORD_SEAT_DELTA + """
+local count = (#KEYS - 6) / 2
+for i = 1, count do
+    local lock = redis.call('HMGET', KEYS[i + 6], 'owner', 'token')
+    if lock[1] ~= ARGV[1] or lock[2] ~= ARGV[2] then
+        return 0
+    end
+end
+local seats = {}
+for i = 1, count do
+    local arg = (i - 1) * 3 + 8
+    redis.call('DEL', KEYS[i + 6])
+    redis.call('ZREM', KEYS[1], ARGV[arg])
+    redis.call('SETBIT', KEYS[2], ARGV[arg + 1], 1)
+    record_bit(KEYS[4], ARGV[arg + 1], 1, ARGV[5])
+    redis.call('SETEX', KEYS[i + 6 + count], ARGV[3], ARGV[arg + 2])
+    redis.call('ZADD', KEYS[3], ARGV[4], ARGV[arg + 2])
+    seats[#seats + 1] = {ARGV[arg], 'reserved'}
+end
+return record_delta(KEYS[5], KEYS[6], seats, ARGV[6], ARGV[7])
+"""
+
+# Bir seferin koltuklarının rezerve bitlerini yazar (ödeme, süre dolumu, iptal),
+# versiyon döner
+# KEYS: rezerve bitmap, yazma günlüğü, sefer versiyonu, sefer delta günlüğü
+# ARGV: değer, günlük ttl, delta günlüğü uzunluğu, delta günlüğü ttl,
+#       (koltuk id, koltuk indeksi)...
+SET_RESERVED_BITS_SCRIPT = RECORD_RESERVED_BIT + RECORD_SEAT_DELTA + """
+local status = ARGV[1] == '1' and 'reserved' or 'available'
+local seats = {}
+for i = 5, #ARGV, 2 do
+    redis.call('SETBIT', KEYS[1], ARGV[i + 1], ARGV[1])
+    record_bit(KEYS[2], ARGV[i + 1], ARGV[1], ARGV[2])
+    seats[#seats + 1] = {ARGV[i], status}
+end
+return record_delta(KEYS[3], KEYS[4], seats, ARGV[3], ARGV[4])
+"""
+
+# Kilit script'lerinin bitmap yüklenmemiş dönüşü
+SEAT_STATE_COLD = -1
+
+# Rezerve bitmap'ini veritabanındaki haliyle ezer, sonra veritabanı okunmadan önce
+# alınan sıradan sonraki yazıları geri uygular. Rezervasyon bitleri commit'ten önce
+# yazıldığı için son birkaç saniyedeki yazılar da (henüz görünmeyen işlemler)
+# geri uygulanır. Eşzamanlı yüklemeler birbirinin ihtiyaç duyduğu kayıtları silmesin
+# diye günlük temizlenmez (koltuk sayısıyla sınırlı).
+# KEYS: rezerve bitmap, yazma günlüğü, yükleme işareti
+# ARGV: okuma öncesi günlük sırası, bitmap, bitmap ttl, araç id, işaret ttl,
+#       commit bekleme payı (sn)
+REBUILD_RESERVED_BITS_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+local snapshot = tonumber(ARGV[1])
+local recent = tonumber(redis.call('TIME')[1]) - tonumber(ARGV[6])
+local writes = redis.call('HGETALL', KEYS[2])
+for i = 1, #writes, 2 do
+    if writes[i] ~= '_seq' then
+        local seq, value, written_at = string.match(writes[i + 1], '(%d+):(%d):(%d+)')
+        if tonumber(seq) > snapshot or tonumber(written_at) > recent then
+            redis.call('SETBIT', KEYS[1], writes[i], value)
+        end
+    end
+end
+redis.call('SET', KEYS[3], ARGV[4], 'EX', ARGV[5])
+return redis.call('GET', KEYS[1])
+"""
+
+# Süresi dolmuş kilitleri sefer indeksinden düşürür. Bu arada yeniden alınan veya
+# uzatılan (skoru ileride), bırakılan ya da rezervasyona çevrilen (indekste yok)
+# koltuklar atlanır; {düşürülen koltuk id'leri, versiyon} döner. Bu arada rezerve
+# edilmiş koltukların kilidi de düşürülür ama boşalmış sayılmaz, dönen listede yer almaz.
+# KEYS: sefer kilit indeksi, rezerve bitmap, sefer versiyonu, sefer delta günlüğü
+# ARGV: şimdiki zaman, delta günlüğü uzunluğu, delta günlüğü ttl,
+#       (koltuk id, koltuk indeksi)...
+TRIM_EXPIRED_SEAT_LOCKS_SCRIPT = RECORD_SEAT_DELTA + """
+local expired = {}
+local seats = {}
+for i = 4, #ARGV, 2 do
+    local expires_at = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if expires_at and tonumber(expires_at) <= tonumber(ARGV[1]) then
+        redis.call('ZREM', KEYS[1], ARGV[i])
+        local seat_index = tonumber(ARGV[i + 1])
+        if seat_index < 0 or redis.call('GETBIT', KEYS[2], seat_index) == 0 then
+            expired[#expired + 1] = ARGV[i]
+            seats[#seats + 1] = {ARGV[i], 'available'}
+        end
+    end
+end
+return {expired, record_delta(KEYS[3], KEYS[4], seats, ARGV[2], ARGV[3])}
+"""
+
+# Zamanı gelen rezervasyonları (veya kilit bitişlerini) kuyruktan atomik olarak alır
+# (birden çok işçi güvenle çalışır)
+# KEYS: süre dolum kuyruğu
+# ARGV: şimdiki zaman, en fazla kaç tane
+POP_DUE_RESERVATIONS_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+return due
+"""
+
+# Sefer snapshot'ını sadece versiyon değişmediyse yazar. Kilitler yayın yapmadan
+# süresi dolarak düşebildiği için snapshot en yakın kilit bitişinden önce silinir.
+# KEYS: snapshot, sefer versiyonu, sefer kilit indeksi
+# ARGV: snapshot versiyonu, hazır mesaj, ttl (ms), şimdiki zaman
+STORE_SEAT_SNAPSHOT_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[2]) or '0') ~= tonumber(ARGV[1]) then
+    return 0
+end
+local ttl = tonumber(ARGV[3])
+local next_lock = redis.call('ZRANGEBYSCORE', KEYS[3], '(' .. ARGV[4], '+inf', 'WITHSCORES', 'LIMIT', 0, 1)
+if #next_lock > 0 then
+    ttl = math.min(ttl, math.floor((tonumber(next_lock[2]) - tonumber(ARGV[4])) * 1000))
+end
+if ttl <= 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'version', ARGV[1], 'payload', ARGV[2])
+redis.call('PEXPIRE', KEYS[1], ttl)
+return 1
+"""
+
 class SeatReservationService:
     def __init__(self):
-        self.redis_client = redis.StrictRedis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            decode_responses=True
+        self.redis_client = get_redis_client(decode_responses=True)
+        # Bitmap'ler ham byte olarak okunur
+        self.raw_redis_client = get_redis_client()
+        self.acquire_lock_script = self.redis_client.register_script(ACQUIRE_SEAT_LOCK_SCRIPT)
+        self.extend_lock_script = self.redis_client.register_script(EXTEND_SEAT_LOCK_SCRIPT)
+        self.release_lock_script = self.redis_client.register_script(RELEASE_SEAT_LOCK_SCRIPT)
+        self.consume_lock_script = self.redis_client.register_script(CONSUME_SEAT_LOCK_SCRIPT)
+        self.acquire_locks_script = self.redis_client.register_script(ACQUIRE_SEAT_LOCKS_SCRIPT)
+        self.release_locks_script = self.redis_client.register_script(RELEASE_SEAT_LOCKS_SCRIPT)
+        self.consume_locks_script = self.redis_client.register_script(CONSUME_SEAT_LOCKS_SCRIPT)
+        self.set_reserved_bits_script = self.redis_client.register_script(SET_RESERVED_BITS_SCRIPT)
+        self.rebuild_reserved_bits_script = self.raw_redis_client.register_script(
+            REBUILD_RESERVED_BITS_SCRIPT
+        )
+        self.pop_due_reservations_script = self.redis_client.register_script(
+            POP_DUE_RESERVATIONS_SCRIPT
         )
+        self.trim_expired_locks_script = self.redis_client.register_script(
+            TRIM_EXPIRED_SEAT_LOCKS_SCRIPT
+        )
+        self.store_snapshot_script = self.redis_client.register_script(STORE_SEAT_SNAPSHOT_SCRIPT)
         self.channel_layer = get_channel_layer()
+        # Pencere 0 ise her değişiklik istek içinde hemen yayınlanır
+        self.broadcaster = None
+        if settings.SEAT_BROADCAST_WINDOW_MS > 0:
+            self.broadcaster = SeatBroadcastCoalescer(
+                self, settings.SEAT_BROADCAST_WINDOW_MS / 1000
+            )
         self.lock_timeout = 900  
         self.temp_lock_timeout = 300  
+        self.seat_state_timeout = 3600
+        self.seat_state_lock_timeout = 5
+        # Bitmap işaretten uzun yaşar, yeniden yükleme sırasında eski hali sunulabilsin
+        self.reserved_bits_timeout = self.seat_state_timeout * 2
+        # Rezervasyon işlemlerinin commit süresinden uzun olmalı
+        self.reserved_bits_write_grace = 30
+        self.seat_delta_log_size = 100
+        self.seat_snapshot_timeout = settings.SEAT_SNAPSHOT_TIMEOUT
+        self.reservation_lock_mode = settings.RESERVATION_LOCK_MODE
+        # Bekleyen rezervasyonlar son ödeme zamanına göre sıralı tutulur
+        self.expiry_queue_key = "reservation_expiry"
+        # Geçici kilit bitişleri ("sefer:koltuk"), expire_seat_locks ile işlenir
+        self.lock_expiry_queue_key = "seat_lock_expiry"
+        self._trip_vehicles = {}
+        self._seat_layouts = {}
+        self._seat_indexes = {}
 
     def get_trip_seats(self, trip_id):
-        cache_key = f"trip_seats_{trip_id}"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return cached_data
+        """Sefer koltuk durumlarını bitmap'lerden oluştur (SQL'siz sıcak yol)"""
+        try:
+            vehicle_id = self.get_trip_vehicle_id(trip_id)
+            reserved_bits, locked_seat_ids = self.get_seat_state(trip_id, vehicle_id)
+        except Trip.DoesNotExist:
+            return []
+
+        # Okuma sefer aracının değiştiğini fark ettiyse düzen yeni araçtan alınır
+        layout = self.get_seat_layout(self._trip_vehicles.get(int(trip_id), vehicle_id))
+        return self.build_seat_list(layout, reserved_bits, locked_seat_ids)
+
+    @classmethod
+    def build_seat_list(cls, layout, reserved_bits, locked_seat_ids):
+        """Sabit koltuk düzenini bitmap ve kilit listesiyle birleştir"""
+        seat_data = []
+        for index, seat in enumerate(layout):
+            status = 'available'
+            if cls._get_bit(reserved_bits, index):
+                status = 'reserved'
+            elif seat['id'] in locked_seat_ids:
+                status = 'temp_locked'
+
+            seat_data.append({**seat, 'status': status})
+
+        return seat_data
 
+    def get_trip_vehicle_id(self, trip_id):
+        """Seferin aracını getir (süreç içinde saklanır)
+
+        Araç değişirse diğer süreçler bunu bitmap yükleme işaretindeki araç
+        id'sinden fark eder (bkz. get_seat_state, reset_trip_seat_state).
+        """
+        trip_id = int(trip_id)
+        vehicle_id = self._trip_vehicles.get(trip_id)
+        if vehicle_id is None:
+            vehicle_id = self.refresh_trip_vehicle_id(trip_id)
+        return vehicle_id
+
+    def refresh_trip_vehicle_id(self, trip_id):
+        """Seferin aracını veritabanından yeniden oku"""
+        trip_id = int(trip_id)
+        vehicle_id = Trip.objects.values_list('vehicle_id', flat=True).get(id=trip_id)
+        self._trip_vehicles[trip_id] = vehicle_id
+        return vehicle_id
+
+    def reset_trip_seat_state(self, trip_id):
+        """Seferin aracı değişti: bitmap ve snapshot eski düzene göre, yeniden yüklensin"""
+        self._trip_vehicles.pop(int(trip_id), None)
+        self.redis_client.delete(
+            f"trip_seat_state_{trip_id}",
+            f"trip_reserved_bits_{trip_id}",
+            f"trip_reserved_writes_{trip_id}",
+            f"trip_seat_snapshot_{trip_id}",
+        )
+
+    def get_trip_vehicle_ids(self, trip_ids):
+        """Birden çok seferin aracını tek sorguda getir, olmayan seferler atlanır"""
+        trip_ids = [int(trip_id) for trip_id in trip_ids]
+        missing = [trip_id for trip_id in trip_ids if trip_id not in self._trip_vehicles]
+        if missing:
+            self._trip_vehicles.update(
+                Trip.objects.filter(id__in=missing).values_list('id', 'vehicle_id')
+            )
+        return {
+            trip_id: self._trip_vehicles[trip_id]
+            for trip_id in trip_ids if trip_id in self._trip_vehicles
+        }
+
+    def get_seat_layout(self, vehicle_id):
+        """Aracın sabit koltuk düzeni (sıra = bitmap indeksi)"""
+        layout = self._seat_layouts.get(vehicle_id)
+        if layout is not None:
+            return layout
+
+        layout = self.decode_seat_layout(self.redis_client.get(self.seat_layout_key(vehicle_id)))
+        if layout is None:
+            layout = list(self.seat_layout_query(vehicle_id))
+            # Koltuk düzeni değişmez, süresiz cache'le; koltukları henüz oluşturulmamış
+            # aracın boş düzeni cache'lenmez
+            if layout:
+                self.redis_client.set(self.seat_layout_key(vehicle_id), encode_message(layout))
+        return self.remember_seat_layout(vehicle_id, layout)
+
+    @staticmethod
+    def seat_layout_key(vehicle_id):
+        # Async servis de okuduğu için Django cache'i değil düz JSON anahtar
+        return f"vehicle_seat_layout_{vehicle_id}"
+
+    @staticmethod
+    def seat_layout_query(vehicle_id):
+        return (
+            Seat.objects.filter(vehicle_id=vehicle_id)
+            .order_by('row_number', 'seat_letter')
+            .values('id', 'seat_number', 'row_number', 'seat_letter', 'is_window')
+        )
+
+    @staticmethod
+    def decode_seat_layout(payload):
+        metrics.record_cache('seat_layout', payload is not None)
+        return None if payload is None else json.loads(payload)
+
+    def remember_seat_layout(self, vehicle_id, layout):
+        """Düzeni ve koltuk indekslerini süreç içinde sakla (boş düzen saklanmaz)"""
+        if layout:
+            self._seat_layouts[vehicle_id] = layout
+            self._seat_indexes[vehicle_id] = {
+                seat['id']: index for index, seat in enumerate(layout)
+            }
+        return layout
+
+    def delete_seat_layouts(self, vehicle_ids):
+        """Araçların cache'lenmiş koltuk düzenlerini sil"""
+        vehicle_ids = list(vehicle_ids)
+        for vehicle_id in vehicle_ids:
+            self._seat_layouts.pop(vehicle_id, None)
+            self._seat_indexes.pop(vehicle_id, None)
+        if vehicle_ids:
+            self.redis_client.delete(*[self.seat_layout_key(vehicle_id) for vehicle_id in vehicle_ids])
+
+    def get_seat_index(self, trip_id, seat_id):
+        """Koltuğun sefer bitmap'indeki indeksi, araçta yoksa None
+
+        Koltuk önbellekteki araçta yoksa sefer aracı değişmiş olabilir, araç bir
+        kez veritabanından yeniden okunur.
+        """
+        vehicle_id = self.get_trip_vehicle_id(trip_id)
+        seat_index = self._vehicle_seat_index(vehicle_id, seat_id)
+        if seat_index is None:
+            current_vehicle_id = self.refresh_trip_vehicle_id(trip_id)
+            if current_vehicle_id != vehicle_id:
+                seat_index = self._vehicle_seat_index(current_vehicle_id, seat_id)
+        return seat_index
+
+    def _vehicle_seat_index(self, vehicle_id, seat_id):
+        if vehicle_id not in self._seat_indexes:
+            self.get_seat_layout(vehicle_id)
+        return self._seat_indexes.get(vehicle_id, {}).get(int(seat_id))
+
+    def _seat_index_or_none(self, trip_id, seat_id):
+        # Silinmiş seferin koltuğu da indekssiz sayılır
         try:
-            trip = Trip.objects.get(id=trip_id)
-            seats = Seat.objects.filter(vehicle=trip.vehicle).order_by('row_number', 'seat_letter')
-            
-            reserved_seats = set(
+            return self.get_seat_index(trip_id, seat_id)
+        except Trip.DoesNotExist:
+            return None
+
+    def get_seat_state(self, trip_id, vehicle_id):
+        """Rezerve bitmap'ini ve geçici kilitli koltukları tek round trip'te oku"""
+        pipe = self.raw_redis_client.pipeline(transaction=False)
+        self._queue_reserved_bits(pipe, trip_id)
+        self._queue_locked_seat_ids(pipe, trip_id)
+        hydrated, reserved_bits, locked_seat_ids = pipe.execute()
+
+        if not self._track_hydrated_vehicle(trip_id, vehicle_id, hydrated):
+            reserved_bits = self._hydrate_single_flight(trip_id, reserved_bits)
+
+        return reserved_bits or b'', {int(seat_id) for seat_id in locked_seat_ids}
+
+    @staticmethod
+    def _queue_reserved_bits(pipe, trip_id):
+        # Yükleme işareti (yüklendiği araç) ve rezerve bitmap'i
+        pipe.get(f"trip_seat_state_{trip_id}")
+        pipe.get(f"trip_reserved_bits_{trip_id}")
+
+    def _track_hydrated_vehicle(self, trip_id, vehicle_id, hydrated):
+        """Bitmap yüklü mü; başka araçla yüklenmişse süreç önbelleği o araca çekilir"""
+        metrics.record_cache('seat_state', bool(hydrated))
+        if hydrated and int(hydrated) != vehicle_id:
+            # Sefer aracı değişmiş, süreç önbelleği eski
+            self._trip_vehicles[int(trip_id)] = int(hydrated)
+        return bool(hydrated)
+
+    def seat_state_lock(self, client, trip_id):
+        """Bitmap yükleme kilidi (senkron ya da async istemciyle)"""
+        return client.lock(f"trip_seat_state_lock_{trip_id}", timeout=self.seat_state_lock_timeout)
+
+    @staticmethod
+    def serve_stale_bits(stale_bits):
+        # Bitler yazma yollarında yerinde güncellendiği için eski bitmap
+        # yeniden yükleme bitene kadar güvenle sunulabilir
+        return stale_bits is not None and settings.SEAT_STATE_STALE_WHILE_REVALIDATE
+
+    @staticmethod
+    def needs_hydration(hydrated, vehicle_id):
+        return hydrated is None or int(hydrated) != vehicle_id
+
+    def _hydrate_single_flight(self, trip_id, stale_bits):
+        """Aynı sefer için eşzamanlı yeniden yüklemelerde sadece biri veritabanına gider
+
+        Yükleme seferin aracını veritabanından yeniden okur (süreç önbelleği
+        eskiyse yükleme işaretine yanlış araç yazılmasın).
+        """
+        lock = self.seat_state_lock(self.redis_client, trip_id)
+        if lock.acquire(blocking=False):
+            try:
+                return self._hydrate_reserved_bits(trip_id, self.refresh_trip_vehicle_id(trip_id))
+            finally:
+                try:
+                    lock.release()
+                except redis.exceptions.LockError:
+                    pass
+
+        if self.serve_stale_bits(stale_bits):
+            return stale_bits
+
+        deadline = time.monotonic() + self.seat_state_lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            pipe = self.raw_redis_client.pipeline(transaction=False)
+            self._queue_reserved_bits(pipe, trip_id)
+            hydrated, reserved_bits = pipe.execute()
+            if hydrated:
+                self._trip_vehicles[int(trip_id)] = int(hydrated)
+                return reserved_bits
+
+        return self._hydrate_reserved_bits(trip_id, self.refresh_trip_vehicle_id(trip_id))
+
+    def ensure_seat_state(self, trip_id):
+        """Rezerve bitmap'i seferin güncel aracıyla yüklü değilse yükle
+
+        Kilit script'leri yüklenmemiş ya da başka araçla yüklenmiş bitmap'te
+        kapalı başarısız olur.
+        """
+        vehicle_id = self.refresh_trip_vehicle_id(trip_id)
+        hydrated = self.redis_client.get(f"trip_seat_state_{trip_id}")
+        if self.needs_hydration(hydrated, vehicle_id):
+            self._hydrate_single_flight(trip_id, None)
+
+    def get_locked_seat_ids(self, trip_id):
+        """Seferin geçici kilitli koltukları, maliyet sadece o seferin kilit sayısı kadar"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_locked_seat_ids(pipe, trip_id)
+        return {int(seat_id) for seat_id in pipe.execute()[-1]}
+
+    def _queue_locked_seat_ids(self, pipe, trip_id):
+        # Süresi dolmuş kilitler skorla elenir; indeksten expire_seat_locks düşürür ki
+        # boşalan koltuklar yayınlansın
+        pipe.zrangebyscore(f"trip_seat_locks_{trip_id}", time.time(), '+inf')
+
+    def _hydrate_reserved_bits(self, trip_id, vehicle_id):
+        """Rezerve bitmap'ini veritabanından yeniden oluştur"""
+        return self._hydrate_reserved_bits_many({int(trip_id): vehicle_id})[int(trip_id)]
+
+    def _hydrate_reserved_bits_many(self, trip_vehicles):
+        """Birden çok seferin rezerve bitmap'ini tek sorgu ile yeniden oluştur"""
+        for vehicle_id in trip_vehicles.values():
+            self.get_seat_layout(vehicle_id)
+
+        # Günlük sırası veritabanı okunmadan önce alınmalı
+        pipe = self.redis_client.pipeline(transaction=False)
+        for trip_id in trip_vehicles:
+            self._queue_reserved_write_seq(pipe, trip_id)
+        write_seqs = self._reserved_write_seqs(trip_vehicles, pipe.execute())
+
+        reserved = self.build_reserved_bits(
+            trip_vehicles, self.reserved_seats_query(trip_vehicles)
+        )
+
+        pipe = self.raw_redis_client.pipeline(transaction=False)
+        for trip_id, bits in reserved.items():
+            keys, args = self.rebuild_reserved_bits_args(
+                trip_id, trip_vehicles[trip_id], bits, write_seqs[trip_id]
+            )
+            self.rebuild_reserved_bits_script(keys=keys, args=args, client=pipe)
+        return {
+            trip_id: bits or b'' for trip_id, bits in zip(reserved, pipe.execute())
+        }
+
+    def _queue_reserved_write_seq(self, pipe, trip_id):
+        # Günlük yükleme bitene kadar düşmesin diye süresi de yenilenir
+        log_key = f"trip_reserved_writes_{trip_id}"
+        pipe.hget(log_key, '_seq')
+        pipe.expire(log_key, self.reserved_bits_timeout)
+
+    @staticmethod
+    def _reserved_write_seqs(trip_ids, results):
+        return {
+            trip_id: int(results[position * 2] or 0)
+            for position, trip_id in enumerate(trip_ids)
+        }
+
+    def rebuild_reserved_bits_args(self, trip_id, vehicle_id, bits, write_seq):
+        keys = [
+            f"trip_reserved_bits_{trip_id}",
+            f"trip_reserved_writes_{trip_id}",
+            f"trip_seat_state_{trip_id}",
+        ]
+        args = [
+            write_seq, bytes(bits), self.reserved_bits_timeout,
+            vehicle_id, self.seat_state_timeout, self.reserved_bits_write_grace,
+        ]
+        return keys, args
+
+    @staticmethod
+    def reserved_seats_query(trip_ids):
+        return Reservation.objects.filter(
+            trip_id__in=list(trip_ids),
+            status__in=['pending', 'confirmed']
+        ).values_list('trip_id', 'seat_id')
+
+    def build_reserved_bits(self, trip_vehicles, reserved_seats):
+        """Rezervasyon satırlarından sefer başına bitmap oluştur (düzenler yüklenmiş olmalı)"""
+        reserved = {}
+        for trip_id, vehicle_id in trip_vehicles.items():
+            layout = self._seat_layouts.get(vehicle_id, [])
+            reserved[trip_id] = bytearray((len(layout) + 7) // 8)
+
+        for trip_id, seat_id in reserved_seats:
+            seat_indexes = self._seat_indexes.get(trip_vehicles[trip_id], {})
+            if seat_id in seat_indexes:
+                self._set_bit(reserved[trip_id], seat_indexes[seat_id])
+        return reserved
+
+    def get_seat_counts(self, trip_ids):
+        """Seferlerin koltuk sayaçları, koltuk bazında iş yapmadan (BITCOUNT/ZCOUNT)"""
+        trip_vehicles = self.get_trip_vehicle_ids(trip_ids)
+
+        now = time.time()
+        pipe = self.raw_redis_client.pipeline(transaction=False)
+        for trip_id in trip_vehicles:
+            pipe.get(f"trip_seat_state_{trip_id}")
+            pipe.bitcount(f"trip_reserved_bits_{trip_id}")
+            pipe.zcount(f"trip_seat_locks_{trip_id}", now, '+inf')
+        results = pipe.execute()
+
+        state = {}
+        for position, trip_id in enumerate(trip_vehicles):
+            state[trip_id] = results[position * 3:position * 3 + 3]
+            hydrated = state[trip_id][0]
+            if hydrated and int(hydrated) != trip_vehicles[trip_id]:
+                # Sefer aracı değişmiş, bitmap yeni araçla yüklü
+                trip_vehicles[trip_id] = self._trip_vehicles[trip_id] = int(hydrated)
+
+        # Henüz bitmap'i olmayan seferler (araçları yeniden okunup) toplu olarak yüklenir
+        missing = [trip_id for trip_id in trip_vehicles if not state[trip_id][0]]
+        if missing:
+            missing = dict(Trip.objects.filter(id__in=missing).values_list('id', 'vehicle_id'))
+            self._trip_vehicles.update(missing)
+            trip_vehicles.update(missing)
+            for trip_id, bits in self._hydrate_reserved_bits_many(missing).items():
+                state[trip_id][1] = int.from_bytes(bits, 'big').bit_count()
+
+        counts = {}
+        for trip_id, (_, reserved, locked) in state.items():
+            total = len(self.get_seat_layout(trip_vehicles[trip_id]))
+            counts[trip_id] = {
+                'total_seats': total,
+                'reserved_seats': reserved,
+                'locked_seats': locked,
+                'available_seats': max(total - reserved - locked, 0)
+            }
+        return counts
+
+    def reconcile_seat_counters(self):
+        """Trip.available_seats sütununu rezervasyonlardan tek UPDATE ile yeniden hesapla
+
+        Sütunu sadece bu periyodik görev yazar: rezervasyon yolları sefer satırını
+        kilitlemez (aynı seferin rezervasyonları paralel commit edilir), anlık
+        sayılar Redis bitmap'lerinden okunur. Bitmap'ler ayrıca
+        reconcile_seat_bitmaps ile uzlaştırılır.
+        """
+        seat_count = Seat.objects.filter(
+            vehicle_id=OuterRef('vehicle_id')
+        ).order_by().values('vehicle_id').annotate(count=Count('id')).values('count')
+        reserved_count = Reservation.objects.filter(
+            trip_id=OuterRef('pk'),
+            status__in=['pending', 'confirmed']
+        ).order_by().values('trip_id').annotate(count=Count('id')).values('count')
+
+        updated = Trip.objects.filter(status='scheduled').update(
+            available_seats=(
+                Coalesce(Subquery(seat_count), 0) - Coalesce(Subquery(reserved_count), 0)
+            )
+        )
+        # Doluluk sıralı sayfalar yeni değerlerle yeniden hesaplansın
+        invalidate_seat_counter_searches()
+        return updated
+
+    def reconcile_seat_bitmaps(self, chunk_size=500):
+        """Redis'teki sefer bitmap'lerini rezervasyonlarla karşılaştır, farklı olanları yeniden yükle
+
+        Arama sayaçları bu bitmap'lerden (BITCOUNT) okunduğu için kaçan bir bit
+        düzeltilene kadar sayaçlara yansır. Bitmap'i yüklenmemiş seferler zaten
+        ilk okumada veritabanından oluşturulur, atlanır.
+        """
+        rebuilt = 0
+        last_id = 0
+        while True:
+            trip_vehicles = dict(
+                Trip.objects.filter(status='scheduled', id__gt=last_id)
+                .order_by('id').values_list('id', 'vehicle_id')[:chunk_size]
+            )
+            if not trip_vehicles:
+                return rebuilt
+            last_id = max(trip_vehicles)
+            self._trip_vehicles.update(trip_vehicles)
+
+            pipe = self.raw_redis_client.pipeline(transaction=False)
+            for trip_id in trip_vehicles:
+                pipe.exists(f"trip_seat_state_{trip_id}")
+                pipe.get(f"trip_reserved_bits_{trip_id}")
+            results = pipe.execute()
+            cached = {
+                trip_id: results[position * 2 + 1] or b''
+                for position, trip_id in enumerate(trip_vehicles) if results[position * 2]
+            }
+            if not cached:
+                continue
+
+            cached_vehicles = {trip_id: trip_vehicles[trip_id] for trip_id in cached}
+            for vehicle_id in set(cached_vehicles.values()):
+                self.get_seat_layout(vehicle_id)
+            reserved = self.build_reserved_bits(
+                cached_vehicles,
                 Reservation.objects.filter(
-                    trip=trip,
+                    trip_id__in=list(cached),
                     status__in=['pending', 'confirmed']
-                ).values_list('seat_id', flat=True)
+                ).values_list('trip_id', 'seat_id')
             )
-            
-            # Geçici olarak kilitli koltukları Redis'ten bul
-            temp_locked_seats = set()
-            lock_pattern = f"seat_lock_{trip_id}_*"
-            for key in self.redis_client.scan_iter(match=lock_pattern):
-                seat_id = key.split('_')[-1]
-                temp_locked_seats.add(int(seat_id))
-
-            seat_data = []
-            for seat in seats:
-                status = 'available'
-                if seat.id in reserved_seats:
-                    status = 'reserved'
-                elif seat.id in temp_locked_seats:
-                    status = 'temp_locked'
-                
-                seat_data.append({
-                    'id': seat.id,
-                    'seat_number': seat.seat_number,
-                    'row_number': seat.row_number,
-                    'seat_letter': seat.seat_letter,
-                    'is_window': seat.is_window,
-                    'status': status
-                })
-
-            # 5 dakika cache'le
-            cache.set(cache_key, seat_data, 300)
-            return seat_data
+            # Uzunluk farkı önemsiz (SETBIT bitmap'i büyütebilir), sadece bitler karşılaştırılır
+            mismatched = {
+                trip_id: cached_vehicles[trip_id] for trip_id, bits in reserved.items()
+                if bytes(bits).rstrip(b'\0') != cached[trip_id].rstrip(b'\0')
+            }
+            if mismatched:
+                # Eşzamanlı rezervasyonlar da fark gibi görünebilir; yeniden yükleme
+                # günlükteki yeni yazıları koruduğu için bu durumda da güvenlidir
+                logger.warning(f"Koltuk bitmap'i rezervasyonlarla uyuşmuyor, yeniden yüklendi: {sorted(mismatched)}")
+                self._hydrate_reserved_bits_many(mismatched)
+                rebuilt += len(mismatched)
 
-        except Trip.DoesNotExist:
-            return []
+    @staticmethod
+    def _get_bit(bits, index):
+        # Redis bitmap'leri her byte içinde en anlamlı bitten başlar
+        byte = index >> 3
+        return byte < len(bits) and bool(bits[byte] & (0x80 >> (index & 7)))
+
+    @staticmethod
+    def _set_bit(bits, index):
+        bits[index >> 3] |= 0x80 >> (index & 7)
+
+    def acquire_seat_lock(self, trip_id, seat_id, user_session, seat_index=-1):
+        """Kilidi tek round trip'te al, (fencing token, versiyon) döner; alınamazsa token None"""
+        vehicle_id = self.get_trip_vehicle_id(trip_id) if seat_index >= 0 else ''
+        keys, args = self.acquire_lock_args(trip_id, seat_id, user_session, seat_index, vehicle_id)
+        token, version = self.acquire_lock_script(keys=keys, args=args)
+        if token == SEAT_STATE_COLD:
+            # Bitmap yüklenip (araç değiştiyse indeks yeniden hesaplanıp) bir kez daha
+            # denenir, yine yüklü değilse kilit verilmez
+            self.ensure_seat_state(trip_id)
+            seat_index = self.get_seat_index(trip_id, seat_id)
+            if seat_index is None:
+                return None, 0
+            keys, args = self.acquire_lock_args(
+                trip_id, seat_id, user_session, seat_index, self.get_trip_vehicle_id(trip_id)
+            )
+            token, version = self.acquire_lock_script(keys=keys, args=args)
+        return (token if token > 0 else None), version
+
+    def acquire_lock_args(self, trip_id, seat_id, user_session, seat_index=-1, vehicle_id=''):
+        keys = [
+            f"seat_lock_{trip_id}_{seat_id}",
+            f"trip_seat_locks_{trip_id}",
+            f"trip_seat_fence_{trip_id}",
+            f"trip_reserved_bits_{trip_id}",
+            self.lock_expiry_queue_key,
+            f"trip_seat_state_{trip_id}",
+            *self.seat_delta_keys(trip_id),
+        ]
+        return keys, [
+            user_session, self.temp_lock_timeout, seat_id, time.time(), seat_index, trip_id,
+            *self.seat_delta_args(), vehicle_id,
+        ]
+
+    def extend_lock_args(self, trip_id, seat_id, user_session):
+        keys = [
+            f"seat_lock_{trip_id}_{seat_id}",
+            f"trip_seat_locks_{trip_id}",
+            self.lock_expiry_queue_key,
+        ]
+        return keys, [user_session, self.temp_lock_timeout, seat_id, time.time(), trip_id]
+
+    def release_lock_args(self, trip_id, seat_id, user_session, seat_index=-1):
+        keys = [
+            f"seat_lock_{trip_id}_{seat_id}",
+            f"trip_seat_locks_{trip_id}",
+            f"trip_reserved_bits_{trip_id}",
+            *self.seat_delta_keys(trip_id),
+        ]
+        return keys, [user_session, seat_id, seat_index, *self.seat_delta_args()]
 
     def create_temporary_lock(self, trip_id, seat_id, user_session):
         """Koltuk için geçici kilit oluştur"""
-        lock_key = f"seat_lock_{trip_id}_{seat_id}"
-        
-        # Mevcut kilidi kontrol et
-        existing_lock = self.redis_client.get(lock_key)
-        if existing_lock and existing_lock != user_session:
-            return False, "Koltuk başka bir yolcu tarafından seçilmiş"
+        try:
+            seat_index = self.get_seat_index(trip_id, seat_id)
+        except Trip.DoesNotExist:
+            seat_index = None
+        if seat_index is None:
+            return False, "Geçersiz koltuk", None
         
-        # Geçici kilit oluştur
-        self.redis_client.setex(
-            lock_key, 
-            self.temp_lock_timeout, 
-            user_session
-        )
+        # Kilit kontrolü ve oluşturma tek atomik script'te
+        token, version = self.acquire_seat_lock(trip_id, seat_id, user_session, seat_index)
+        if token is None:
+            return False, "Koltuk başka bir yolcu tarafından seçilmiş", None
         
         # Gerçek zamanlı güncelleme gönder
-        self.broadcast_seat_update(trip_id)
+        self.broadcast_seat_update(trip_id, {seat_id: 'temp_locked'}, version)
         
-        return True, "Koltuk geçici olarak rezerve edildi"
+        return True, "Koltuk geçici olarak rezerve edildi", token
+
+    def extend_temporary_lock(self, trip_id, seat_id, user_session):
+        """Geçici kilidin süresini uzat, kilit başkasınınsa None döner"""
+        keys, args = self.extend_lock_args(trip_id, seat_id, user_session)
+        return self.extend_lock_script(keys=keys, args=args) or None
 
     def release_temporary_lock(self, trip_id, seat_id, user_session):
         """Geçici kilidi serbest bırak"""
-        lock_key = f"seat_lock_{trip_id}_{seat_id}"
-        
-        # Sadece aynı session'ın kilidini kaldır
-        if self.redis_client.get(lock_key) == user_session:
-            self.redis_client.delete(lock_key)
-            self.broadcast_seat_update(trip_id)
-            return True
-        return False
-
-    def create_reservation(self, trip_id, seat_id, passenger_data, user_session):
+        seat_index = self._seat_index_or_none(trip_id, seat_id)
+
+        # Sadece aynı session'ın kilidini kaldır (compare-and-delete)
+        keys, args = self.release_lock_args(
+            trip_id, seat_id, user_session, -1 if seat_index is None else seat_index
+        )
+        released, version = self.release_lock_script(keys=keys, args=args)
+        # Bu arada rezerve edilen koltuk boşalmış yayınlanmaz (versiyon 0)
+        if version:
+            self.broadcast_seat_update(trip_id, {seat_id: 'available'}, version)
+        return bool(released)
+
+    def create_temporary_locks(self, trip_id, seat_ids, user_session):
+        """Birden çok koltuğu tek round trip'te ya hep ya hiç kilitle"""
+        seat_ids = list(dict.fromkeys(int(seat_id) for seat_id in seat_ids))
+        keys = [
+            f"trip_seat_locks_{trip_id}",
+            f"trip_seat_fence_{trip_id}",
+            f"trip_reserved_bits_{trip_id}",
+            self.lock_expiry_queue_key,
+            f"trip_seat_state_{trip_id}",
+            *self.seat_delta_keys(trip_id),
+        ] + [f"seat_lock_{trip_id}_{seat_id}" for seat_id in seat_ids]
+
+        # Bitmap yüklü değilse (veya başka araçla yüklüyse) yüklenip indeksler
+        # yeniden hesaplanarak bir kez daha denenir
+        for attempt in range(2):
+            if attempt:
+                self.ensure_seat_state(trip_id)
+            try:
+                vehicle_id = self.get_trip_vehicle_id(trip_id)
+                seat_indexes = [self.get_seat_index(trip_id, seat_id) for seat_id in seat_ids]
+            except Trip.DoesNotExist:
+                seat_indexes = [None]
+            if not seat_ids or None in seat_indexes:
+                return False, "Geçersiz koltuk", None
+
+            args = [
+                user_session, self.temp_lock_timeout, time.time(), trip_id,
+                *self.seat_delta_args(), vehicle_id,
+            ]
+            for seat_id, seat_index in zip(seat_ids, seat_indexes):
+                args += [seat_id, seat_index]
+            acquired, value, version = self.acquire_locks_script(keys=keys, args=args)
+            if acquired != SEAT_STATE_COLD:
+                break
+        if acquired == SEAT_STATE_COLD:
+            return False, "Koltuk durumu yüklenemedi", None
+        if not acquired:
+            return False, f"Koltuk başka bir yolcu tarafından seçilmiş: {value}", None
+
+        self.broadcast_seat_update(
+            trip_id, {seat_id: 'temp_locked' for seat_id in seat_ids}, version
+        )
+
+        return True, "Koltuklar geçici olarak rezerve edildi", value
+
+    def release_temporary_locks(self, trip_id, seat_ids, user_session):
+        """Session'a ait koltuk kilitlerini tek round trip'te bırak"""
+        seat_ids = list(dict.fromkeys(int(seat_id) for seat_id in seat_ids))
+        if not seat_ids:
+            return []
+        args = [user_session, *self.seat_delta_args()]
+        for seat_id in seat_ids:
+            seat_index = self._seat_index_or_none(trip_id, seat_id)
+            args += [seat_id, -1 if seat_index is None else seat_index]
+        released, available, version = self.release_locks_script(
+            keys=[f"trip_seat_locks_{trip_id}", f"trip_reserved_bits_{trip_id}"]
+            + self.seat_delta_keys(trip_id)
+            + [f"seat_lock_{trip_id}_{seat_id}" for seat_id in seat_ids],
+            args=args
+        )
+        # Bu arada rezerve edilmiş koltuklar boşalmış gibi yayınlanmaz
+        if version:
+            self.broadcast_seat_update(
+                trip_id, {int(seat_id): 'available' for seat_id in available}, version
+            )
+        return [int(seat_id) for seat_id in released]
+
+    def _get_reservation_trip(self, trip_id):
+        """Rezervasyon için seferi getir
+
+        'seat' modunda sefer satırı kilitlenmez: koltuk özelliğini Redis kilidi
+        ve kısmi unique index sağlar, aynı seferin farklı koltukları paralel
+        commit edilir. 'trip' modu eski davranıştır (sefer başına tek yazar).
+        """
+        trips = Trip.objects.all()
+        if self.reservation_lock_mode == 'trip':
+            trips = trips.select_for_update()
+        trip = trips.get(id=trip_id)
+        # Bitmap indeksleri güncel araçla hesaplansın
+        self._trip_vehicles[trip.id] = trip.vehicle_id
+        return trip
+
+    def create_reservation(self, trip_id, seat_id, passenger_data, user_session,
+                           fencing_token):
         """Rezervasyon oluştur"""
         lock_key = f"seat_lock_{trip_id}_{seat_id}"
         
         # Geçici kilidi kontrol et
-        if self.redis_client.get(lock_key) != user_session:
+        owner, token = self.redis_client.hmget(lock_key, 'owner', 'token')
+        if owner != user_session:
+            return None, "Koltuk kilidi geçersiz"
+        # Token zorunlu: kilit alınırken verilen token olmadan kilit tüketilemez
+        if fencing_token is None or str(fencing_token) != token:
             return None, "Koltuk kilidi geçersiz"
 
+        consumed = []
         try:
             with transaction.atomic():
-                trip = Trip.objects.select_for_update().get(id=trip_id)
+                trip = self._get_reservation_trip(trip_id)
                 seat = Seat.objects.get(id=seat_id, vehicle=trip.vehicle)
                 passenger = User.objects.get(id=passenger_data['phone'])
-                
-                # Çifte rezervasyon kontrolü
-                existing = Reservation.objects.filter(
-                    trip=trip,
-                    seat=seat,
-                    status__in=['pending', 'confirmed']
-                )
-                if existing.exists():
-                    return None, "Koltuk zaten rezerve edilmiş"
 
-                # Rezervasyon oluştur
+                # Rezervasyon oluştur (çifte rezervasyonu kısmi unique index engeller)
                 reservation = Reservation.objects.create(
                     trip=trip,
                     seat=seat,
@@ -139,29 +1022,168 @@ class SeatReservationService:
                     status='pending'
                 )
 
-                # Geçici kilidi rezervasyon kilidi ile değiştir
-                reservation_lock_key = f"reservation_lock_{reservation.id}"
-                self.redis_client.setex(
-                    reservation_lock_key,
-                    self.lock_timeout,
-                    str(reservation.id)
+                # Geçici kilidi rezervasyon kilidi ile değiştir. Token bu arada
+                # değiştiyse (kilit düştü ve başkası aldı) rezervasyon geri alınır.
+                version = self.consume_lock_script(
+                    keys=[
+                        lock_key,
+                        f"trip_seat_locks_{trip_id}",
+                        f"trip_reserved_bits_{trip_id}",
+                        f"reservation_lock_{reservation.id}",
+                        self.expiry_queue_key,
+                        f"trip_reserved_writes_{trip_id}",
+                        *self.seat_delta_keys(trip_id),
+                    ],
+                    args=[
+                        user_session,
+                        token,
+                        seat_id,
+                        self.get_seat_index(trip_id, seat_id),
+                        reservation.id,
+                        self.lock_timeout,
+                        reservation.expires_at.timestamp(),
+                        self.reserved_bits_timeout,
+                        *self.seat_delta_args(),
+                    ]
                 )
+                if not version:
+                    transaction.set_rollback(True)
+                    return None, "Koltuk kilidi geçersiz"
+                consumed = [reservation]
                 
-                # Geçici kilidi temizle
-                self.redis_client.delete(lock_key)
-                
-                # Cache'i temizle
-                cache.delete(f"trip_seats_{trip_id}")
-                
-                # Gerçek zamanlı güncelleme
-                self.broadcast_seat_update(trip_id)
+                # Gerçek zamanlı güncelleme commit'ten sonra; callback try içinde
+                # çalışır, hatası commit edilmiş rezervasyonu geri almasın diye robust
+                transaction.on_commit(
+                    lambda: self.broadcast_seat_update(trip_id, {seat_id: 'reserved'}, version),
+                    robust=True
+                )
                 
-                return reservation, "Rezervasyon başarıyla oluşturuldu"
+            return reservation, "Rezervasyon başarıyla oluşturuldu"
+
+        except IntegrityError as e:
+            self._undo_consumed_locks(trip_id, consumed)
+            if is_seat_conflict(e):
+                return None, "Koltuk zaten rezerve edilmiş"
+            logger.error(f"Rezervasyon oluşturma hatası: {str(e)}")
+            return None, f"Rezervasyon oluşturulamadı: {str(e)}"
+        except Exception as e:
+            self._undo_consumed_locks(trip_id, consumed)
+            logger.error(f"Rezervasyon oluşturma hatası: {str(e)}")
+            return None, f"Rezervasyon oluşturulamadı: {str(e)}"
+
+    def create_reservations(self, trip_id, seat_ids, passenger_data, user_session,
+                            fencing_token):
+        """Birden çok koltuk için ya hep ya hiç rezervasyon, ortak grup PNR ile"""
+        seat_ids = list(dict.fromkeys(int(seat_id) for seat_id in seat_ids))
+        if not seat_ids:
+            return None, "Koltuk seçilmedi"
+        lock_keys = [f"seat_lock_{trip_id}_{seat_id}" for seat_id in seat_ids]
+
+        # Tüm geçici kilitler aynı session ve aynı token'a ait olmalı
+        pipe = self.redis_client.pipeline(transaction=False)
+        for lock_key in lock_keys:
+            pipe.hmget(lock_key, 'owner', 'token')
+        locks = pipe.execute()
+        token = locks[0][1]
+        if any(owner != user_session or lock_token != token for owner, lock_token in locks):
+            return None, "Koltuk kilidi geçersiz"
+        # Token zorunlu: kilit alınırken verilen token olmadan kilit tüketilemez
+        if fencing_token is None or str(fencing_token) != token:
+            return None, "Koltuk kilidi geçersiz"
+
+        consumed = []
+        try:
+            with transaction.atomic():
+                trip = self._get_reservation_trip(trip_id)
+                seats = list(Seat.objects.filter(id__in=seat_ids, vehicle_id=trip.vehicle_id))
+                if len(seats) != len(seat_ids):
+                    return None, "Geçersiz koltuk"
+                passenger = User.objects.get(id=passenger_data['phone'])
+
+                # Çifte rezervasyonu kısmi unique index engeller
+                expires_at = timezone.now() + timedelta(minutes=15)
+                reservations = Reservation.bulk_create_with_pnrs([
+                    Reservation(
+                        trip=trip,
+                        seat=seat,
+                        user=passenger,
+                        passenger_phone=passenger_data['phone'],
+                        expires_at=expires_at,
+                        total_price=trip.price,
+                        status='pending'
+                    )
+                    for seat in seats
+                ])
+
+                args = [
+                    user_session, token, self.lock_timeout, expires_at.timestamp(),
+                    self.reserved_bits_timeout, *self.seat_delta_args(),
+                ]
+                for reservation in reservations:
+                    args += [
+                        reservation.seat_id,
+                        self.get_seat_index(trip_id, reservation.seat_id),
+                        reservation.id,
+                    ]
+                version = self.consume_locks_script(
+                    keys=[
+                        f"trip_seat_locks_{trip_id}",
+                        f"trip_reserved_bits_{trip_id}",
+                        self.expiry_queue_key,
+                        f"trip_reserved_writes_{trip_id}",
+                        *self.seat_delta_keys(trip_id),
+                    ]
+                    + [f"seat_lock_{trip_id}_{r.seat_id}" for r in reservations]
+                    + [f"reservation_lock_{r.id}" for r in reservations],
+                    args=args
+                )
+                if not version:
+                    transaction.set_rollback(True)
+                    return None, "Koltuk kilidi geçersiz"
+                consumed = reservations
+
+                # Tüm koltuklar commit'ten sonra tek yayında (robust: create_reservation'daki gibi)
+                transaction.on_commit(lambda: self.broadcast_seat_update(
+                    trip_id, {seat_id: 'reserved' for seat_id in seat_ids}, version
+                ), robust=True)
 
+            return reservations, "Rezervasyonlar başarıyla oluşturuldu"
+
+        except IntegrityError as e:
+            self._undo_consumed_locks(trip_id, consumed)
+            if is_seat_conflict(e):
+                return None, "Koltuk zaten rezerve edilmiş"
+            logger.error(f"Rezervasyon oluşturma hatası: {str(e)}")
+            return None, f"Rezervasyon oluşturulamadı: {str(e)}"
         except Exception as e:
+            self._undo_consumed_locks(trip_id, consumed)
             logger.error(f"Rezervasyon oluşturma hatası: {str(e)}")
             return None, f"Rezervasyon oluşturulamadı: {str(e)}"
 
+    def _undo_consumed_locks(self, trip_id, reservations):
+        """Kilitleri rezervasyona çevrilmiş ama commit edilememiş koltukları geri boşalt
+
+        Bitler kilit token'ı doğrulanırken (commit'ten önce) set edilir; işlem geri
+        alınırsa bitler, rezervasyon kilitleri ve bitiş kuyruğu kayıtları temizlenir.
+        """
+        if not reservations:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=True)
+            self._update_seat_bits(
+                pipe, trip_id, [reservation.seat_id for reservation in reservations], reserved=False
+            )
+            pipe.delete(*[f"reservation_lock_{reservation.id}" for reservation in reservations])
+            pipe.zrem(self.expiry_queue_key, *[reservation.id for reservation in reservations])
+            version = pipe.execute()[0]
+        except Exception as e:
+            # Kaçan bitleri reconcile_seat_bitmaps düzeltir
+            logger.error(f"Koltuk bitleri geri alınamadı: {str(e)}")
+            return
+        self.broadcast_seat_update(
+            trip_id, {reservation.seat_id: 'available' for reservation in reservations}, version
+        )
+
     def process_payment(self, reservation_id, payment_data):
         """Mock ödeme işlemi"""
         try:
@@ -175,6 +1197,14 @@ class SeatReservationService:
                 if timezone.now() > reservation.expires_at:
                     reservation.status = 'expired'
                     reservation.save()
+
+                    # Koltuk commit'ten sonra boşaltılır (robust: create_reservation'daki gibi)
+                    transaction.on_commit(
+                        lambda: self._release_expired_seats(
+                            [(reservation.id, reservation.trip_id, reservation.seat_id)]
+                        ),
+                        robust=True
+                    )
                     return None, "Rezervasyon süresi dolmuş"
 
                 # Mock ödeme servisi
@@ -199,11 +1229,12 @@ class SeatReservationService:
                     reservation.payment_id = payment.transaction_id
                     reservation.save()
                     
-                    # Cache temizle
-                    cache.delete(f"trip_seats_{reservation.trip.id}")
-                    
-                    # Gerçek zamanlı güncelleme
-                    self.broadcast_seat_update(reservation.trip.id)
+                    # Rezerve biti kilit tüketilirken set edildi, koltuk durumu değişmez;
+                    # commit'ten sonra yalnızca bitiş kuyruğu ve rezervasyon kilidi temizlenir
+                    transaction.on_commit(
+                        lambda: self._clear_reservation_expiry(reservation.id),
+                        robust=True
+                    )
                     
                     return payment, "Ödeme başarıyla tamamlandı"
                 else:
@@ -215,6 +1246,13 @@ class SeatReservationService:
             logger.error(f"Ödeme işleme hatası: {str(e)}")
             return None, f"Ödeme işlenemedi: {str(e)}"
 
+    def _clear_reservation_expiry(self, reservation_id):
+        """Onaylanan rezervasyonu bitiş kuyruğundan ve rezervasyon kilidinden çıkar"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.zrem(self.expiry_queue_key, reservation_id)
+        pipe.delete(f"reservation_lock_{reservation_id}")
+        pipe.execute()
+
     def mock_payment_service(self, amount, payment_data):
         """Mock ödeme servisi"""
         import random
@@ -242,48 +1280,342 @@ class SeatReservationService:
                 'error': random.choice(error_messages)
             }
 
-    def cleanup_expired_reservations(self):
-        """Süresi dolmuş rezervasyonları temizle"""
-        expired_reservations = Reservation.objects.filter(
-            status='pending',
-            expires_at__lt=timezone.now()
+    def expire_due_reservations(self, limit=None):
+        """Süre dolum kuyruğunda zamanı gelen rezervasyonları expired yap"""
+        limit = limit or settings.RESERVATION_SWEEP_CHUNK_SIZE
+        reservation_ids = self.pop_due_reservations_script(
+            keys=[self.expiry_queue_key], args=[time.time(), limit]
         )
-        
-        trip_ids = set()
-        for reservation in expired_reservations:
-            trip_ids.add(reservation.trip.id)
-            
-            # Rezervasyon kilidini temizle
-            lock_key = f"reservation_lock_{reservation.id}"
-            self.redis_client.delete(lock_key)
-        
-        # Rezervasyonları expired yap
-        expired_reservations.update(status='expired')
-        
-        # Cache temizle ve güncelle
-        for trip_id in trip_ids:
-            cache.delete(f"trip_seats_{trip_id}")
-            self.broadcast_seat_update(trip_id)
+        if not reservation_ids:
+            return 0
 
-    def broadcast_seat_update(self, trip_id):
-        """WebSocket ile koltuk güncellemelerini yayınla"""
         try:
-            seat_data = self.get_trip_seats(trip_id)
-            
-            async_to_sync(self.channel_layer.group_send)(
-                f"trip_{trip_id}",
-                {
-                    "type": "seat_update",
-                    "message": {
-                        "type": "seat_status_update",
-                        "trip_id": trip_id,
-                        "seats": seat_data,
-                        "timestamp": timezone.now().isoformat()
-                    }
-                }
+            expired_rows = self._expire_reservations(
+                Reservation.objects.filter(
+                    id__in=[int(reservation_id) for reservation_id in reservation_ids],
+                    status='pending',
+                    expires_at__lte=timezone.now()
+                ).values('id')
             )
+        except Exception:
+            # Kuyruğa geri koy, bir sonraki turda tekrar denenir
+            self.redis_client.zadd(
+                self.expiry_queue_key,
+                {reservation_id: time.time() for reservation_id in reservation_ids}
+            )
+            raise
+
+        self._requeue_skipped_reservations(
+            {int(reservation_id) for reservation_id in reservation_ids}
+            - {row[0] for row in expired_rows}
+        )
+        if expired_rows:
+            self._release_expired_seats(expired_rows)
+        return len(expired_rows)
+
+    def _requeue_skipped_reservations(self, reservation_ids):
+        """Kuyruktan alınıp güncellenmeyen, hâlâ bekleyen rezervasyonları geri koy
+
+        Ödeme işlemindeki (kilitli) satırlar atlanır; ödeme başarısız olursa
+        rezervasyon bir tarama aralığı sonra tekrar denenir.
+        """
+        if not reservation_ids:
+            return
+
+        retry_at = time.time() + settings.RESERVATION_EXPIRY_POLL_INTERVAL
+        pending = Reservation.objects.filter(
+            id__in=reservation_ids, status='pending'
+        ).values_list('id', 'expires_at')
+        due = {
+            reservation_id: max(expires_at.timestamp(), retry_at)
+            for reservation_id, expires_at in pending
+        }
+        if due:
+            self.redis_client.zadd(self.expiry_queue_key, due)
+
+    def expire_seat_locks(self, limit=None):
+        """Süresi dolan geçici kilitleri düşür ve koltukları sefer başına tek deltayla yayınla
+
+        Kilitler Redis'te kendiliğinden düştüğü için aksi halde sadece delta uygulayan
+        istemciler koltuğu yeniden bağlanana kadar temp_locked görür. Kuyruktan
+        işlenen kayıt sayısını döndürür (parça doluysa kuyrukta daha var demektir).
+        """
+        limit = limit or settings.RESERVATION_SWEEP_CHUNK_SIZE
+        now = time.time()
+        due = self.pop_due_reservations_script(
+            keys=[self.lock_expiry_queue_key], args=[now, limit]
+        )
+        if not due:
+            return 0
+
+        trip_seats = {}
+        for member in due:
+            trip_id, seat_id = member.split(':')
+            trip_seats.setdefault(int(trip_id), []).append(int(seat_id))
+        self.get_trip_vehicle_ids(trip_seats)
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for trip_id, seat_ids in trip_seats.items():
+            args = [now, *self.seat_delta_args()]
+            for seat_id in seat_ids:
+                seat_index = self._seat_index_or_none(trip_id, seat_id)
+                args += [seat_id, -1 if seat_index is None else seat_index]
+            self.trim_expired_locks_script(
+                keys=[f"trip_seat_locks_{trip_id}", f"trip_reserved_bits_{trip_id}"]
+                + self.seat_delta_keys(trip_id),
+                args=args, client=pipe
+            )
+        for trip_id, (seat_ids, version) in zip(trip_seats, pipe.execute()):
+            if version:
+                self.broadcast_seat_update(
+                    trip_id, {int(seat_id): 'available' for seat_id in seat_ids}, version
+                )
+        return len(due)
+
+    def cleanup_expired_reservations(self, chunk_size=None, max_chunks=None):
+        """Süresi dolmuş rezervasyonları sınırlı parçalar halinde temizle, toplam sayıyı döndür
+
+        Süre dolumları normalde expire_due_reservations ile anında işlenir;
+        bu tarama kuyruğa hiç girmemiş veya kaybolmuş kayıtlar için güvenlik ağıdır.
+        """
+        chunk_size = chunk_size or settings.RESERVATION_SWEEP_CHUNK_SIZE
+        total = 0
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            expired_rows = self._expire_reservation_chunk(chunk_size)
+            chunks += 1
+            total += len(expired_rows)
+            if expired_rows:
+                self._release_expired_seats(expired_rows)
+            if len(expired_rows) < chunk_size:
+                break
+        return total
+
+    def _expire_reservation_chunk(self, chunk_size):
+        """En eski süresi dolmuş bir parça rezervasyonu expired yap"""
+        return self._expire_reservations(
+            Reservation.objects.filter(
+                status='pending',
+                expires_at__lt=timezone.now()
+            ).order_by('expires_at').values('id')[:chunk_size]
+        )
+
+    def _expire_reservations(self, expired):
+        """Verilen id sorgusundaki rezervasyonları tek UPDATE ... RETURNING ile expired yap"""
+        if connection.features.has_select_for_update_skip_locked:
+            # Ödeme işlemindeki satırlar beklenmeden atlanır; kuyruktan gelenler geri
+            # konur, taramada olanlar sonraki taramada alınır
+            expired = expired.select_for_update(skip_locked=True)
+
+        with transaction.atomic():
+            subquery, params = expired.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {Reservation._meta.db_table} SET status = %s "
+                    f"WHERE id IN ({subquery}) RETURNING id, trip_id, seat_id",
+                    ['expired', *params]
+                )
+                return cursor.fetchall()
+
+    def _release_expired_seats(self, expired_rows):
+        """Redis kilitlerini ve bitlerini tek pipeline'da temizle, sefer başına tek delta yayınla"""
+        self.get_trip_vehicle_ids({trip_id for _, trip_id, _ in expired_rows})
+
+        trip_seats = {}
+        for _, trip_id, seat_id in expired_rows:
+            trip_seats.setdefault(trip_id, []).append(seat_id)
+
+        # Rezervasyon kilitlerini temizle ve koltukları sefer başına tek script'le boşalt
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.delete(*[f"reservation_lock_{row[0]}" for row in expired_rows])
+        pipe.zrem(self.expiry_queue_key, *[row[0] for row in expired_rows])
+        for trip_id, seat_ids in trip_seats.items():
+            self._update_seat_bits(pipe, trip_id, seat_ids, reserved=False)
+        versions = pipe.execute()[2:]
+        
+        # Güncellemeleri yayınla
+        for (trip_id, seat_ids), version in zip(trip_seats.items(), versions):
+            if version:
+                self.broadcast_seat_update(
+                    trip_id, {seat_id: 'available' for seat_id in seat_ids}, version
+                )
+
+    def _update_seat_bits(self, pipe, trip_id, seat_ids, reserved):
+        """Koltukların rezerve bitlerini verilen pipeline'a ekle (sonucu versiyon)"""
+        args = [int(reserved), self.reserved_bits_timeout, *self.seat_delta_args()]
+        for seat_id in seat_ids:
+            seat_index = self.get_seat_index(trip_id, seat_id)
+            if seat_index is not None:
+                args += [seat_id, seat_index]
+
+        self.set_reserved_bits_script(
+            keys=[f"trip_reserved_bits_{trip_id}", f"trip_reserved_writes_{trip_id}"]
+            + self.seat_delta_keys(trip_id),
+            args=args,
+            client=pipe
+        )
+
+    @staticmethod
+    def seat_delta_keys(trip_id):
+        return [f"trip_seat_version_{trip_id}", f"trip_seat_deltas_{trip_id}"]
+
+    def seat_delta_args(self):
+        return [self.seat_delta_log_size, self.seat_state_timeout]
+
+    @staticmethod
+    def merge_seat_changes(seats, changes, version):
+        """Değişiklikleri {koltuk id: (versiyon, durum)} sözlüğüne ekle, büyük versiyon geçerli"""
+        for seat_id, status in changes.items():
+            seat_id = int(seat_id)
+            current = seats.get(seat_id)
+            if current is None or current[0] < version:
+                seats[seat_id] = (version, status)
+
+    @staticmethod
+    def seat_delta_message(trip_id, seats, versions):
+        """Birleştirilmiş değişikliklerden delta mesajı
+
+        Her koltuk kendi değişiklik versiyonunu taşır. from_version sadece mesaj
+        aradaki tüm versiyonları kapsıyorsa verilir: istemci bu durumda versiyonunu
+        ilerletir, aksi halde koltukları versiyonlarına göre uygulayıp eksikleri ister.
+        """
+        version = max(versions)
+        contiguous = len(versions) == version - min(versions) + 1
+        return {
+            "type": "seat_delta",
+            "trip_id": trip_id,
+            "version": version,
+            "from_version": min(versions) if contiguous else None,
+            "seats": [
+                {'id': seat_id, 'status': status, 'version': seat_version}
+                for seat_id, (seat_version, status) in seats.items()
+            ],
+            "timestamp": timezone.now().isoformat()
+        }
+
+    def get_seat_sync(self, trip_id, since_version=None):
+        """İstemcinin versiyonuna göre kaçırılan delta'yı veya tam snapshot'ı gönderime hazır metin olarak döndür"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(f"trip_seat_version_{trip_id}")
+        pipe.lrange(f"trip_seat_deltas_{trip_id}", 0, -1)
+        pipe.hmget(f"trip_seat_snapshot_{trip_id}", 'version', 'payload')
+        current_version, entries, (snapshot_version, payload) = pipe.execute()
+        current_version = int(current_version or 0)
+
+        message = self.merge_seat_deltas(trip_id, since_version, current_version, entries)
+        if message is not None:
+            return encode_message(message)
+
+        # Güncel snapshot her bağlantıda yeniden kodlanmaz
+        fresh = payload is not None and int(snapshot_version) == current_version
+        metrics.record_cache('seat_snapshot', fresh)
+        if fresh:
+            return payload
+
+        # İstemci geride kaldı: tam snapshot (versiyon snapshot'tan önce okunur,
+        # delta'lar mutlak durum taşıdığı için tekrar uygulanmaları zararsızdır)
+        seats = self.get_trip_seats(trip_id)
+        if not seats:
+            return None
+        payload = encode_message(self.seat_snapshot_message(trip_id, current_version, seats))
+        keys, args = self.store_snapshot_args(trip_id, current_version, payload)
+        self.store_snapshot_script(keys=keys, args=args)
+        return payload
+
+    @staticmethod
+    def seat_snapshot_message(trip_id, version, seats):
+        return {
+            'type': 'initial_seats',
+            'trip_id': trip_id,
+            'version': version,
+            'seats': seats
+        }
+
+    def store_snapshot_args(self, trip_id, version, payload):
+        keys = [
+            f"trip_seat_snapshot_{trip_id}",
+            f"trip_seat_version_{trip_id}",
+            f"trip_seat_locks_{trip_id}",
+        ]
+        args = [version, payload, int(self.seat_snapshot_timeout * 1000), time.time()]
+        return keys, args
+
+    @staticmethod
+    def merge_seat_deltas(trip_id, since_version, current_version, entries):
+        """Günlük istemcinin versiyonundan sonrasını kesintisiz kapsıyorsa tek delta döndür"""
+        if since_version is None or since_version > current_version:
+            return None
+
+        missed = [
+            delta for delta in map(json.loads, entries)
+            if delta['version'] > since_version
+        ]
+        if since_version != current_version and (
+            not missed or missed[0]['version'] != since_version + 1
+        ):
+            return None
+
+        seats = {}
+        for delta in missed:
+            for seat in delta['seats']:
+                seats[seat['id']] = {**seat, 'version': delta['version']}
+        return {
+            'type': 'seat_delta',
+            'trip_id': trip_id,
+            'version': max(current_version, missed[-1]['version'] if missed else 0),
+            'seats': list(seats.values())
+        }
+
+    def build_seat_update_message(self, trip_id, changes=None, version=None):
+        """Yayınlanacak koltuk mesajını oluştur"""
+        # changes ({seat_id: status}) varsa sadece değişen koltuklar, değişikliği yapan
+        # script'in verdiği versiyonla gönderilir
+        if changes:
+            seats = {}
+            self.merge_seat_changes(seats, changes, version)
+            return self.seat_delta_message(trip_id, seats, {version})
+
+        return {
+            "type": "seat_status_update",
+            "trip_id": trip_id,
+            "version": int(self.redis_client.get(f"trip_seat_version_{trip_id}") or 0),
+            "seats": self.get_trip_seats(trip_id),
+            "timestamp": timezone.now().isoformat()
+        }
+
+    @staticmethod
+    def seat_update_event(message):
+        """Grup mesajı: metin bir kez kodlanır, consumer'lar olduğu gibi iletir"""
+        return {
+            "type": "seat_update",
+            "text": encode_message(message)
+        }
+
+    async def group_send(self, trip_id, message):
+        """Mesajı sefer grubuna gönder (süresi channel layer metriğine yazılır)"""
+        with metrics.observe(metrics.GROUP_SEND_SECONDS):
+            await self.channel_layer.group_send(f"trip_{trip_id}", self.seat_update_event(message))
+
+    def send_seat_update(self, trip_id, message):
+        """Mesajı sefer grubuna senkron gönder"""
+        try:
+            async_to_sync(self.group_send)(trip_id, message)
+        except Exception as e:
+            logger.error(f"WebSocket broadcast hatası: {str(e)}")
+
+    def broadcast_seat_update(self, trip_id, changes=None, version=None):
+        """WebSocket ile koltuk güncellemelerini yayınla (changes varsa versiyonuyla)"""
+        # Değişiklikler pencere boyunca birleştirilip arka planda yayınlanır
+        if changes and self.broadcaster is not None:
+            self.broadcaster.schedule(trip_id, changes, version)
+            return
+
+        try:
+            message = self.build_seat_update_message(trip_id, changes, version)
         except Exception as e:
             logger.error(f"WebSocket broadcast hatası: {str(e)}")
+            return
+        self.send_seat_update(trip_id, message)
 
 # Singleton instance
 seat_service = SeatReservationService()
\ No newline at end of file
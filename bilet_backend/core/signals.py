@@ -1,65 +1,95 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from .models import Vehicle, Seat
+from django.utils import timezone
+from .models import Vehicle, Route, Trip
+from .search import invalidate_trip_search
+from .services import seat_service
+from .seating import create_vehicle_seats
+
+# Bu alanlar değişince seferi içeren arama sonuçları geçersiz olur
+TRIP_SEARCH_FIELDS = [
+    'route_id', 'vehicle_id', 'company_id', 'departure_time', 'arrival_time', 'price', 'status'
+]
 
 @receiver(post_save, sender=Vehicle)
 def create_seats_for_vehicle(sender, instance, created, **kwargs):
     if not created:
         return
 
-    vehicle_type = instance.vehicle_type
-
-    if vehicle_type == 'bus':
-        create_bus_seats(instance)
-    elif vehicle_type == 'plane':
-        create_plane_seats(instance)
-    elif vehicle_type == 'train':
-        create_train_seats(instance)
-
-
-def create_bus_seats(vehicle):
-    rows = 10
-    letters = ['A', 'B', 'C', 'D']
-    window_letters = ['A', 'D']
-
-    for row in range(1, rows + 1):
-        for letter in letters:
-            Seat.objects.create(
-                vehicle=vehicle,
-                seat_number=f"{row}{letter}",
-                row_number=row,
-                seat_letter=letter,
-                is_window=letter in window_letters
-            )
-
-
-def create_plane_seats(vehicle):
-    rows = 30
-    letters = ['A', 'B', 'C', 'D', 'E', 'F']
-    window_letters = ['A', 'F']
-
-    for row in range(1, rows + 1):
-        for letter in letters:
-            Seat.objects.create(
-                vehicle=vehicle,
-                seat_number=f"{row}{letter}",
-                row_number=row,
-                seat_letter=letter,
-                is_window=letter in window_letters
-            )
-
-
-def create_train_seats(vehicle):
-    rows = 20
-    letters = ['A', 'B', 'C', 'D']
-    window_letters = ['A', 'D']  
-
-    for row in range(1, rows + 1):
-        for letter in letters:
-            Seat.objects.create(
-                vehicle=vehicle,
-                seat_number=f"{row}{letter}",
-                row_number=row,
-                seat_letter=letter,
-                is_window=letter in window_letters
-            )
+    create_vehicle_seats([instance])
+
+
+def trip_search_bucket(trip):
+    return (
+        trip.route.origin,
+        trip.route.destination,
+        trip.vehicle.vehicle_type,
+        timezone.localtime(trip.departure_time).date()
+    )
+
+
+def previous_search_bucket(trip, before):
+    """Kaydetmeden önceki alanlara göre arama kovası (sadece değişen ilişkiler sorgulanır)"""
+    route_id = before.get('route_id', trip.route_id)
+    vehicle_id = before.get('vehicle_id', trip.vehicle_id)
+    route = trip.route if route_id == trip.route_id else Route.objects.get(pk=route_id)
+    vehicle = trip.vehicle if vehicle_id == trip.vehicle_id else Vehicle.objects.get(pk=vehicle_id)
+    return (
+        route.origin,
+        route.destination,
+        vehicle.vehicle_type,
+        timezone.localtime(before.get('departure_time', trip.departure_time)).date()
+    )
+
+
+def invalidate_on_commit(buckets):
+    # Nesiller commit'ten önce artırılırsa eşzamanlı bir arama commit öncesi veriyi
+    # yeni nesille cache'leyebilir
+    buckets = set(buckets)
+
+    def invalidate():
+        for bucket in buckets:
+            invalidate_trip_search(*bucket)
+
+    transaction.on_commit(invalidate)
+
+
+def remember_search_fields(trip):
+    # Ertelenmiş (only/defer) alanlar okunmaz, okumak sorgu tetiklerdi
+    trip._search_before = {
+        field: trip.__dict__[field] for field in TRIP_SEARCH_FIELDS if field in trip.__dict__
+    }
+
+
+@receiver(post_init, sender=Trip)
+def remember_trip_search_fields(sender, instance, **kwargs):
+    remember_search_fields(instance)
+
+
+@receiver(post_save, sender=Trip)
+def invalidate_trip_search_on_save(sender, instance, created, **kwargs):
+    before = instance._search_before
+    # Yüklenirken bilinmeyen ama şimdi dolu alan değişmiş sayılır
+    changed = created or any(
+        field in instance.__dict__ and before.get(field, object()) != instance.__dict__[field]
+        for field in TRIP_SEARCH_FIELDS
+    )
+    if changed:
+        buckets = [trip_search_bucket(instance)]
+        # Yeniden planlanan seferde hem eski hem yeni gün geçersiz kılınır
+        if not created:
+            buckets.append(previous_search_bucket(instance, before))
+        invalidate_on_commit(buckets)
+    # Araç değişince koltuk bitmap'i eski düzenin indekslerini taşır
+    if not created and 'vehicle_id' in instance.__dict__ and (
+        before.get('vehicle_id', object()) != instance.__dict__['vehicle_id']
+    ):
+        trip_id = instance.pk
+        transaction.on_commit(lambda: seat_service.reset_trip_seat_state(trip_id))
+    remember_search_fields(instance)
+
+
+@receiver(post_delete, sender=Trip)
+def invalidate_trip_search_on_delete(sender, instance, **kwargs):
+    invalidate_on_commit([trip_search_bucket(instance)])
@@ -1,4 +1,5 @@
 from celery import shared_task
+from django.conf import settings
 from .services import seat_service
 import logging
 
@@ -8,13 +9,32 @@ logger = logging.getLogger(__name__)
 def cleanup_expired_reservations():
     """Süresi dolmuş rezervasyonları temizle"""
     try:
-        seat_service.cleanup_expired_reservations()
-        logger.info("Expired reservations cleaned up successfully")
+        expired = seat_service.cleanup_expired_reservations()
+        # Daemon çalışmıyorsa süresi dolan geçici kilitler de burada yayınlanır
+        unlocked = 0
+        while True:
+            processed = seat_service.expire_seat_locks()
+            unlocked += processed
+            if processed < settings.RESERVATION_SWEEP_CHUNK_SIZE:
+                break
+        logger.info(f"Expired reservations cleaned up successfully ({expired}, {unlocked} seat locks)")
         return "Success"
     except Exception as e:
         logger.error(f"Error cleaning up expired reservations: {str(e)}")
         return f"Error: {str(e)}"
 
+@shared_task
+def reconcile_seat_counters():
+    """Sefer boş koltuk sayaçlarını ve Redis bitmap'lerini rezervasyonlarla uzlaştır"""
+    try:
+        updated = seat_service.reconcile_seat_counters()
+        rebuilt = seat_service.reconcile_seat_bitmaps()
+        logger.info(f"Seat counters reconciled for {updated} trips, {rebuilt} seat bitmaps rebuilt")
+        return "Success"
+    except Exception as e:
+        logger.error(f"Error reconciling seat counters: {str(e)}")
+        return f"Error: {str(e)}"
+
 @shared_task
 def send_reservation_reminder(reservation_id):
     """Rezervasyon hatırlatması gönder"""
@@ -49,10 +69,16 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Periodik task'ları tanımla
 app.conf.beat_schedule = {
+    # Süre dolumları run_reservation_expiry ile anında işlenir; bu tarama kuyruğa
+    # girmemiş kayıtları ve daemon çalışmıyorsa tüm süre dolumlarını yakalar
     'cleanup-expired-reservations': {
-        'task': 'reservations.tasks.cleanup_expired_reservations',
+        'task': 'core.tasks.cleanup_expired_reservations',
         'schedule': crontab(minute='*/5'),  # Her 5 dakikada bir çalış
     },
+    'reconcile-seat-counters': {
+        'task': 'core.tasks.reconcile_seat_counters',
+        'schedule': crontab(minute='*/10'),
+    },
 }
 
 app.conf.timezone = 'Europe/Istanbul'
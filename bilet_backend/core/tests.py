@@ -1,3 +1,1280 @@
-from django.test import TestCase
+import io
+import json
+import pstats
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import views
+from .connections import TrackedConnectionPool, get_pool_stats
+from .middleware import ProfilingMiddleware
+from .models import (
+    User, Vehicle, Route, Company, Trip, Seat, Reservation, Payment, is_seat_conflict
+)
+from .serializer import PaymentSerializer
+from .pnr import PNR_ALPHABET, PNR_LENGTH, PNR_SPACE, PnrAllocator
+from .profiling import profile, should_profile, write_profile
+from .search import invalidate_trip_search, search_bucket_keys
+from .seating import create_vehicle_seats
+from .async_services import async_seat_service
+from .broadcast import SeatBroadcastCoalescer
+from .services import seat_service
+
+
+class SerializerQueryCountTests(TestCase):
+    """Liste ve detay endpoint'lerinin sorgu sayısı sefer/koltuk sayısından bağımsız olmalı"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='yolcu@biletal.com', password='test12345')
+        company = Company.objects.create(name='Biletal Turizm')
+        route = Route.objects.create(
+            origin='Adana', destination='Mersin',
+            distance_km=70, estimated_duration=timedelta(hours=1)
+        )
+        departure = timezone.now() + timedelta(days=1)
+
+        cls.trips = []
+        for i in range(3):
+            vehicle = Vehicle.objects.create(vehicle_type='bus', capacity=40)
+            cls.trips.append(Trip.objects.create(
+                company=company, vehicle=vehicle, route=route,
+                departure_time=departure + timedelta(hours=i),
+                arrival_time=departure + timedelta(hours=i + 1),
+                price=250
+            ))
+
+        seat = Seat.objects.filter(vehicle=cls.trips[0].vehicle).first()
+        cls.reservation = Reservation.objects.create(
+            trip=cls.trips[0], seat=seat, user=cls.user, passenger_phone='5550000000',
+            expires_at=timezone.now() + timedelta(minutes=15), total_price=250
+        )
+
+    def test_trip_list_query_count(self):
+        # seferler + koltuk prefetch + rezerve koltuklar
+        with self.assertNumQueries(3):
+            response = self.client.post(reverse('trip_list'), {
+                'origin': 'adana', 'destination': 'mersin', 'vehicle_type': 'bus'
+            }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        reserved = [
+            seat['id'] for trip in response.json() for seat in trip['seats'] if seat['is_reserved']
+        ]
+        self.assertEqual(reserved, [self.reservation.seat_id])
+
+    def test_trip_detail_query_count(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('trip_detail', args=[self.trips[0].id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['response'][0]['seats']), 40)
+
+    def test_payment_list_query_count(self):
+        for trip in self.trips[1:]:
+            Reservation.objects.create(
+                trip=trip, seat=trip.vehicle.seats.first(), user=self.user,
+                passenger_phone='5550000000',
+                expires_at=timezone.now() + timedelta(minutes=15), total_price=250
+            )
+        Payment.objects.bulk_create([
+            Payment(reservation=reservation, amount=250, payment_method='credit_card')
+            for reservation in Reservation.objects.all()
+        ])
+
+        # ödemeler (ilişkiler join ile) + koltuk prefetch + rezerve koltuklar
+        with self.assertNumQueries(3):
+            data = PaymentSerializer(Payment.objects.all(), many=True).data
+        self.assertEqual(len(data), 3)
+
+    def test_reservation_detail_query_count(self):
+        request = APIRequestFactory().get(f'/api/rest/reservation/{self.reservation.id}/')
+        with self.assertNumQueries(3):
+            response = views.reservation_detail(request, self.reservation.id)
+
+        self.assertEqual(response.status_code, 200)
+
+
+class ReservationConstraintTests(TestCase):
+    """Çifte rezervasyonu sadece veritabanı kısıtı engeller, kayıt ekstra sorgu yapmaz"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='yolcu@biletal.com', password='test12345')
+        vehicle = Vehicle.objects.create(vehicle_type='bus', capacity=40)
+        departure = timezone.now() + timedelta(days=1)
+        cls.trip = Trip.objects.create(
+            company=Company.objects.create(name='Biletal Turizm'),
+            vehicle=vehicle,
+            route=Route.objects.create(
+                origin='Adana', destination='Mersin',
+                distance_km=70, estimated_duration=timedelta(hours=1)
+            ),
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=1),
+            price=250
+        )
+        cls.seat = vehicle.seats.first()
+
+    def reserve(self, **kwargs):
+        return self.reserve_seat(self.seat, **kwargs)
+
+    def reserve_seat(self, seat, **kwargs):
+        return Reservation.objects.create(
+            trip=self.trip, seat=seat, user=self.user, passenger_phone='5550000000',
+            expires_at=timezone.now() + timedelta(minutes=15), total_price=250, **kwargs
+        )
+
+    def test_active_double_booking_rejected(self):
+        self.reserve()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.reserve()
+
+    def test_seat_rebookable_after_expiry(self):
+        self.reserve(status='expired')
+        self.reserve(status='cancelled')
+        self.assertEqual(self.reserve().status, 'pending')
+
+    def test_pnr_clash_is_not_seat_conflict(self):
+        reservation = self.reserve()
+        with self.assertRaises(IntegrityError) as seat_error, transaction.atomic():
+            self.reserve()
+        other_seat = self.trip.vehicle.seats.exclude(pk=self.seat.pk).first()
+        with self.assertRaises(IntegrityError) as pnr_error, transaction.atomic():
+            self.reserve_seat(other_seat, pnr_code=reservation.pnr_code)
+        self.assertTrue(is_seat_conflict(seat_error.exception))
+        self.assertFalse(is_seat_conflict(pnr_error.exception))
+
+    def test_pnr_clash_retried_without_probe(self):
+        taken = self.reserve(pnr_code='ESKI01').pnr_code
+        other_seat = self.trip.vehicle.seats.exclude(pk=self.seat.pk).first()
+        with mock.patch(
+            'core.models.pnr_allocator.allocate_many', side_effect=[[taken], ['YENI01']]
+        ), CaptureQueriesContext(connection) as queries:
+            reservation = self.reserve_seat(other_seat)
+        self.assertEqual(reservation.pnr_code, 'YENI01')
+        # Kayıttan önce PNR sorgusu yapılmaz, çakışmayı unique kısıt yakalar
+        self.assertFalse(any(q['sql'].startswith('SELECT') for q in queries.captured_queries))
+
+    def test_bulk_pnr_clash_retries_group(self):
+        taken = self.reserve(pnr_code='ESKI01').pnr_code
+        seats = self.trip.vehicle.seats.exclude(pk=self.seat.pk)[:2]
+        with mock.patch(
+            'core.models.pnr_allocator.allocate_many',
+            side_effect=[['YENI01', taken], ['YENI02', 'YENI03']]
+        ):
+            reservations = Reservation.bulk_create_with_pnrs([
+                Reservation(
+                    trip=self.trip, seat=seat, user=self.user, passenger_phone='5550000000',
+                    expires_at=timezone.now() + timedelta(minutes=15), total_price=250
+                )
+                for seat in seats
+            ])
+        self.assertEqual([r.pnr_code for r in reservations], ['YENI02', 'YENI03'])
+        self.assertEqual({r.group_pnr for r in reservations}, {'YENI02'})
+
+    def test_status_update_is_single_query(self):
+        reservation = self.reserve()
+        reservation.status = 'confirmed'
+        with self.assertNumQueries(1):
+            reservation.save()
+
+
+class PnrAllocatorTests(TestCase):
+    """PNR'lar sequence bloklarından okuma yapmadan ve benzersiz üretilir"""
+
+    def test_codes_allocated_from_blocks(self):
+        allocator = PnrAllocator(block_size=50)
+        with mock.patch.object(allocator, '_fetch_block', wraps=allocator._fetch_block) as fetch:
+            codes = [allocator.allocate()] + allocator.allocate_many(60)
+
+        self.assertEqual([call.args for call in fetch.call_args_list], [(50,), (50,)])
+        self.assertEqual(len(set(codes)), 61)
+        for code in codes:
+            self.assertEqual(len(code), PNR_LENGTH)
+            self.assertTrue(set(code) <= set(PNR_ALPHABET))
+
+    def test_permutation_is_bijective(self):
+        allocator = PnrAllocator()
+        sample = [*range(10000), *range(PNR_SPACE - 10000, PNR_SPACE)]
+        permuted = {allocator.permute(value) for value in sample}
+        self.assertEqual(len(permuted), len(sample))
+        self.assertLess(max(permuted), PNR_SPACE)
+
+
+class TripSearchInvalidationTests(TestCase):
+    """Sefer kaydı ekstra sorgu yapmaz, arama nesilleri sadece commit'ten sonra artar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        departure = timezone.now() + timedelta(days=1)
+        cls.trip = Trip.objects.create(
+            company=Company.objects.create(name='Biletal Turizm'),
+            vehicle=Vehicle.objects.create(vehicle_type='bus', capacity=40),
+            route=Route.objects.create(
+                origin='Adana', destination='Mersin',
+                distance_km=70, estimated_duration=timedelta(hours=1)
+            ),
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=1),
+            price=250
+        )
+
+    def generations(self):
+        keys = search_bucket_keys(
+            'Adana', 'Mersin', 'bus', timezone.localtime(self.trip.departure_time).date()
+        )
+        return cache.get_many(keys)
+
+    def test_unchanged_save_is_single_query(self):
+        trip = Trip.objects.get(pk=self.trip.pk)
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            trip.save()
+        self.assertEqual(callbacks, [])
+
+    def test_generations_bumped_on_commit(self):
+        trip = Trip.objects.get(pk=self.trip.pk)
+        trip.price = 300
+        before = self.generations()
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.save()
+            self.assertEqual(self.generations(), before)
+        self.assertNotEqual(self.generations(), before)
+
+
+class SeatServiceMixin:
+    """Redis üzerinde çalışan koltuk servisi testleri için sefer ve temiz Redis durumu
+
+    Test veritabanı her çalıştırmada aynı id'leri verdiği için seferin Redis
+    anahtarları ve süreç içi önbellekler her testten önce silinir.
+    """
+
+    @classmethod
+    def create_trip(cls):
+        cls.user = User.objects.create_user(email='yolcu@biletal.com', password='test12345')
+        departure = timezone.now() + timedelta(days=1)
+        cls.trip = Trip.objects.create(
+            company=Company.objects.create(name='Biletal Turizm'),
+            vehicle=Vehicle.objects.create(vehicle_type='bus', capacity=8),
+            route=Route.objects.create(
+                origin='Adana', destination='Mersin',
+                distance_km=70, estimated_duration=timedelta(hours=1)
+            ),
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=1),
+            price=250
+        )
+        cls.seats = list(cls.trip.vehicle.seats.order_by('row_number', 'seat_letter'))
+
+    def setUp(self):
+        self.redis = seat_service.redis_client
+        self.clear_trip_state(self.trip)
+        broadcast = mock.patch.object(seat_service, 'broadcast_seat_update')
+        self.broadcast = broadcast.start()
+        self.addCleanup(broadcast.stop)
+
+    def clear_trip_state(self, trip):
+        keys = [
+            key for pattern in (f"*_{trip.id}", f"seat_lock_{trip.id}_*")
+            for key in self.redis.scan_iter(match=pattern, count=1000)
+        ]
+        if keys:
+            self.redis.delete(*keys)
+        seat_service.delete_seat_layouts([trip.vehicle_id])
+        self.redis.zrem(
+            seat_service.lock_expiry_queue_key,
+            *[f"{trip.id}:{seat.id}" for seat in trip.vehicle.seats.all()]
+        )
+        seat_service._trip_vehicles.pop(trip.id, None)
+
+    def reserve(self, seat, **kwargs):
+        return Reservation.objects.create(
+            trip=self.trip, seat=seat, user=self.user, passenger_phone='5550000000',
+            expires_at=timezone.now() + timedelta(minutes=15), total_price=250, **kwargs
+        )
+
+    def broadcasts(self):
+        # Ortak kilit bitiş kuyruğunda başka seferlerin kayıtları da olabilir
+        return [
+            call.args[1] for call in self.broadcast.call_args_list
+            if int(call.args[0]) == self.trip.id
+        ]
+
+
+class SeatServiceTestCase(SeatServiceMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_trip()
+
+
+class TripSearchAvailabilityTests(SeatServiceTestCase):
+    """Doluluk sıralı sayfa sıralamada kullanılan sayacı gösterir, uzlaştırmada yenilenir"""
+
+    def setUp(self):
+        super().setUp()
+        invalidate_trip_search(
+            'Adana', 'Mersin', 'bus', timezone.localtime(self.trip.departure_time).date()
+        )
+        for seat in self.seats[:2]:
+            self.reserve(seat)
+
+    def search(self, sort):
+        response = self.client.get(reverse('trip_search'), {
+            'origin': 'Adana', 'destination': 'Mersin', 'vehicle_type': 'bus', 'sort': sort
+        })
+        self.assertEqual(response.status_code, 200)
+        return [trip['available_seats'] for trip in response.json()['results']]
+
+    def test_availability_sort_shows_sorted_value(self):
+        # Canlı sayılar Redis bitmap'inden, sıralama sütunu henüz uzlaştırılmadı
+        self.assertEqual(self.search('departure'), [6])
+        self.assertEqual(self.search('availability'), [8])
+
+        seat_service.reconcile_seat_counters()
+        self.assertEqual(self.search('availability'), [6])
+
+
+class SeatBitmapTests(SeatServiceTestCase):
+    """Koltuk durumları bitmap'ten okunur, yeniden yükleme yeni yazıları korur"""
+
+    def statuses(self):
+        return {seat['id']: seat['status'] for seat in seat_service.get_trip_seats(self.trip.id)}
+
+    def set_reserved_bits(self, seats, reserved):
+        pipe = self.redis.pipeline()
+        seat_service._update_seat_bits(pipe, self.trip.id, [seat.id for seat in seats], reserved)
+        pipe.execute()
+
+    def test_seat_states_read_without_sql(self):
+        self.reserve(self.seats[0], status='confirmed')
+        seat_service.create_temporary_lock(self.trip.id, self.seats[1].id, 'oturum')
+
+        with self.assertNumQueries(0):
+            statuses = self.statuses()
+        self.assertEqual(statuses[self.seats[0].id], 'reserved')
+        self.assertEqual(statuses[self.seats[1].id], 'temp_locked')
+        self.assertEqual(list(statuses.values()).count('available'), len(self.seats) - 2)
+
+    def test_rebuild_keeps_writes_within_commit_grace(self):
+        self.statuses()
+        # Commit edilmemiş rezervasyonun biti: veritabanında henüz satır yok
+        self.set_reserved_bits([self.seats[2]], reserved=True)
+
+        seat_service._hydrate_reserved_bits(self.trip.id, self.trip.vehicle_id)
+        self.assertEqual(self.statuses()[self.seats[2].id], 'reserved')
+
+        with mock.patch.object(seat_service, 'reserved_bits_write_grace', 0):
+            seat_service._hydrate_reserved_bits(self.trip.id, self.trip.vehicle_id)
+        self.assertEqual(self.statuses()[self.seats[2].id], 'available')
+
+    def test_reconcile_rebuilds_mismatched_bitmap(self):
+        self.statuses()
+        self.reserve(self.seats[3], status='confirmed')
+        with mock.patch.object(seat_service, 'reserved_bits_write_grace', 0):
+            self.assertEqual(seat_service.reconcile_seat_bitmaps(), 1)
+        self.assertEqual(self.statuses()[self.seats[3].id], 'reserved')
+
+
+class SeatStateHydrationTests(SeatServiceTestCase):
+    """Soğuk bitmap'i eşzamanlı isteklerden sadece biri veritabanından yükler"""
+
+    def setUp(self):
+        super().setUp()
+        refresh = mock.patch.object(
+            seat_service, 'refresh_trip_vehicle_id', return_value=self.trip.vehicle_id
+        )
+        refresh.start()
+        self.addCleanup(refresh.stop)
+
+    def hold_hydrate_lock(self):
+        lock = self.redis.lock(f"trip_seat_state_lock_{self.trip.id}", timeout=5)
+        lock.acquire()
+        self.addCleanup(lock.release)
+
+    def finish_hydration(self, bits):
+        self.redis.set(f"trip_reserved_bits_{self.trip.id}", bits)
+        self.redis.set(f"trip_seat_state_{self.trip.id}", self.trip.vehicle_id)
+        return bits
+
+    def test_stale_bits_served_while_other_hydrates(self):
+        self.hold_hydrate_lock()
+        with mock.patch.object(seat_service, '_hydrate_reserved_bits') as hydrate:
+            self.assertEqual(seat_service._hydrate_single_flight(self.trip.id, b'\x80'), b'\x80')
+        hydrate.assert_not_called()
+
+    def test_waits_for_other_hydration_without_stale_bits(self):
+        self.hold_hydrate_lock()
+        timer = threading.Timer(0.1, self.finish_hydration, args=[b'\x40'])
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        with mock.patch.object(seat_service, '_hydrate_reserved_bits') as hydrate:
+            self.assertEqual(seat_service._hydrate_single_flight(self.trip.id, None), b'\x40')
+        hydrate.assert_not_called()
+
+    def test_concurrent_cold_reads_load_once(self):
+        def slow_hydrate(trip_id, vehicle_id):
+            time.sleep(0.2)
+            return self.finish_hydration(b'\x20')
+
+        with mock.patch.object(
+            seat_service, '_hydrate_reserved_bits', side_effect=slow_hydrate
+        ) as hydrate, ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda _: seat_service._hydrate_single_flight(self.trip.id, None), range(8)
+            ))
+
+        self.assertEqual(hydrate.call_count, 1)
+        self.assertEqual(results, [b'\x20'] * 8)
+
+
+@override_settings(SEAT_BROADCAST_WINDOW_MS=0)
+class AsyncSeatServiceTests(SeatServiceTestCase):
+    """Async servis senkron servisle aynı Redis durumunu ve mesajları üretir"""
+
+    def setUp(self):
+        super().setUp()
+        group_send = mock.patch.object(seat_service, 'group_send', new_callable=mock.AsyncMock)
+        self.group_send = group_send.start()
+        self.addCleanup(group_send.stop)
+
+    async def test_lock_shared_with_sync_service(self):
+        seat_id = self.seats[0].id
+        success, _, token = await async_seat_service.create_temporary_lock(self.trip.id, seat_id, 'a')
+        self.assertTrue(success)
+        self.assertEqual(
+            await sync_to_async(seat_service.create_temporary_lock)(self.trip.id, seat_id, 'b'),
+            (False, mock.ANY, None)
+        )
+        self.assertEqual(
+            await async_seat_service.extend_temporary_lock(self.trip.id, seat_id, 'a'), token
+        )
+        self.assertFalse(await async_seat_service.release_temporary_lock(self.trip.id, seat_id, 'b'))
+        self.assertTrue(await async_seat_service.release_temporary_lock(self.trip.id, seat_id, 'a'))
+
+        statuses = [
+            [seat['status'] for seat in message['seats']]
+            for (_, message), _ in self.group_send.call_args_list
+        ]
+        self.assertEqual(statuses, [['temp_locked'], ['available']])
+
+    async def test_seat_sync_matches_sync_service(self):
+        await async_seat_service.create_temporary_lock(self.trip.id, self.seats[0].id, 'a')
+        await async_seat_service.create_temporary_lock(self.trip.id, self.seats[1].id, 'a')
+
+        for since_version in (None, 1):
+            expected = await sync_to_async(seat_service.get_seat_sync)(self.trip.id, since_version)
+            actual = await async_seat_service.get_seat_sync(self.trip.id, since_version)
+            self.assertEqual(json.loads(actual), json.loads(expected))
+
+    async def test_seat_layout_shared_with_sync_service(self):
+        vehicle_id = self.trip.vehicle_id
+        layout = await async_seat_service.get_seat_layout(vehicle_id)
+        self.assertEqual([seat['id'] for seat in layout], [seat.id for seat in self.seats])
+
+        # Süreç önbelleği boşken senkron servis async servisin yazdığı düzeni okur
+        seat_service._seat_layouts.pop(vehicle_id)
+        with mock.patch.object(seat_service, 'seat_layout_query') as query:
+            self.assertEqual(await sync_to_async(seat_service.get_seat_layout)(vehicle_id), layout)
+        query.assert_not_called()
+
+
+class FencingTokenTests(SeatServiceTestCase):
+    """Kilitler atomik alınıp bırakılır, eski fencing token'lı rezervasyon reddedilir"""
+
+    def lock(self, session):
+        return seat_service.create_temporary_lock(self.trip.id, self.seats[0].id, session)
+
+    def reserve_with(self, session, token):
+        return seat_service.create_reservation(
+            self.trip.id, self.seats[0].id, {'phone': self.user.id}, session, token
+        )
+
+    def test_lock_owned_by_one_session(self):
+        _, _, token = self.lock('a')
+        self.assertEqual(self.lock('b'), (False, mock.ANY, None))
+        self.assertFalse(
+            seat_service.release_temporary_lock(self.trip.id, self.seats[0].id, 'b')
+        )
+        self.assertEqual(
+            seat_service.extend_temporary_lock(self.trip.id, self.seats[0].id, 'a'), token
+        )
+
+        self.assertTrue(seat_service.release_temporary_lock(self.trip.id, self.seats[0].id, 'a'))
+        success, _, next_token = self.lock('b')
+        self.assertTrue(success)
+        self.assertGreater(next_token, token)
+
+    def test_stale_token_rejected(self):
+        _, _, stale_token = self.lock('a')
+        # Kilit süresi dolup aynı session tarafından yeniden alınmış
+        self.redis.delete(f"seat_lock_{self.trip.id}_{self.seats[0].id}")
+        _, _, token = self.lock('a')
+
+        self.assertEqual(self.reserve_with('a', stale_token), (None, "Koltuk kilidi geçersiz"))
+        self.assertEqual(self.reserve_with('b', token), (None, "Koltuk kilidi geçersiz"))
+        reservation, _ = self.reserve_with('a', token)
+        self.assertEqual(reservation.seat_id, self.seats[0].id)
+
+    def test_missing_token_rejected(self):
+        _, _, token = self.lock('a')
+        self.assertEqual(self.reserve_with('a', None), (None, "Koltuk kilidi geçersiz"))
+        self.assertEqual(
+            seat_service.create_reservations(
+                self.trip.id, [self.seats[0].id], {'phone': self.user.id}, 'a', None
+            ),
+            (None, "Koltuk kilidi geçersiz")
+        )
+        self.assertFalse(Reservation.objects.filter(trip=self.trip).exists())
+        self.assertEqual(
+            seat_service.extend_temporary_lock(self.trip.id, self.seats[0].id, 'a'), token
+        )
+
+
+class SeatSyncTests(SeatServiceTestCase):
+    """Yeniden bağlanan istemci kaçırdığı delta'yı, günlük yetmezse snapshot'ı alır"""
+
+    def sync(self, since_version):
+        return json.loads(seat_service.get_seat_sync(self.trip.id, since_version))
+
+    def lock(self, seat):
+        seat_service.create_temporary_lock(self.trip.id, seat.id, 'oturum')
+        return int(self.redis.get(f"trip_seat_version_{self.trip.id}"))
+
+    def test_missed_changes_sent_as_single_delta(self):
+        first = self.lock(self.seats[0])
+        second = self.lock(self.seats[1])
+
+        message = self.sync(first)
+        self.assertEqual(message['type'], 'seat_delta')
+        self.assertEqual(message['version'], second)
+        self.assertEqual(
+            message['seats'],
+            [{'id': self.seats[1].id, 'status': 'temp_locked', 'version': second}]
+        )
+        self.assertEqual(self.sync(second)['seats'], [])
+
+    def test_snapshot_when_log_does_not_cover_client(self):
+        first = self.lock(self.seats[0])
+        with mock.patch.object(seat_service, 'seat_delta_log_size', 1):
+            self.lock(self.seats[1])
+            version = self.lock(self.seats[2])
+
+        message = self.sync(first)
+        self.assertEqual(message['type'], 'initial_seats')
+        self.assertEqual(message['version'], version)
+        self.assertEqual(
+            [seat['status'] for seat in message['seats'][:4]],
+            ['temp_locked', 'temp_locked', 'temp_locked', 'available']
+        )
+
+        # Snapshot aynı versiyonda yeniden oluşturulmaz
+        with mock.patch.object(seat_service, 'get_trip_seats') as get_trip_seats:
+            self.assertEqual(self.sync(None), message)
+        get_trip_seats.assert_not_called()
+
+
+class SeatBroadcastCoalescerTests(TestCase):
+    """Pencere içindeki değişiklikler sefer başına tek delta olarak yayınlanır"""
+
+    def setUp(self):
+        group_send = mock.patch.object(seat_service, 'group_send', new_callable=mock.AsyncMock)
+        self.group_send = group_send.start()
+        self.addCleanup(group_send.stop)
+
+    def coalescer(self, window=60):
+        coalescer = SeatBroadcastCoalescer(seat_service, window)
+        self.addCleanup(coalescer.flush)
+        return coalescer
+
+    def sent(self):
+        return {
+            trip_id: {seat['id']: (seat['version'], seat['status']) for seat in message['seats']}
+            | {'version': message['version'], 'from_version': message['from_version']}
+            for (trip_id, message), _ in self.group_send.call_args_list
+        }
+
+    def test_changes_merged_by_version(self):
+        coalescer = self.coalescer()
+        coalescer.schedule(1, {10: 'temp_locked'}, 3)
+        coalescer.schedule(1, {10: 'available', 11: 'temp_locked'}, 4)
+        # Geç gelen eski değişiklik yeni durumu ezmez
+        coalescer.schedule(1, {10: 'temp_locked'}, 2)
+        coalescer.schedule(2, {20: 'reserved'}, 5)
+        coalescer.schedule(2, {21: 'reserved'}, 7)
+        coalescer.flush()
+
+        self.assertEqual(self.sent(), {
+            1: {10: (4, 'available'), 11: (4, 'temp_locked'), 'version': 4, 'from_version': 2},
+            # Aradaki versiyon başka süreçte: istemci eksik versiyonu ister
+            2: {20: (5, 'reserved'), 21: (7, 'reserved'), 'version': 7, 'from_version': None},
+        })
+
+    def test_window_publishes_once(self):
+        coalescer = self.coalescer(window=0.05)
+        coalescer.schedule(1, {10: 'temp_locked'}, 1)
+        coalescer.schedule(1, {11: 'temp_locked'}, 2)
+
+        deadline = time.monotonic() + 5
+        while not self.group_send.call_count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        self.assertEqual(self.group_send.call_count, 1)
+        self.assertEqual(self.sent()[1]['from_version'], 1)
+
+
+class MultiSeatLockTests(SeatServiceTestCase):
+    """Çoklu koltuk kilidi ve rezervasyonu ya hep ya hiç, grup ortak PNR ile"""
+
+    def test_locks_all_or_nothing(self):
+        seat_ids = [seat.id for seat in self.seats[:3]]
+        seat_service.create_temporary_lock(self.trip.id, seat_ids[1], 'b')
+        self.broadcast.reset_mock()
+
+        self.assertEqual(
+            seat_service.create_temporary_locks(self.trip.id, seat_ids, 'a'),
+            (False, mock.ANY, None)
+        )
+        self.assertEqual(seat_service.get_locked_seat_ids(self.trip.id), {seat_ids[1]})
+        self.assertEqual(self.broadcasts(), [])
+
+        seat_service.release_temporary_lock(self.trip.id, seat_ids[1], 'b')
+        self.broadcast.reset_mock()
+        success, _, token = seat_service.create_temporary_locks(self.trip.id, seat_ids, 'a')
+        self.assertTrue(success)
+        self.assertEqual(seat_service.get_locked_seat_ids(self.trip.id), set(seat_ids))
+        tokens = {
+            self.redis.hget(f"seat_lock_{self.trip.id}_{seat_id}", 'token') for seat_id in seat_ids
+        }
+        self.assertEqual(tokens, {str(token)})
+        self.assertEqual(self.broadcasts(), [dict.fromkeys(seat_ids, 'temp_locked')])
+
+    def test_reservations_share_group_pnr(self):
+        seat_ids = [seat.id for seat in self.seats[:3]]
+        _, _, token = seat_service.create_temporary_locks(self.trip.id, seat_ids, 'a')
+        self.assertEqual(
+            seat_service.create_reservations(
+                self.trip.id, seat_ids, {'phone': self.user.id}, 'b', token
+            ),
+            (None, "Koltuk kilidi geçersiz")
+        )
+
+        reservations, _ = seat_service.create_reservations(
+            self.trip.id, seat_ids, {'phone': self.user.id}, 'a', token
+        )
+        self.assertEqual(sorted(r.seat_id for r in reservations), sorted(seat_ids))
+        self.assertEqual(len({r.pnr_code for r in reservations}), 3)
+        self.assertEqual({r.group_pnr for r in reservations}, {reservations[0].pnr_code})
+        self.assertEqual(seat_service.get_locked_seat_ids(self.trip.id), set())
+        statuses = {seat['id']: seat['status'] for seat in seat_service.get_trip_seats(self.trip.id)}
+        self.assertEqual({statuses[seat_id] for seat_id in seat_ids}, {'reserved'})
+
+
+class SeatLockTests(SeatServiceTestCase):
+    """Kilitler bitmap yüklenmeden verilmez, rezerve koltuklar boşalmış yayınlanmaz"""
+
+    def test_cold_bitmap_does_not_lock_reserved_seat(self):
+        self.reserve(self.seats[0], status='confirmed')
+
+        success, _, token = seat_service.create_temporary_lock(
+            self.trip.id, self.seats[0].id, 'oturum'
+        )
+        self.assertFalse(success)
+        self.assertIsNone(token)
+        self.assertEqual(self.broadcasts(), [])
+
+        success, _, token = seat_service.create_temporary_lock(
+            self.trip.id, self.seats[1].id, 'oturum'
+        )
+        self.assertTrue(success)
+        self.assertGreater(token, 0)
+
+    def test_cold_bitmap_does_not_lock_reserved_seats(self):
+        self.reserve(self.seats[0], status='confirmed')
+
+        success, _, _ = seat_service.create_temporary_locks(
+            self.trip.id, [self.seats[1].id, self.seats[0].id], 'oturum'
+        )
+        self.assertFalse(success)
+        self.assertFalse(self.redis.exists(f"seat_lock_{self.trip.id}_{self.seats[1].id}"))
+
+    def test_reserved_seat_not_broadcast_available_on_release_or_expiry(self):
+        seat_ids = [seat.id for seat in self.seats[:3]]
+        with mock.patch.object(seat_service, 'temp_lock_timeout', 0):
+            seat_service.create_temporary_lock(self.trip.id, seat_ids[0], 'oturum')
+        seat_service.create_temporary_locks(self.trip.id, seat_ids[1:], 'oturum')
+        # Koltuklar kilitliyken başka yoldan rezerve edilmiş
+        pipe = self.redis.pipeline()
+        seat_service._update_seat_bits(pipe, self.trip.id, seat_ids, reserved=True)
+        pipe.execute()
+        self.broadcast.reset_mock()
+
+        self.assertTrue(seat_service.release_temporary_lock(self.trip.id, seat_ids[1], 'oturum'))
+        self.assertEqual(
+            seat_service.release_temporary_locks(self.trip.id, seat_ids[2:], 'oturum'),
+            seat_ids[2:]
+        )
+        seat_service.expire_seat_locks()
+        self.assertEqual(self.broadcasts(), [])
+        self.assertEqual(seat_service.get_locked_seat_ids(self.trip.id), set())
+
+
+class TripVehicleChangeTests(SeatServiceTestCase):
+    """Sefer aracı değişince süreç önbellekleri eski araçta kalmaz"""
+
+    def create_vehicle(self, capacity):
+        vehicle = Vehicle.objects.create(vehicle_type='bus', capacity=capacity)
+        # Test veritabanı id'leri çalıştırmalar arasında tekrarlanır
+        seat_service.delete_seat_layouts([vehicle.id])
+        self.addCleanup(seat_service.delete_seat_layouts, [vehicle.id])
+        return vehicle, list(vehicle.seats.order_by('row_number', 'seat_letter'))
+
+    def test_stale_trip_vehicle_cache_uses_new_vehicle(self):
+        seat_service.get_trip_seats(self.trip.id)
+        vehicle, seats = self.create_vehicle(4)
+        self.reserve(seats[0], status='confirmed')
+
+        trip = Trip.objects.get(pk=self.trip.pk)
+        trip.vehicle = vehicle
+        with self.captureOnCommitCallbacks(execute=True):
+            trip.save()
+        # Değişikliği görmemiş başka bir süreç
+        seat_service._trip_vehicles[self.trip.id] = self.trip.vehicle_id
+
+        success, _, _ = seat_service.create_temporary_lock(self.trip.id, seats[0].id, 'oturum')
+        self.assertFalse(success)
+        success, _, _ = seat_service.create_temporary_lock(self.trip.id, seats[1].id, 'oturum')
+        self.assertTrue(success)
+        success, _, _ = seat_service.create_temporary_lock(
+            self.trip.id, self.seats[2].id, 'oturum'
+        )
+        self.assertFalse(success)
+
+        seat_service._trip_vehicles[self.trip.id] = self.trip.vehicle_id
+        self.assertEqual(
+            [(seat['id'], seat['status']) for seat in seat_service.get_trip_seats(self.trip.id)],
+            [(seats[0].id, 'reserved'), (seats[1].id, 'temp_locked')]
+            + [(seat.id, 'available') for seat in seats[2:]]
+        )
+
+    def test_empty_seat_layout_not_cached(self):
+        vehicle, _ = self.create_vehicle(4)
+        Seat.objects.filter(vehicle=vehicle).delete()
+        self.assertEqual(seat_service.get_seat_layout(vehicle.id), [])
+
+        create_vehicle_seats([vehicle])
+        self.assertEqual(len(seat_service.get_seat_layout(vehicle.id)), 4)
+
+
+class ReservationRollbackTests(SeatServiceTestCase):
+    """Commit edilemeyen rezervasyonun koltuğu rezerve kalmaz"""
+
+    def assert_seat_released(self, seat):
+        self.assertFalse(Reservation.objects.filter(trip=self.trip, seat=seat).exists())
+        self.assertEqual(self.redis.zcard(f"trip_seat_locks_{self.trip.id}"), 0)
+        self.assertEqual(
+            {seat['id']: seat['status'] for seat in seat_service.get_trip_seats(self.trip.id)}[seat.id],
+            'available'
+        )
+
+    def test_rolled_back_reservation_clears_reserved_bit(self):
+        seat = self.seats[0]
+        _, _, token = seat_service.create_temporary_lock(self.trip.id, seat.id, 'oturum')
+        with mock.patch('core.services.transaction.on_commit', side_effect=RuntimeError):
+            reservation, _ = seat_service.create_reservation(
+                self.trip.id, seat.id, {'phone': self.user.id}, 'oturum', token
+            )
+        self.assertIsNone(reservation)
+        self.assert_seat_released(seat)
+
+    def test_rolled_back_reservations_clear_reserved_bits(self):
+        seats = self.seats[:2]
+        _, _, token = seat_service.create_temporary_locks(
+            self.trip.id, [seat.id for seat in seats], 'oturum'
+        )
+        with mock.patch('core.services.transaction.on_commit', side_effect=RuntimeError):
+            reservations, _ = seat_service.create_reservations(
+                self.trip.id, [seat.id for seat in seats], {'phone': self.user.id}, 'oturum', token
+            )
+        self.assertIsNone(reservations)
+        for seat in seats:
+            self.assert_seat_released(seat)
+
+
+class ReservationCommitTests(SeatServiceMixin, TransactionTestCase):
+    """Commit'ten sonraki yayın hatası commit edilmiş rezervasyonu geri almaz"""
+
+    def setUp(self):
+        self.create_trip()
+        super().setUp()
+
+    def assert_reserved(self, reservations):
+        statuses = {seat['id']: seat['status'] for seat in seat_service.get_trip_seats(self.trip.id)}
+        for reservation in reservations:
+            self.assertTrue(Reservation.objects.filter(pk=reservation.pk, status='pending').exists())
+            self.assertEqual(statuses[reservation.seat_id], 'reserved')
+
+    def test_failed_broadcast_keeps_reservation(self):
+        seat_id = self.seats[0].id
+        _, _, token = seat_service.create_temporary_lock(self.trip.id, seat_id, 'oturum')
+        self.broadcast.side_effect = RuntimeError
+        reservation, _ = seat_service.create_reservation(
+            self.trip.id, seat_id, {'phone': self.user.id}, 'oturum', token
+        )
+        self.assertIsNotNone(reservation)
+        self.assert_reserved([reservation])
+
+    def test_failed_broadcast_keeps_reservations(self):
+        seat_ids = [seat.id for seat in self.seats[:2]]
+        _, _, token = seat_service.create_temporary_locks(self.trip.id, seat_ids, 'oturum')
+        self.broadcast.side_effect = RuntimeError
+        reservations, _ = seat_service.create_reservations(
+            self.trip.id, seat_ids, {'phone': self.user.id}, 'oturum', token
+        )
+        self.assertEqual(len(reservations), 2)
+        self.assert_reserved(reservations)
+
+
+class AvailableSeatsCounterTests(SeatServiceTestCase):
+    """Boş koltuk sütunu rezervasyonda yazılmaz, periyodik uzlaştırmada yenilenir"""
+
+    def available_seats(self):
+        return Trip.objects.values_list('available_seats', flat=True).get(pk=self.trip.pk)
+
+    def test_reservations_do_not_write_trip_row(self):
+        seat_ids = [seat.id for seat in self.seats[:2]]
+        _, _, token = seat_service.create_temporary_locks(self.trip.id, seat_ids, 'oturum')
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            reservations, _ = seat_service.create_reservations(
+                self.trip.id, seat_ids, {'phone': self.user.id}, 'oturum', token
+            )
+        self.assertEqual(len(reservations), 2)
+        trip_writes = [
+            sql for sql in (query['sql'] for query in queries.captured_queries)
+            if f'"{Trip._meta.db_table}"' in sql and (sql.startswith('UPDATE') or 'FOR UPDATE' in sql)
+        ]
+        self.assertEqual(trip_writes, [])
+        self.assertEqual(self.available_seats(), 8)
+
+        seat_service.reconcile_seat_counters()
+        self.assertEqual(self.available_seats(), 6)
+
+        Reservation.objects.filter(trip=self.trip).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(seat_service.cleanup_expired_reservations(), 2)
+        seat_service.reconcile_seat_counters()
+        self.assertEqual(self.available_seats(), 8)
+
+
+class ReservationSweepTests(SeatServiceTestCase):
+    """Süresi dolan rezervasyonlar parça başına tek UPDATE ... RETURNING ile temizlenir"""
+
+    def setUp(self):
+        super().setUp()
+        self.expired = [self.reserve(seat) for seat in self.seats[:3]]
+        self.active = self.reserve(self.seats[3])
+        self.confirmed = self.reserve(self.seats[4], status='confirmed')
+        past_due = [reservation.pk for reservation in self.expired + [self.confirmed]]
+        Reservation.objects.filter(pk__in=past_due).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        pipe = self.redis.pipeline()
+        seat_service._update_seat_bits(
+            pipe, self.trip.id, [seat.id for seat in self.seats[:5]], reserved=True
+        )
+        pipe.execute()
+        self.broadcast.reset_mock()
+
+    def statuses(self):
+        return dict(Reservation.objects.values_list('seat_id', 'status'))
+
+    def test_sweep_expires_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(seat_service.cleanup_expired_reservations(chunk_size=2), 3)
+
+        updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(f'UPDATE {Reservation._meta.db_table} ')
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(all('RETURNING' in sql for sql in updates))
+        self.assertEqual(self.statuses(), {
+            **{seat.id: 'expired' for seat in self.seats[:3]},
+            self.seats[3].id: 'pending',
+            self.seats[4].id: 'confirmed',
+        })
+
+        seats = {seat['id']: seat['status'] for seat in seat_service.get_trip_seats(self.trip.id)}
+        self.assertEqual(
+            [seats[seat.id] for seat in self.seats[:5]], ['available'] * 3 + ['reserved'] * 2
+        )
+        released = [seat_id for changes in self.broadcasts() for seat_id in changes]
+        self.assertEqual(sorted(released), sorted(seat.id for seat in self.seats[:3]))
+        self.assertEqual(len(self.broadcasts()), 2)
+
+    def test_max_chunks_bounds_sweep(self):
+        self.assertEqual(seat_service.cleanup_expired_reservations(chunk_size=2, max_chunks=1), 2)
+        self.assertEqual(list(self.statuses().values()).count('expired'), 2)
+        self.assertEqual(seat_service.cleanup_expired_reservations(chunk_size=2, max_chunks=1), 1)
+
+
+class ReservationExpiryQueueTests(SeatServiceTestCase):
+    """Rezervasyonlar süre dolum kuyruğuna girer, zamanı gelenler taramasız expired olur"""
+
+    def book(self, seat):
+        _, _, token = seat_service.create_temporary_lock(self.trip.id, seat.id, 'oturum')
+        reservation, _ = seat_service.create_reservation(
+            self.trip.id, seat.id, {'phone': self.user.id}, 'oturum', token
+        )
+        self.addCleanup(self.redis.zrem, seat_service.expiry_queue_key, reservation.id)
+        return reservation
+
+    def score(self, reservation):
+        return self.redis.zscore(seat_service.expiry_queue_key, reservation.id)
+
+    def make_due(self, reservation, expires_at):
+        Reservation.objects.filter(pk=reservation.pk).update(expires_at=expires_at)
+        self.redis.zadd(seat_service.expiry_queue_key, {reservation.id: time.time() - 60})
+
+    def test_reservation_queued_at_expiry(self):
+        reservation = self.book(self.seats[0])
+        self.assertAlmostEqual(self.score(reservation), reservation.expires_at.timestamp(), places=3)
+
+    def test_due_reservations_expired_from_queue(self):
+        due, extended, paid = [self.book(seat) for seat in self.seats[:3]]
+        self.make_due(due, timezone.now() - timedelta(minutes=1))
+        # Süresi uzatılmış rezervasyon kuyruktan alınır ama expired yapılmaz
+        self.make_due(extended, timezone.now() + timedelta(minutes=5))
+        self.make_due(paid, timezone.now() - timedelta(minutes=1))
+        Reservation.objects.filter(pk=paid.pk).update(status='confirmed')
+        self.broadcast.reset_mock()
+
+        self.assertEqual(seat_service.expire_due_reservations(limit=1000), 1)
+
+        statuses = dict(Reservation.objects.values_list('id', 'status'))
+        self.assertEqual(
+            [statuses[r.id] for r in (due, extended, paid)], ['expired', 'pending', 'confirmed']
+        )
+        self.assertIsNone(self.score(due))
+        self.assertIsNone(self.score(paid))
+        self.assertGreater(self.score(extended), time.time())
+        self.assertEqual(self.broadcasts(), [{self.seats[0].id: 'available'}])
+
+
+class PaymentRedisTests(SeatServiceTestCase):
+    """Ödeme sonucu Redis'e commit'ten sonra yazılır, rezervasyon kilidi temizlenir"""
+
+    def setUp(self):
+        super().setUp()
+        _, _, token = seat_service.create_temporary_lock(self.trip.id, self.seats[0].id, 'oturum')
+        self.reservation, _ = seat_service.create_reservation(
+            self.trip.id, self.seats[0].id, {'phone': self.user.id}, 'oturum', token
+        )
+        self.addCleanup(self.redis.zrem, seat_service.expiry_queue_key, self.reservation.id)
+        self.lock_key = f"reservation_lock_{self.reservation.id}"
+        self.broadcast.reset_mock()
+
+    def pay(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = seat_service.process_payment(self.reservation.id, {'method': 'credit_card'})
+        # Commit'ten önce Redis'e dokunulmaz
+        self.assertTrue(self.redis.exists(self.lock_key))
+        self.assertIsNotNone(self.redis.zscore(seat_service.expiry_queue_key, self.reservation.id))
+        self.assertEqual(self.broadcasts(), [])
+        for callback in callbacks:
+            callback()
+        self.assertFalse(self.redis.exists(self.lock_key))
+        self.assertIsNone(self.redis.zscore(seat_service.expiry_queue_key, self.reservation.id))
+        return result
+
+    def seat_status(self):
+        return {
+            seat['id']: seat['status'] for seat in seat_service.get_trip_seats(self.trip.id)
+        }[self.seats[0].id]
+
+    def test_expired_payment_releases_seat_after_commit(self):
+        Reservation.objects.filter(pk=self.reservation.pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(self.pay(), (None, "Rezervasyon süresi dolmuş"))
+        self.assertEqual(self.seat_status(), 'available')
+        self.assertEqual(self.broadcasts(), [{self.seats[0].id: 'available'}])
+
+    def test_confirmed_payment_keeps_reserved_bit(self):
+        success = {'success': True, 'transaction_id': 'TXN_TEST'}
+        with mock.patch.object(seat_service, 'mock_payment_service', return_value=success), \
+                mock.patch.object(seat_service, '_update_seat_bits') as update_seat_bits:
+            payment, _ = self.pay()
+        self.assertEqual(payment.transaction_id, 'TXN_TEST')
+        update_seat_bits.assert_not_called()
+        self.assertEqual(self.seat_status(), 'reserved')
+        self.assertEqual(self.broadcasts(), [])
+
+
+class ImportTimetableTests(TestCase):
+    """Tarife tekrar yüklendiğinde araç ve sefer çoğaltılmaz, sayılar gerçek eklemeleri gösterir"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.vehicles = Path(directory.name) / 'vehicles.csv'
+        self.trips = Path(directory.name) / 'trips.csv'
+        self.vehicles.write_text("ref,vehicle_type,capacity\n34ABC01,bus,40\n", encoding='utf-8')
+        self.trips.write_text(
+            "company,vehicle,origin,destination,distance_km,departure_time,arrival_time,price\n"
+            "Biletal Turizm,34ABC01,Adana,Mersin,70,2030-01-01T10:00,2030-01-01T11:00,250\n"
+            "Biletal Turizm,34ABC01,Mersin,Adana,70,2030-01-01T14:00,2030-01-01T15:00,250\n",
+            encoding='utf-8'
+        )
+
+    def run_import(self):
+        out = io.StringIO()
+        call_command(
+            'import_timetable', vehicles=str(self.vehicles), trips=str(self.trips), stdout=out
+        )
+        return out.getvalue()
+
+    def test_reimport_is_idempotent(self):
+        self.assertIn("1 araç, 40 koltuk, 2 sefer", self.run_import())
+        self.assertIn("0 araç, 0 koltuk, 0 sefer", self.run_import())
+        self.assertEqual(Vehicle.objects.filter(code='34ABC01').count(), 1)
+        self.assertEqual(Seat.objects.count(), 40)
+        self.assertEqual(Trip.objects.count(), 2)
+
+
+class ClearSeatLayoutCacheTests(TestCase):
+    """Deploy sonrası koltuk düzeni cache'i araç tipine göre silinir"""
+
+    def test_clears_only_selected_vehicle_type(self):
+        plane = Vehicle.objects.create(vehicle_type='plain', capacity=6)
+        bus = Vehicle.objects.create(vehicle_type='bus', capacity=4)
+        vehicle_ids = [plane.id, bus.id]
+        # Test veritabanı id'leri çalıştırmalar arasında tekrarlanır
+        seat_service.delete_seat_layouts(vehicle_ids)
+        self.addCleanup(seat_service.delete_seat_layouts, vehicle_ids)
+        for vehicle_id in vehicle_ids:
+            seat_service.get_seat_layout(vehicle_id)
+
+        call_command('clear_seat_layout_cache', vehicle_type='plain', stdout=io.StringIO())
+        self.assertEqual(
+            [bool(seat_service.redis_client.exists(seat_service.seat_layout_key(vehicle_id)))
+             for vehicle_id in vehicle_ids],
+            [False, True]
+        )
+        self.assertNotIn(plane.id, seat_service._seat_layouts)
+
+
+class LoadTimetableFeedTests(TransactionTestCase):
+    """Akış araçları import_timetable gibi çözer, rotası değişen seferin eski kovası da temizlenir"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.feed = Path(directory.name) / 'feed.csv'
+        self.vehicle = Vehicle.objects.create(code='34ABC01', vehicle_type='bus', capacity=4)
+        self.other = Vehicle.objects.create(vehicle_type='bus', capacity=4)
+
+    def load(self, destination):
+        self.feed.write_text(
+            "company,vehicle,origin,destination,distance_km,departure_time,arrival_time,price\n"
+            f"Biletal Turizm,34ABC01,Adana,{destination},70,2030-01-01T10:00,2030-01-01T11:00,250\n"
+            f"Biletal Turizm,{self.other.id},Adana,Mersin,70,2030-01-01T10:00,2030-01-01T11:00,250\n"
+            "Biletal Turizm,YOK,Adana,Mersin,70,2030-01-01T10:00,2030-01-01T11:00,250\n",
+            encoding='utf-8'
+        )
+        out = io.StringIO()
+        with mock.patch(
+            'core.management.commands.load_timetable_feed.invalidate_trip_search'
+        ) as invalidate:
+            call_command('load_timetable_feed', str(self.feed), stdout=out)
+        return out.getvalue(), {call.args for call in invalidate.call_args_list}
+
+    def test_route_change_invalidates_old_and_new_bucket(self):
+        output, _ = self.load('Mersin')
+        self.assertIn("2 yeni, 0 güncellenen, 1 atlanan", output)
+        self.assertEqual(
+            set(Trip.objects.values_list('vehicle_id', flat=True)), {self.vehicle.id, self.other.id}
+        )
+
+        output, buckets = self.load('Tarsus')
+        self.assertIn("0 yeni, 1 güncellenen, 1 atlanan", output)
+        day = datetime(2030, 1, 1).date()
+        self.assertEqual(buckets, {
+            ('Adana', 'Mersin', 'bus', day), ('Adana', 'Tarsus', 'bus', day)
+        })
+
+
+class MetricsTests(TestCase):
+    """Middleware view gecikmesini ve SQL sorgularını kaydeder, scrape endpoint'i sunar"""
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_view_latency_and_query_count_recorded(self):
+        requests = self.sample(
+            'biletal_http_request_seconds_count', view='trip_detail', method='GET', status='2xx'
+        )
+        queries = self.sample('biletal_db_queries_per_request_sum', view='trip_detail')
+
+        with self.assertNumQueries(1):
+            self.client.get(reverse('trip_detail', args=[0]))
+
+        self.assertEqual(self.sample(
+            'biletal_http_request_seconds_count', view='trip_detail', method='GET', status='2xx'
+        ), requests + 1)
+        self.assertEqual(
+            self.sample('biletal_db_queries_per_request_sum', view='trip_detail'), queries + 1
+        )
+
+    async def test_async_chain_records_queries(self):
+        queries = self.sample('biletal_db_queries_per_request_sum', view='trip_detail')
+        response = await self.async_client.get(reverse('trip_detail', args=[0]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.sample('biletal_db_queries_per_request_sum', view='trip_detail'), queries + 1
+        )
+
+    def test_scrape_endpoint_requires_admin_without_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        admin = User.objects.create_user(email='admin@biletal.com', password='test12345', is_staff=True)
+        token = RefreshToken.for_user(admin).access_token
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'biletal_http_request_seconds', response.content)
+
+    @override_settings(METRICS_TOKEN='gizli')
+    def test_scrape_endpoint_requires_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer yanlis')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer gizli')
+        self.assertEqual(response.status_code, 200)
+
+
+class PoolStatsTests(TestCase):
+    """Redis havuz istatistikleri havuzun kendi sayaçlarından okunur"""
+
+    def test_checkouts_tracked(self):
+        pool = TrackedConnectionPool(
+            host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB,
+            max_connections=2
+        )
+        self.addCleanup(pool.disconnect)
+        usage = {'max_connections': 2, 'created_connections': 1}
+
+        connection = pool.get_connection()
+        self.assertEqual(pool.usage(), {**usage, 'in_use_connections': 1, 'idle_connections': 0})
+        pool.release(connection)
+        self.assertEqual(pool.usage(), {**usage, 'in_use_connections': 0, 'idle_connections': 1})
+        # Boşta bağlantı yeniden kullanılır
+        pool.release(pool.get_connection())
+        self.assertEqual(pool.usage()['created_connections'], 1)
+
+        stats = get_pool_stats()['redis']
+        self.assertTrue(stats)
+        self.assertTrue(all(pool['in_use_connections'] >= 0 for pool in stats.values()))
+
+
+class ProfilingTests(TestCase):
+    """Profilleyici işaretli istekleri seçer ve dosyaları döndürerek yazar"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        override = override_settings(
+            PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0, PROFILING_TOKEN='gizli',
+            PROFILING_INTERVAL=0.001, PROFILING_DIR=self.directory.name, PROFILING_MAX_FILES=2
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_only_flagged_requests_profiled(self):
+        self.assertTrue(should_profile('gizli'))
+        self.assertFalse(should_profile('yanlis'))
+        self.assertFalse(should_profile())
+        with override_settings(PROFILING_TOKEN=None):
+            self.assertFalse(should_profile(''))
+
+    def wait(self):
+        time.sleep(0.02)
+
+    def test_profiles_written_as_collapsed_stacks_and_rotated(self):
+        for index in range(3):
+            with profile('test', f'run{index}'):
+                self.wait()
+
+        files = sorted(Path(self.directory.name).glob('*.collapsed'))
+        self.assertEqual(len(files), 2)
+        self.assertNotIn('run0', ' '.join(file.name for file in files))
+        stack, count = files[0].read_text().splitlines()[0].rsplit(' ', 1)
+        self.assertIn('test_profiles_written_as_collapsed_stacks_and_rotated', stack)
+        self.assertGreater(int(count), 0)
+
+    def test_cprofile_mode_and_single_active_profile(self):
+        with override_settings(PROFILING_MODE='cprofile'):
+            with profile('test', 'outer'):
+                # İç içe profil ilkinin kancasını ezmez, dosya yazmaz
+                with profile('test', 'inner'):
+                    self.wait()
+
+        path, = Path(self.directory.name).iterdir()
+        self.assertIn('outer', path.name)
+        self.assertEqual(path.suffix, '.prof')
+        functions = {function for _, _, function in pstats.Stats(str(path)).stats}
+        self.assertIn('wait', functions)
+
+    def test_same_name_profiles_do_not_overwrite(self):
+        for _ in range(2):
+            write_profile('test', 'ayni', 5, Counter({'a;b': 1}))
+        self.assertEqual(len(list(Path(self.directory.name).iterdir())), 2)
+
+    async def test_async_request_profiles_view_thread(self):
+        def slow_view(request):
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+            return HttpResponse()
+
+        async def get_response(request):
+            return await sync_to_async(slow_view)(request)
+
+        middleware = ProfilingMiddleware(get_response)
+        for mode in ('sample', 'cprofile'):
+            with override_settings(PROFILING_MODE=mode):
+                await middleware(RequestFactory().get('/', HTTP_X_PROFILE='gizli'))
+
+        sampled, = Path(self.directory.name).glob('*.collapsed')
+        self.assertIn('slow_view', sampled.read_text())
+        profiled, = Path(self.directory.name).glob('*.prof')
+        functions = {function for _, _, function in pstats.Stats(str(profiled)).stats}
+        self.assertIn('slow_view', functions)
+
+    def test_flagged_http_request_profiled(self):
+        with mock.patch('core.middleware.profile', wraps=profile) as profiler:
+            self.client.get(reverse('metrics'), HTTP_X_PROFILE='gizli')
+            self.client.get(reverse('metrics'))
+
+        profiler.assert_called_once_with('http', f"GET_{reverse('metrics')}")
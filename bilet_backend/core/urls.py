@@ -24,13 +24,19 @@ urlpatterns = [
     path('rest/select-seat/', views.select_seat, name='select_seat'),
     path('rest/release-seat/', views.release_seat, name='release_seat'),
     path('rest/create-reservation/', views.create_reservation, name='create_reservation'),
+    path('rest/select-seats/', views.select_seats, name='select_seats'),
+    path('rest/release-seats/', views.release_seats, name='release_seats'),
+    path('rest/create-reservations/', views.create_reservations, name='create_reservations'),
     path('rest/process-payment/', views.process_payment, name='process_payment'),
     path('rest/reservation/<int:reservation_id>/', views.reservation_status, name='reservation_status'),
     
     # Visitor api
     path('rest/trips/', views.trip_list, name='trip_list'),
+    path('rest/trips/search/', views.trip_search, name='trip_search'),
     
     path('rest/trip/<int:trip_id>/', views.trip_detail, name='trip_detail'),
     path('rest/reservation/<int:reservation_id>/', views.reservation_detail, name='reservation_detail'),
+    path('rest/metrics/pools/', views.connection_pool_stats, name='connection_pool_stats'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
 
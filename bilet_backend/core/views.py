@@ -1,14 +1,18 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.conf import settings
 from core.models import User
 from core.serializer import UserTokenObtainPairSerializer, RegisterSerializer 
 
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework import generics
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser, BasePermission
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.authentication import BaseAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from django.contrib.auth.models import AnonymousUser
 from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -19,6 +23,11 @@ from rest_framework.decorators import action
 from .models import Trip, Seat, Reservation, Payment
 from .services import seat_service
 from .serializer import TripSerializer, ReservationSerializer, PaymentSerializer
+from .serializer import TripSearchParamsSerializer
+from .search import cached_search_trips
+from .connections import get_pool_stats
+from .metrics import render_metrics
+import hmac
 import json
 import uuid
 
@@ -95,7 +104,7 @@ def select_seat(request):
                 'error': 'trip_id ve seat_id gerekli'
             }, status=400)
 
-        success, message = seat_service.create_temporary_lock(
+        success, message, fencing_token = seat_service.create_temporary_lock(
             trip_id, seat_id, user_session
         )
         
@@ -103,7 +112,8 @@ def select_seat(request):
             'success': success,
             'message': message,
             'user_session': user_session,
-            'seat_id': seat_id
+            'seat_id': seat_id,
+            'fencing_token': fencing_token
         })
 
     except Exception as e:
@@ -121,7 +131,7 @@ def release_seat(request):
         seat_id = data.get('seat_id')
         user_session = data.get('user_session')
         
-        if not all([trip_id, seat_id, user_session]):
+        if not all([trip_id, seat_id, user_session, fencing_token]):
             return JsonResponse({
                 'success': False,
                 'error': 'Tüm parametreler gerekli'
@@ -150,6 +160,7 @@ def create_reservation(request):
         trip_id = data.get('trip_id')
         seat_id = data.get('seat_id')
         user_session = data.get('user_session')
+        fencing_token = data.get('fencing_token')
         passenger_data = data.get('passenger', {})
         
         # Validasyon
@@ -162,14 +173,14 @@ def create_reservation(request):
                 'error': f'Eksik yolcu bilgileri: {", ".join(missing_fields)}'
             }, status=400)
 
-        if not all([trip_id, seat_id, user_session]):
+        if not all([trip_id, seat_id, user_session, fencing_token]):
             return JsonResponse({
                 'success': False,
-                'error': 'trip_id, seat_id ve user_session gerekli'
+                'error': 'trip_id, seat_id, user_session ve fencing_token gerekli'
             }, status=400)
 
         reservation, message = seat_service.create_reservation(
-            trip_id, seat_id, passenger_data, user_session
+            trip_id, seat_id, passenger_data, user_session, fencing_token
         )
         
         if reservation:
@@ -191,6 +202,121 @@ def create_reservation(request):
             'error': str(e)
         }, status=500)
 
+@api_view(['POST'])
+def select_seats(request):
+    """Çoklu koltuk seçimi endpoint'i (ya hep ya hiç)"""
+    try:
+        data = json.loads(request.body)
+        trip_id = data.get('trip_id')
+        seat_ids = data.get('seat_ids') or []
+        user_session = data.get('user_session', str(uuid.uuid4()))
+        
+        if not trip_id or not isinstance(seat_ids, list) or not seat_ids:
+            return JsonResponse({
+                'success': False,
+                'error': 'trip_id ve seat_ids gerekli'
+            }, status=400)
+
+        success, message, fencing_token = seat_service.create_temporary_locks(
+            trip_id, seat_ids, user_session
+        )
+        
+        return JsonResponse({
+            'success': success,
+            'message': message,
+            'user_session': user_session,
+            'seat_ids': seat_ids,
+            'fencing_token': fencing_token
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+@api_view(['POST'])
+def release_seats(request):
+    """Çoklu koltuk bırakma endpoint'i"""
+    try:
+        data = json.loads(request.body)
+        trip_id = data.get('trip_id')
+        seat_ids = data.get('seat_ids') or []
+        user_session = data.get('user_session')
+        
+        if not all([trip_id, seat_ids, user_session, fencing_token]) or not isinstance(seat_ids, list):
+            return JsonResponse({
+                'success': False,
+                'error': 'Tüm parametreler gerekli'
+            }, status=400)
+
+        released = seat_service.release_temporary_locks(
+            trip_id, seat_ids, user_session
+        )
+        
+        return JsonResponse({
+            'success': bool(released),
+            'released_seat_ids': released,
+            'message': 'Koltuklar bırakıldı' if released else 'Koltuklar bırakılamadı'
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+@api_view(['POST'])
+def create_reservations(request):
+    """Çoklu koltuk rezervasyonu endpoint'i (ortak grup PNR)"""
+    try:
+        data = json.loads(request.body)
+        trip_id = data.get('trip_id')
+        seat_ids = data.get('seat_ids') or []
+        user_session = data.get('user_session')
+        fencing_token = data.get('fencing_token')
+        passenger_data = data.get('passenger', {})
+        
+        # Validasyon
+        required_fields = ['id', 'phone']
+        missing_fields = [field for field in required_fields if not passenger_data.get(field)]
+        
+        if missing_fields:
+            return JsonResponse({
+                'success': False,
+                'error': f'Eksik yolcu bilgileri: {", ".join(missing_fields)}'
+            }, status=400)
+
+        if not all([trip_id, seat_ids, user_session, fencing_token]) or not isinstance(seat_ids, list):
+            return JsonResponse({
+                'success': False,
+                'error': 'trip_id, seat_ids, user_session ve fencing_token gerekli'
+            }, status=400)
+
+        reservations, message = seat_service.create_reservations(
+            trip_id, seat_ids, passenger_data, user_session, fencing_token
+        )
+        
+        if reservations:
+            serializer = ReservationSerializer(reservations, many=True)
+            return JsonResponse({
+                'success': True,
+                'message': message,
+                'group_pnr': reservations[0].group_pnr,
+                'reservations': serializer.data
+            })
+        else:
+            return JsonResponse({
+                'success': False,
+                'error': message
+            }, status=400)
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
 @api_view(['POST'])
 def process_payment(request):
     """Ödeme işleme endpoint'i"""
@@ -242,7 +368,12 @@ def process_payment(request):
 def reservation_status(request, reservation_id):
     """Rezervasyon durumu sorgulama"""
     try:
-        reservation = get_object_or_404(Reservation, id=reservation_id)
+        reservation = get_object_or_404(
+            Reservation.objects.select_related(
+                'trip__route', 'trip__vehicle', 'trip__company', 'seat'
+            ).prefetch_related('trip__vehicle__seats'),
+            id=reservation_id
+        )
         serializer = ReservationSerializer(reservation)
         
         return JsonResponse({
@@ -272,21 +403,85 @@ def trip_list(request):
         route__destination__iexact=destination,
         vehicle__vehicle_type=vehicle_type,
         status='scheduled'
-    )
+    ).select_related('route', 'vehicle', 'company').prefetch_related('vehicle__seats')
 
     serializer = TripSerializer(trips, many=True)
     return Response(serializer.data)
    
+@api_view(['GET'])
+def trip_search(request):
+    """Sefer arama (tarih/saat/firma/fiyat filtreli, imleç ile sayfalı)"""
+    params = TripSearchParamsSerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+
+    results, next_cursor = cached_search_trips(params.validated_data)
+
+    if params.validated_data['sort'] == 'availability':
+        # Sayfa sırası ve imleç veritabanı sayacıyla kuruldu; canlı sayılar bu
+        # sırayla çelişmesin diye sıralamada kullanılan değer gösterilir
+        return Response({'results': results, 'next_cursor': next_cursor})
+
+    # Boş koltuk sayıları cache'lenmez, her istekte Redis sayaçlarından eklenir
+    seat_counts = seat_service.get_seat_counts([trip['id'] for trip in results])
+    return Response({
+        'results': [
+            {**trip, 'available_seats': seat_counts.get(trip['id'], trip)['available_seats']}
+            for trip in results
+        ],
+        'next_cursor': next_cursor
+    })
+
 @api_view(['GET'])
 def trip_detail(request, trip_id):
     """Sefer detay ve koltuk seçimi sayfası"""
-    trips = Trip.objects.filter(id=trip_id).select_related('route', 'vehicle', 'company')
+    trips = Trip.objects.filter(id=trip_id).select_related(
+        'route', 'vehicle', 'company'
+    ).prefetch_related('vehicle__seats')
     serializer = TripSerializer(trips, many=True)
     return JsonResponse({'response': serializer.data}, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 def reservation_detail(request, reservation_id):
     """Rezervasyon detay ve ödeme sayfası"""
-    reservation = Reservation.objects.filter(id=reservation_id).select_related('trip', 'seat')
+    reservation = Reservation.objects.filter(id=reservation_id).select_related(
+        'trip__route', 'trip__vehicle', 'trip__company', 'seat'
+    ).prefetch_related('trip__vehicle__seats')
     serializer = ReservationSerializer(reservation, many=True)
     return JsonResponse({'response': serializer.data}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def connection_pool_stats(request):
+    """Redis ve veritabanı bağlantı havuzu kullanımı"""
+    return JsonResponse({
+        'success': True,
+        'pools': get_pool_stats()
+    })
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """Bearer token olarak METRICS_TOKEN gönderen scrape isteklerini tanır"""
+
+    def authenticate(self, request):
+        header = request.headers.get('Authorization', '')
+        if not (settings.METRICS_TOKEN and header.startswith('Bearer ')):
+            return None
+        if not hmac.compare_digest(header[len('Bearer '):].encode(), settings.METRICS_TOKEN.encode()):
+            return None
+        return (AnonymousUser(), 'metrics')
+
+    def authenticate_header(self, request):
+        return 'Bearer'
+
+
+class HasMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        return request.auth == 'metrics'
+
+
+@api_view(['GET'])
+@authentication_classes([MetricsTokenAuthentication, JWTAuthentication])
+@permission_classes([HasMetricsToken | IsAdminUser])
+def metrics(request):
+    """Prometheus scrape endpoint'i (METRICS_TOKEN veya yönetici JWT'si gerekir)"""
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
@@ -5,6 +5,7 @@ const SeatSelectionApp = () => {
   const [tripData, setTripData] = useState(null);
   const [seats, setSeats] = useState([]);
   const [selectedSeat, setSelectedSeat] = useState(null);
+  const [fencingToken, setFencingToken] = useState(null);
   const [userSession] = useState(() => Math.random().toString(36).substring(2));
   const [step, setStep] = useState('seat-selection'); // seat-selection, passenger-info, payment, confirmation
   const [passengerInfo, setPassengerInfo] = useState({
@@ -25,6 +26,10 @@ const SeatSelectionApp = () => {
   const [timeLeft, setTimeLeft] = useState(null);
   
   const websocket = useRef(null);
+  const seatVersion = useRef(null);
+  // Son snapshot'tan sonra her koltuğa uygulanan değişikliğin versiyonu
+  const seatVersions = useRef({});
+  const syncPending = useRef(false);
   const timerRef = useRef(null);
 
   // Mock trip data - gerçek uygulamada API'den gelecek
@@ -75,17 +80,57 @@ const SeatSelectionApp = () => {
 
   const connectWebSocket = () => {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${protocol}//${window.location.host}/ws/trip/${tripData.id}/`;
+    const versionQuery = seatVersion.current !== null ? `?version=${seatVersion.current}` : '';
+    const wsUrl = `${protocol}//${window.location.host}/ws/trip/${tripData.id}/${versionQuery}`;
     
     websocket.current = new WebSocket(wsUrl);
+    syncPending.current = false;
     
     websocket.current.onmessage = (event) => {
       const data = JSON.parse(event.data);
       
       if (data.type === 'seat_status_update') {
         setSeats(data.seats);
+        seatVersion.current = data.version;
+        seatVersions.current = {};
+        syncPending.current = false;
       } else if (data.type === 'initial_seats') {
         setSeats(data.seats);
+        seatVersion.current = data.version;
+        seatVersions.current = {};
+        syncPending.current = false;
+      } else if (data.type === 'seat_delta') {
+        const lastVersion = seatVersion.current;
+        // Zaman damgası olmayan delta, sync isteğine gelen birleşik yanıttır
+        const isSyncReply = !data.timestamp;
+
+        // Sadece değişen koltuklar gelir; farklı sunuculardan sırasız gelebilecekleri
+        // için her koltuk, bildiğimizden yeni versiyonluysa uygulanır
+        const changes = {};
+        data.seats.forEach((seat) => {
+          const known = seatVersions.current[seat.id] ?? lastVersion ?? 0;
+          if (seat.version > known) {
+            seatVersions.current[seat.id] = seat.version;
+            changes[seat.id] = seat.status;
+          }
+        });
+        setSeats((prev) => prev.map((seat) =>
+          seat.id in changes ? { ...seat, status: changes[seat.id] } : seat
+        ));
+
+        if (isSyncReply) {
+          seatVersion.current = Math.max(lastVersion ?? 0, data.version);
+          syncPending.current = false;
+        } else if (lastVersion === null || data.version <= lastVersion) {
+          return;
+        } else if (data.from_version !== null && data.from_version <= lastVersion + 1) {
+          // Mesaj aradaki tüm versiyonları kapsıyor
+          seatVersion.current = data.version;
+        } else if (!syncPending.current) {
+          // Arada kaçırılan delta var; versiyonu ilerletmeden eksikleri iste
+          syncPending.current = true;
+          websocket.current.send(JSON.stringify({ type: 'sync', version: lastVersion }));
+        }
       }
     };
     
@@ -122,6 +167,7 @@ const SeatSelectionApp = () => {
       
       if (result.success) {
         setSelectedSeat(seat);
+        setFencingToken(result.fencing_token);
         startTimer(300); // 5 dakika
       } else {
         setError(result.message || 'Koltuk seçilemedi');
@@ -187,6 +233,7 @@ const SeatSelectionApp = () => {
           trip_id: tripData.id,
           seat_id: selectedSeat.id,
           user_session: userSession,
+          fencing_token: fencingToken,
           passenger: passengerInfo
         })
       });